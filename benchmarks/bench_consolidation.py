@@ -0,0 +1,334 @@
+"""Benchmark of the `consolidate_scopus` function on synthetic corpora
+with the HAL and Scopus APIs stubbed.
+
+For each rows number, a synthetic initial Scopus csv file and a synthetic
+HAL extraction with realistic column widths and a given DOIs overlap ratio
+are built, then the consolidation is run in a separate process so that
+the peak resident memory of each size is measured independently.
+The wall time, the peak RSS and the rows per second of each stage
+are saved in a stable json format for comparing versions.
+
+Usage: python benchmarks/bench_consolidation.py [--rows 1000,10000,100000,1000000]
+       [--overlap 0.8] [--not-found 0.1] [--output-format xlsx]
+       [--output bench_consolidation.json] [--pipelined]
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the Python memory allocations
+    # traced by tracemalloc being measured instead of the resident memory
+    resource = None
+
+# 3rd party imports
+import numpy as np
+import pandas as pd
+
+# Making the package importable when run from the repository folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Local imports
+# pylint: disable=wrong-import-position
+import htsfuncts
+import htsfuncts.hal_fetch as hts_hf
+import htsfuncts.pub_globals as hts_pg
+import htsfuncts.scopus_fetch as hts_sf
+from htsfuncts.main_functs import consolidate_scopus
+from htsfuncts.main_functs import set_files_tup
+from htsfuncts.run_report import RunReport
+# pylint: enable=wrong-import-position
+
+# Version of the json results format
+SCHEMA_VERSION = 1
+
+# Default rows numbers of the synthetic corpora
+DEFAULT_ROWS_LIST = [1_000, 10_000, 100_000, 1_000_000]
+
+# Typical widths in characters of the Scopus columns (others: 10 characters)
+SCOPUS_WIDTHS_DICT = {"Authors": 120, "Author full names": 220, "Author(s) ID": 90,
+                      "Title": 110, "Source title": 60, "Link": 110,
+                      "Affiliations": 260, "Authors with affiliations": 400,
+                      "Author Keywords": 80, "Index Keywords": 200, "References": 1200,
+                      "Correspondence Address": 90, "Publisher": 40,
+                      "Abbreviated Source Title": 30, "Document Type": 8, "EID": 20}
+
+# Typical widths in characters of the HAL columns (others: 10 characters)
+HAL_WIDTHS_DICT = {"Auteurs": 150, "Titres": 110, "Journal": 60, "Lien url": 45,
+                   "Mots clefs": 80, "Affiliations": 60, "Institutions": 120,
+                   "Depts": 40, "Organismes": 40, "Conference": 60}
+
+HAL_COLUMNS_LIST = ["Auteurs", "Titres", "Date de publication", "Journal", "DOI",
+                    "Lien url", "Mots clefs", "Affiliations", "Institutions", "Depts",
+                    "Organismes", "Type de document", "ISSN", "e-ISSN", "Conference",
+                    "Date de conference", "Comite de lecture", "Acte de conference",
+                    "Pays"]
+
+# Number of distinct values drawn for the text columns
+_POOL_SIZE = 1000
+
+
+def _read_peak_rss_bytes():
+    """Returns the peak resident memory of the process in bytes
+    or the peak of the traced memory if the resource module is not available."""
+    if resource is None:
+        return tracemalloc.get_traced_memory()[1]
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _read_rss_bytes():
+    """Returns the current resident memory of the process in bytes
+    or the current traced memory if the resource module is not available."""
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return tracemalloc.get_traced_memory()[0]
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _RssSampler:
+    """Background sampler of the peak resident memory of the process."""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_bytes = _read_rss_bytes()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, _read_rss_bytes())
+
+    def reset_peak(self):
+        """Restarts the peak measure from the current resident memory."""
+        self.peak_bytes = _read_rss_bytes()
+
+    def stop(self):
+        """Stops the sampling thread."""
+        self._stop_event.set()
+        self._thread.join()
+
+
+class _BenchReport(RunReport):
+    """Run report adding the peak resident memory of each stage."""
+    def __init__(self, sampler, **info):
+        super().__init__(**info)
+        self._sampler = sampler
+
+    @contextmanager
+    def stage(self, name):
+        self._sampler.reset_peak()
+        with super().stage(name) as stage_dict:
+            yield stage_dict
+        self._sampler.peak_bytes = max(self._sampler.peak_bytes, _read_rss_bytes())
+        stage_dict["peak_rss_bytes"] = max(stage_dict.get("peak_rss_bytes", 0),
+                                           self._sampler.peak_bytes)
+
+
+def _text_column(rng, width, rows_nb):
+    """Builds a text column of 'rows_nb' values of about 'width' characters."""
+    pool = np.array([f"{i:06d}" + "x" * max(0, width - 6) for i in range(_POOL_SIZE)],
+                    dtype=object)
+    return pool[rng.integers(0, _POOL_SIZE, rows_nb)]
+
+
+def _build_corpora(rows_nb, overlap_ratio, seed=0):
+    """Builds the synthetic Scopus and HAL dataframes sharing
+    'overlap_ratio' of their DOIs."""
+    # Local imports
+    import ScopusApyJson.saj_globals as saj_g  # pylint: disable=import-outside-toplevel
+
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(rows_nb * 2)
+    shared_nb = int(rows_nb * overlap_ratio)
+    scopus_ids = ids[:rows_nb]
+    hal_ids = np.concatenate([ids[:shared_nb], ids[rows_nb: 2 * rows_nb - shared_nb]])
+
+    scopus_dict = {}
+    for col in saj_g.SELECTED_SCOPUS_COLUMNS_NAMES:
+        scopus_dict[col] = _text_column(rng, SCOPUS_WIDTHS_DICT.get(col, 10), rows_nb)
+    scopus_dict["Year"] = np.full(rows_nb, 2023)
+    scopus_dict["Cited by"] = rng.integers(0, 200, rows_nb)
+    scopus_dict["DOI"] = [f"10.{1000 + i % 9000}/bench.{i}" for i in scopus_ids]
+    scopus_df = pd.DataFrame(scopus_dict)
+
+    hal_dict = {}
+    for col in HAL_COLUMNS_LIST:
+        hal_dict[col] = _text_column(rng, HAL_WIDTHS_DICT.get(col, 10), rows_nb)
+    hal_dict["DOI"] = [f"10.{1000 + i % 9000}/BENCH.{i}" for i in hal_ids]
+    hal_dict["Lien url"] = [f"https://hal.science/hal-{i:08d}" for i in hal_ids]
+    hal_df = pd.DataFrame(hal_dict)
+    return scopus_df, hal_df
+
+
+def _stub_apis(hal_df, not_found_ratio):
+    """Replaces the HAL and Scopus API requests by local stubs."""
+    scopus_columns_list = list(hts_sf.saj_g.SELECTED_SCOPUS_COLUMNS_NAMES)
+    not_found_modulo = int(1 / not_found_ratio) if not_found_ratio else 0
+
+    def _get_hal_df(hal_api, page_callback=None):
+        _ = hal_api
+        if page_callback is not None:
+            page_callback(hal_df)
+        return hal_df.copy(), True
+
+    def _get_doi_json_data(session, doi, timeout):
+        _ = session, timeout
+        if not_found_modulo and int(doi.rsplit(".", 1)[-1]) % not_found_modulo == 0:
+            return None, "Empty", None
+        return {"doi": doi[len("doi/"):]}, "True", None
+
+    def _parse_json_data_to_scopus_df(api_json_data):
+        row_dict = {col: "x" * SCOPUS_WIDTHS_DICT.get(col, 10) for col in scopus_columns_list}
+        row_dict["DOI"] = api_json_data["doi"]
+        return pd.DataFrame([row_dict], columns=scopus_columns_list)
+
+    hts_hf._get_hal_df = _get_hal_df
+    hts_sf._get_doi_json_data = _get_doi_json_data
+    hts_sf.update_api_uses_nb = lambda requests_nb: None
+    hts_sf.saj.parse_json_data_to_scopus_df = _parse_json_data_to_scopus_df
+    hts_pg.SCOPUS_RATE_LIMIT = 1e9
+    # The HAL stub returns the whole extraction whatever the query slice
+    hts_pg.HAL_WORKERS_NB = 1
+
+
+def run_size(rows_nb, overlap_ratio, not_found_ratio, output_format, pipelined=False):
+    """Runs the consolidation on a synthetic corpus of 'rows_nb' rows
+    and returns the measures as a dict."""
+    corpus_year = "2023"
+    hts_pg.OUTPUT_FORMAT = output_format
+    with tempfile.TemporaryDirectory() as working_folder:
+        haltoscopus_path = Path(working_folder)
+        year_path = haltoscopus_path / Path(corpus_year)
+        year_path.mkdir()
+        files_tup = set_files_tup(corpus_year)
+
+        setup_start = time.perf_counter()
+        scopus_df, hal_df = _build_corpora(rows_nb, overlap_ratio)
+        scopus_df.to_csv(year_path / Path(files_tup[0] + ".csv"), index=False)
+        del scopus_df
+        _stub_apis(hal_df, not_found_ratio)
+        setup_duration = time.perf_counter() - setup_start
+
+        if resource is None:
+            tracemalloc.start()
+        sampler = _RssSampler()
+        run_report = _BenchReport(sampler)
+        start_rss = _read_rss_bytes()
+        start = time.perf_counter()
+        consolidate_scopus("Liten", haltoscopus_path, corpus_year, files_tup,
+                           run_report=run_report, pipelined=pipelined)
+        total_duration = time.perf_counter() - start
+        sampler.stop()
+
+    report_dict = run_report.to_dict()
+    stages_dict = {}
+    for name, stage_dict in report_dict["stages"].items():
+        duration = stage_dict["duration_s"]
+        rows_per_s = None
+        if stage_dict["rows_nb"] is not None and duration > 0:
+            rows_per_s = round(stage_dict["rows_nb"] / duration, 1)
+        stages_dict[name] = {"duration_s": duration,
+                             "rows_nb": stage_dict["rows_nb"],
+                             "bytes_nb": stage_dict["bytes_nb"],
+                             "rows_per_s": rows_per_s,
+                             "peak_rss_bytes": stage_dict.get("peak_rss_bytes")}
+    return {"rows_nb": rows_nb,
+            "setup_duration_s": round(setup_duration, 6),
+            "total_duration_s": round(total_duration, 6),
+            "rows_per_s": round(rows_nb / total_duration, 1),
+            "start_rss_bytes": start_rss,
+            "peak_rss_bytes": _read_peak_rss_bytes(),
+            "requested_dois_nb": report_dict.get("requested_dois_nb"),
+            "failed_dois_nb": report_dict.get("failed_dois_nb"),
+            "stages": stages_dict}
+
+
+def _run_size_in_process(rows_nb, args):
+    """Runs the benchmark of one size in a separate process."""
+    package_path = str(Path(__file__).resolve().parents[1])
+    child_env = dict(os.environ)
+    child_env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_path,
+                                                           child_env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, __file__, "--child",
+                             "--rows", str(rows_nb),
+                             "--overlap", str(args.overlap),
+                             "--not-found", str(args.not_found),
+                             "--output-format", args.output_format]
+                            + (["--pipelined"] if args.pipelined else []),
+                            cwd=package_path, env=child_env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(args):
+    """Runs the benchmark for each rows number and returns the results dict."""
+    rows_list = [int(rows_nb) for rows_nb in args.rows.split(",")]
+    results_list = []
+    for rows_nb in rows_list:
+        size_dict = _run_size_in_process(rows_nb, args)
+        print(f"{rows_nb} rows: {size_dict['total_duration_s']:.2f} s, "
+              f"{size_dict['rows_per_s']:.0f} rows/s, "
+              f"peak RSS {size_dict['peak_rss_bytes'] / 2**20:.0f} MiB")
+        for name, stage_dict in size_dict["stages"].items():
+            print(f"    {name}: {stage_dict['duration_s']:.3f} s, "
+                  f"peak RSS {(stage_dict['peak_rss_bytes'] or 0) / 2**20:.0f} MiB")
+        results_list.append(size_dict)
+    return {"schema_version": SCHEMA_VERSION,
+            "benchmark": "consolidation",
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "htsfuncts_version": htsfuncts.__version__,
+            "python_version": platform.python_version(),
+            "pandas_version": pd.__version__,
+            "platform": platform.platform(),
+            "parameters": {"overlap_ratio": args.overlap,
+                           "not_found_ratio": args.not_found,
+                           "output_format": args.output_format,
+                           "pipelined": args.pipelined},
+            "results": results_list}
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default=",".join(str(nb) for nb in DEFAULT_ROWS_LIST),
+                        help="comma separated rows numbers of the corpora")
+    parser.add_argument("--overlap", type=float, default=0.8,
+                        help="ratio of the HAL DOIs present in the Scopus extraction")
+    parser.add_argument("--not-found", type=float, default=0.1,
+                        help="ratio of the requested DOIs not found by the Scopus API")
+    parser.add_argument("--output-format", default=hts_pg.OUTPUT_FORMAT,
+                        choices=hts_pg.OUTPUT_FORMATS_LIST)
+    parser.add_argument("--pipelined", action="store_true",
+                        help="runs the pipelined consolidation")
+    parser.add_argument("--output", default="bench_consolidation.json",
+                        help="json file of the results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser
+
+
+if __name__ == "__main__":
+    ARGS = _build_parser().parse_args()
+    if ARGS.child:
+        print(json.dumps(run_size(int(ARGS.rows), ARGS.overlap, ARGS.not_found,
+                                  ARGS.output_format, ARGS.pipelined), sort_keys=True))
+    else:
+        RESULTS_DICT = run_benchmark(ARGS)
+        with open(ARGS.output, "w", encoding="utf-8") as FILE:
+            json.dump(RESULTS_DICT, FILE, indent=4, sort_keys=True)
+        print(f"Results saved in {ARGS.output}")
@@ -0,0 +1,85 @@
+"""Benchmark of the vectorized DOIs normalization and sets differences
+of the `doi_functs` module against the same normalization done
+by Python-level loops and against the former list-comprehension approach.
+
+Usage: python benchmarks/bench_doi_functs.py [rows number]
+"""
+
+# Standard library imports
+import re
+import sys
+import time
+from pathlib import Path
+
+# 3rd party imports
+import numpy as np
+import pandas as pd
+
+# Making the package importable when run from the repository folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Local imports
+from htsfuncts.doi_functs import set_dois_differences  # pylint: disable=wrong-import-position
+
+
+def _build_dois(rows_nb, overlap_ratio=0.9, seed=0):
+    """Builds HAL and Scopus DOIs series with various prefixes and cases."""
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(rows_nb * 2)
+    scopus_dois = pd.Series([f"10.{1000 + i % 9000}/Art.{i}" for i in ids[:rows_nb]])
+    shared_nb = int(rows_nb * overlap_ratio)
+    hal_ids = np.concatenate([ids[:shared_nb], ids[rows_nb: 2 * rows_nb - shared_nb]])
+    prefixes = np.array(["", "https://doi.org/", "doi:", " "])
+    hal_prefixes = prefixes[rng.integers(0, len(prefixes), len(hal_ids))]
+    hal_dois = pd.Series([f"{prefix}10.{1000 + i % 9000}/art.{i}"
+                          for prefix, i in zip(hal_prefixes, hal_ids)])
+    return hal_dois, scopus_dois
+
+
+def _loop_differences(hal_dois, scopus_dois):
+    prefix_regex = re.compile(r"^(?:https?://)?(?:dx\.)?doi\.org/|^doi:\s*|^doi/")
+    trailing_regex = re.compile(r"[\s.,;:]+$")
+
+    def _normalize(doi):
+        doi = trailing_regex.sub("", prefix_regex.sub("", str(doi).strip().lower()))
+        return doi if doi.startswith("10.") else None
+
+    hal_doi_set = {_normalize(doi) for doi in hal_dois.tolist()} - {None}
+    scopus_dois_set = {_normalize(doi) for doi in scopus_dois.tolist()} - {None}
+    return sorted(hal_doi_set - scopus_dois_set), sorted(scopus_dois_set - hal_doi_set)
+
+
+def _former_differences(hal_dois, scopus_dois):
+    scopus_dois_set = {str(doi).lower() for doi in scopus_dois.tolist()}
+    hal_doi_set = {doi.lower() for doi in set(hal_dois.tolist())}
+    return hal_doi_set - scopus_dois_set, scopus_dois_set - hal_doi_set
+
+
+def run_benchmark(rows_nb):
+    """Prints the times of the vectorized and former DOIs sets differences."""
+    hal_dois, scopus_dois = _build_dois(rows_nb)
+
+    start = time.perf_counter()
+    hal_not_scopus_index, scopus_not_hal_index = set_dois_differences(hal_dois, scopus_dois)
+    vectorized_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loop_hal_not_scopus, _ = _loop_differences(hal_dois, scopus_dois)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    former_hal_not_scopus, _ = _former_differences(hal_dois, scopus_dois)
+    former_time = time.perf_counter() - start
+
+    print(f"Rows number: {rows_nb}")
+    print(f"Vectorized: {vectorized_time:.2f} s, "
+          f"{len(hal_not_scopus_index)} HAL not Scopus, "
+          f"{len(scopus_not_hal_index)} Scopus not HAL")
+    print(f"Python loops: {loop_time:.2f} s, "
+          f"{len(loop_hal_not_scopus)} HAL not Scopus")
+    print(f"Former: {former_time:.2f} s, "
+          f"{len(former_hal_not_scopus)} HAL not Scopus (prefixed DOIs not matched)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,419 @@
+"""Local stand-in of the HAL search API and of the Scopus abstract API
+serving fixture data for offline load testing of the consolidation.
+
+The latency, the error rate, the HTTP 429 throttling rate and the
+authentication failure are configurable. The consolidation is pointed
+at the server through the HAL_BASE_URL, SCOPUS_BASE_URL and
+SCOPUS_SEARCH_BASE_URL globals or through the HTS_HAL_BASE_URL,
+HTS_SCOPUS_BASE_URL and HTS_SCOPUS_SEARCH_BASE_URL environment
+variables printed at the server start.
+
+Routes:
+    /hal/search/<gate>/?q=...&fq=...: HAL search API (rows, start, cursorMark, fl, fq),
+    /scopus/content/abstract/doi/<doi>: Scopus abstract API,
+    /scopus/content/search/scopus?query=DOI(a) OR DOI(b)&count=...: Scopus search API,
+    /stats: json counts of the served requests by route and status.
+
+Usage: python benchmarks/mock_api_server.py [--port 8765] [--latency 0.05]
+       [--jitter 0.02] [--error-rate 0.01] [--throttle-rate 0.05]
+       [--retry-after 1] [--auth-fail] [--docs-nb 1000] [--scopus-ratio 0.7]
+       [--fixtures fixtures.json]
+
+The fixtures json file, if given, is a dict with the "hal_docs" list of the
+HAL documents (dicts keyed by HAL fields) and the "scopus_abstracts" dict of
+the Scopus abstract API responses keyed by lowered DOI.
+"""
+
+# Standard library imports
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+# Routes prefixes of the mocked APIs
+HAL_ROUTE = "/hal/search/"
+SCOPUS_ROUTE = "/scopus/content/abstract/"
+SCOPUS_SEARCH_ROUTE = "/scopus/content/search/scopus"
+STATS_ROUTE = "/stats"
+
+# HAL document types served by the synthetic fixtures
+_DOC_TYPES_LIST = ["ART", "COMM", "COUV", "OUV", "DOUV", "POSTER"]
+
+# Filter query of the form 'field:[low TO high]', 'field:(A OR B)' or 'field:value'
+_RANGE_PATTERN = re.compile(r"^(\w+):\[(.+) TO (.+)\]$")
+_CHOICES_PATTERN = re.compile(r"^(\w+):\((.+)\)$")
+_VALUE_PATTERN = re.compile(r"^(\w+):(.+)$")
+
+# Scopus search query term of a DOI
+_DOI_TERM_PATTERN = re.compile(r"DOI\(([^)]*)\)")
+
+
+def build_hal_doc(doc_id, year, institute, doi):
+    """Builds a synthetic HAL document with the fields of the HalApyJson queries."""
+    return {"label_s": f"Doe J. Mock publication {doc_id}. Mock journal, {year}",
+            "authFullName_s": ["John Doe", "Jane Roe"],
+            "title_s": [f"Mock publication {doc_id}"],
+            "producedDateY_i": int(year),
+            "publicationDate_s": f"{year}-01-01",
+            "journalTitle_s": "Mock journal",
+            "volume_s": "1",
+            "number_s": "1",
+            "page_s": "1-10",
+            "doiId_s": doi,
+            "uri_s": f"https://hal.science/hal-{doc_id:08d}",
+            "keyword_s": ["mock", "benchmark"],
+            "labStructAcronym_s": ["LAB"],
+            "structAcronym_s": [institute.upper(), "CEA"],
+            "deptStructAcronym_s": ["DEPT"],
+            "instStructAcronym_s": ["CEA"],
+            "docType_s": _DOC_TYPES_LIST[doc_id % len(_DOC_TYPES_LIST)],
+            "language_t": "en",
+            "journalIssn_s": "1234-5678",
+            "journalEissn_s": "8765-4321",
+            "country_s": "fr",
+            "modifiedDate_tdate": f"{year}-06-01T00:00:00Z"}
+
+
+def build_scopus_abstract(doc_id, year, doi):
+    """Builds a synthetic Scopus abstract API response parsable
+    by the ScopusApyJson package."""
+    author_dict = {"@auid": str(10000 + doc_id),
+                   "preferred-name": {"ce:indexed-name": "Doe J.",
+                                      "ce:surname": "Doe",
+                                      "ce:given-name": "John"}}
+    affiliation_dict = {"organization": [{"$": "Mock laboratory"}],
+                        "city": "Grenoble", "country": "France"}
+    return {"abstracts-retrieval-response": {
+        "coredata": {"dc:title": f"Mock publication {doc_id}",
+                     "prism:doi": doi,
+                     "eid": f"2-s2.0-{doc_id}",
+                     "subtypeDescription": "Article",
+                     "citedby-count": str(doc_id % 50),
+                     "dc:publisher": "Mock publisher",
+                     "link": [{"@rel": "scopus",
+                               "@href": f"https://www.scopus.com/record/{doc_id}"}]},
+        "authors": {"author": [author_dict]},
+        "item": {"bibrecord": {"head": {
+            "author-group": {"affiliation": affiliation_dict,
+                             "author": [author_dict]},
+            "source": {"sourcetitle": "Mock journal",
+                       "publicationyear": {"@first": str(year)},
+                       "publicationdate": {"year": str(year), "month": "01"},
+                       "volisspag": {"voliss": {"@volume": "1", "@issue": "1"},
+                                     "pagerange": {"@first": "1", "@last": "10"}}}}}}}}
+
+
+def build_scopus_search_entry(abstract):
+    """Builds the Scopus search API entry of a Scopus abstract API response."""
+    abstract_dict = abstract["abstracts-retrieval-response"]
+    coredata_dict = abstract_dict["coredata"]
+    head_dict = abstract_dict["item"]["bibrecord"]["head"]
+    source_dict = head_dict["source"]
+    affiliation_dict = head_dict["author-group"]["affiliation"]
+    voliss_dict = source_dict["volisspag"]["voliss"]
+    pagerange_dict = source_dict["volisspag"]["pagerange"]
+    return {"dc:title": coredata_dict["dc:title"],
+            "prism:doi": coredata_dict["prism:doi"],
+            "eid": coredata_dict["eid"],
+            "subtypeDescription": coredata_dict["subtypeDescription"],
+            "citedby-count": coredata_dict["citedby-count"],
+            "link": [{"@ref": "scopus", "@href": link_dict["@href"]}
+                     for link_dict in coredata_dict["link"]],
+            "prism:coverDate": f"{source_dict['publicationyear']['@first']}-01-01",
+            "prism:publicationName": source_dict["sourcetitle"],
+            "prism:volume": voliss_dict["@volume"],
+            "prism:issueIdentifier": voliss_dict["@issue"],
+            "prism:pageRange": f"{pagerange_dict['@first']}-{pagerange_dict['@last']}",
+            "affiliation": [{"afid": "1",
+                             "affilname": affiliation_dict["organization"][0]["$"],
+                             "affiliation-city": affiliation_dict["city"],
+                             "affiliation-country": affiliation_dict["country"]}],
+            "author": [{"authid": author_dict["@auid"],
+                        "authname": author_dict["preferred-name"]["ce:indexed-name"],
+                        "surname": author_dict["preferred-name"]["ce:surname"],
+                        "given-name": author_dict["preferred-name"]["ce:given-name"],
+                        "afid": [{"$": "1"}]}
+                       for author_dict in abstract_dict["authors"]["author"]]}
+
+
+def build_fixtures(docs_nb, year="2023", institute="LITEN", scopus_ratio=0.7, seed=0):
+    """Builds the synthetic fixtures of 'docs_nb' HAL documents of which
+    'scopus_ratio' are known by the Scopus abstract API."""
+    rng = random.Random(seed)
+    hal_docs_list = []
+    scopus_abstracts_dict = {}
+    for doc_id in range(docs_nb):
+        doi = f"10.{1000 + doc_id % 9000}/mock.{doc_id}"
+        hal_docs_list.append(build_hal_doc(doc_id, year, institute, doi))
+        if rng.random() < scopus_ratio:
+            scopus_abstracts_dict[doi] = build_scopus_abstract(doc_id, year, doi)
+    return {"hal_docs": hal_docs_list, "scopus_abstracts": scopus_abstracts_dict}
+
+
+def _match_filter(doc, filter_query):
+    """Returns True if the HAL document 'doc' matches the filter query."""
+    filter_query = filter_query.strip()
+    range_match = _RANGE_PATTERN.match(filter_query)
+    if range_match:
+        field, low, high = range_match.groups()
+        value = doc.get(field)
+        if value is None:
+            return False
+        value = str(value)
+        return (low in ("*", "NOW") or value >= low) and (high in ("*", "NOW") or value <= high)
+    choices_match = _CHOICES_PATTERN.match(filter_query)
+    if choices_match:
+        field, choices = choices_match.groups()
+        choices_set = {choice.strip() for choice in choices.split(" OR ")}
+        values = doc.get(field)
+        values_list = values if isinstance(values, list) else [values]
+        return any(str(value) in choices_set for value in values_list)
+    value_match = _VALUE_PATTERN.match(filter_query)
+    if value_match:
+        field, expected = value_match.groups()
+        values = doc.get(field)
+        values_list = values if isinstance(values, list) else [values]
+        return any(str(value) == expected for value in values_list)
+    return True
+
+
+class MockApiServer:
+    """Threaded local HTTP server mocking the HAL and Scopus APIs.
+
+    Args:
+        fixtures_dict (dict): The "hal_docs" list and the "scopus_abstracts" \
+        dict served by the server.
+        host (str): The server host.
+        port (int): The server port (0 for a free port).
+        latency (float): The base latency in seconds of each response.
+        jitter (float): The maximum random latency in seconds added to 'latency'.
+        error_rate (float): The ratio of responses failed with HTTP 500.
+        throttle_rate (float): The ratio of responses throttled with HTTP 429.
+        retry_after (int): The Retry-After header in seconds of the 429 responses.
+        auth_fail (bool): If True, the Scopus requests fail with HTTP 401.
+        seed (int): The seed of the random failures.
+    """
+    def __init__(self, fixtures_dict, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1, auth_fail=False,
+                 seed=0):
+        self.hal_docs_list = fixtures_dict["hal_docs"]
+        self.scopus_abstracts_dict = {doi.lower(): abstract for doi, abstract
+                                      in fixtures_dict["scopus_abstracts"].items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.auth_fail = auth_fail
+        self.stats_counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._build_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """The base URL of the server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def hal_base_url(self):
+        """The URL to set as HAL_BASE_URL global."""
+        return self.base_url + HAL_ROUTE
+
+    @property
+    def scopus_base_url(self):
+        """The URL to set as SCOPUS_BASE_URL global."""
+        return self.base_url + SCOPUS_ROUTE
+
+    @property
+    def scopus_search_base_url(self):
+        """The URL to set as SCOPUS_SEARCH_BASE_URL global."""
+        return self.base_url + SCOPUS_SEARCH_ROUTE
+
+    def start(self):
+        """Starts the server in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _draw_failure(self):
+        """Returns the HTTP status of a random failure or None."""
+        with self._lock:
+            draw = self._random.random()
+            delay = self.latency + self._random.random() * self.jitter
+        time.sleep(delay)
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def _count(self, route, status):
+        with self._lock:
+            self.stats_counter[f"{route} {status}"] += 1
+
+    def search_hal(self, query_dict):
+        """Returns the HAL search API response for the query parameters."""
+        docs_list = [doc for doc in self.hal_docs_list
+                     if all(_match_filter(doc, filter_query)
+                            for filter_query in query_dict.get("fq", []))]
+        cursor_mark = query_dict.get("cursorMark", [None])[0]
+        start = int(query_dict.get("start", ["0"])[0])
+        if cursor_mark is not None:
+            start = 0 if cursor_mark == "*" else int(cursor_mark)
+        rows = int(query_dict.get("rows", ["30"])[0])
+        fields_list = [field for field in query_dict.get("fl", [""])[0].split(",") if field]
+        page_list = docs_list[start: start + rows]
+        if fields_list:
+            page_list = [{field: doc[field] for field in fields_list if field in doc}
+                         for doc in page_list]
+        response_dict = {"response": {"numFound": len(docs_list), "start": start,
+                                       "docs": page_list}}
+        if cursor_mark is not None:
+            response_dict["nextCursorMark"] = (str(start + len(page_list)) if page_list
+                                               else cursor_mark)
+        return response_dict
+
+    def search_scopus(self, query_dict):
+        """Returns the Scopus search API response for the query parameters."""
+        query = query_dict.get("query", [""])[0]
+        count = int(query_dict.get("count", ["25"])[0])
+        entries_list = []
+        for doi in _DOI_TERM_PATTERN.findall(query):
+            abstract = self.scopus_abstracts_dict.get(doi.strip().lower())
+            if abstract is not None:
+                entries_list.append(build_scopus_search_entry(abstract))
+        if not entries_list:
+            page_list = [{"@_fa": "true", "error": "Result set was empty"}]
+        else:
+            page_list = entries_list[:count]
+        return {"search-results": {"opensearch:totalResults": str(len(entries_list)),
+                                   "entry": page_list}}
+
+    def _build_handler(self):
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+            def _send_json(self, route, status, data=None, headers_dict=None):
+                server._count(route, status)  # pylint: disable=protected-access
+                body = json.dumps(data if data is not None else {}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers_dict or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                url = urlsplit(self.path)
+                path = unquote(url.path)
+                query_dict = parse_qs(url.query, keep_blank_values=True)
+                if path.startswith(STATS_ROUTE):
+                    self._send_json("stats", 200, dict(server.stats_counter))
+                    return
+                if path.startswith(HAL_ROUTE):
+                    route = "hal"
+                elif path.startswith(SCOPUS_SEARCH_ROUTE):
+                    route = "scopus_search"
+                elif path.startswith(SCOPUS_ROUTE):
+                    route = "scopus"
+                else:
+                    self._send_json("unknown", 404)
+                    return
+
+                failure_status = server._draw_failure()  # pylint: disable=protected-access
+                if failure_status == 429:
+                    self._send_json(route, 429, {"error": "Too many requests"},
+                                    {"Retry-After": str(server.retry_after)})
+                    return
+                if failure_status:
+                    self._send_json(route, failure_status, {"error": "Server error"})
+                    return
+
+                if route == "hal":
+                    self._send_json(route, 200, server.search_hal(query_dict))
+                    return
+                if server.auth_fail:
+                    self._send_json(route, 401, {"error": "Invalid API key"})
+                    return
+                if route == "scopus_search":
+                    self._send_json(route, 200, server.search_scopus(query_dict))
+                    return
+                doi = path[len(SCOPUS_ROUTE):]
+                doi = doi[len("doi/"):] if doi.startswith("doi/") else doi
+                abstract = server.scopus_abstracts_dict.get(doi.lower())
+                if abstract is None:
+                    self._send_json(route, 404, {"error": "Resource not found"})
+                    return
+                self._send_json(route, 200, abstract)
+
+        return _Handler
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--auth-fail", action="store_true")
+    parser.add_argument("--docs-nb", type=int, default=1000)
+    parser.add_argument("--year", default="2023")
+    parser.add_argument("--institute", default="Liten")
+    parser.add_argument("--scopus-ratio", type=float, default=0.7)
+    parser.add_argument("--fixtures", default=None, help="json file of the fixtures")
+    return parser
+
+
+if __name__ == "__main__":
+    ARGS = _build_parser().parse_args()
+    if ARGS.fixtures:
+        with open(ARGS.fixtures, encoding="utf-8") as FILE:
+            FIXTURES_DICT = json.load(FILE)
+    else:
+        FIXTURES_DICT = build_fixtures(ARGS.docs_nb, ARGS.year, ARGS.institute,
+                                       ARGS.scopus_ratio)
+    SERVER = MockApiServer(FIXTURES_DICT, host=ARGS.host, port=ARGS.port,
+                           latency=ARGS.latency, jitter=ARGS.jitter,
+                           error_rate=ARGS.error_rate, throttle_rate=ARGS.throttle_rate,
+                           retry_after=ARGS.retry_after, auth_fail=ARGS.auth_fail)
+    print(f"export HTS_HAL_BASE_URL={SERVER.hal_base_url}")
+    print(f"export HTS_SCOPUS_BASE_URL={SERVER.scopus_base_url}")
+    print(f"export HTS_SCOPUS_SEARCH_BASE_URL={SERVER.scopus_search_base_url}")
+    try:
+        SERVER.start()
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        SERVER.stop()
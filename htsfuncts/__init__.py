@@ -2,6 +2,92 @@ __version__ = '1.1.0'
 __author__  = 'BiblioMeter team'
 __license__ = 'MIT'
 
+# Standard library imports
+from importlib import import_module
+
+# Local imports
+from htsfuncts import institute_globals, pub_globals
 from htsfuncts.institute_globals import *
 from htsfuncts.pub_globals import *
-from htsfuncts.main_functs import *
\ No newline at end of file
+
+# Public objects of the modules imported at first use of one of them
+# through the `__getattr__` function, most of the modules loading pandas
+# and the API clients (to keep in line with the `__all__` of the modules)
+_LAZY_OBJECTS_DICT = {
+    'htsfuncts.folder_index': ['get_available_years',
+                               'is_folder_index_refreshing',
+                               'read_folder_index',
+                               'refresh_folder_index',
+                               'refresh_folder_index_in_background',
+                               'scan_working_folder',
+                              ],
+    'htsfuncts.doi_functs': ['normalize_dois',
+                             'set_dois_differences',
+                            ],
+    'htsfuncts.dtype_functs': ['compact_dtypes',
+                               'df_memory_bytes_nb',
+                               'replace_na',
+                              ],
+    'htsfuncts.fetch_journal': ['FetchJournal',
+                                'set_fetch_journal_path',
+                               ],
+    'htsfuncts.hal_fetch': ['build_hal_df_incrementally',
+                           ],
+    'htsfuncts.output_functs': ['read_output_df',
+                                'save_appended_csv',
+                                'save_output_df',
+                               ],
+    'htsfuncts.run_report': ['RunReport',
+                             'files_bytes_nb',
+                            ],
+    'htsfuncts.scopus_cache': ['get_cached_scopus_df',
+                               'get_negative_cached_dois',
+                               'set_scopus_cache_path',
+                               'update_negative_cache',
+                               'update_scopus_cache',
+                              ],
+    'htsfuncts.scopus_fetch': ['AdaptiveTimeout',
+                               'CircuitBreaker',
+                               'SharedTokenBucket',
+                               'TokenBucket',
+                               'build_scopus_df_concurrently',
+                               'defer_api_uses_nb',
+                               'parse_retry_after',
+                               'request_with_retries',
+                               'update_api_uses_nb',
+                              ],
+    'htsfuncts.scopus_search': ['build_scopus_df_by_search',
+                               ],
+    'htsfuncts.main_functs': ['compact_scopus_df',
+                              'consolidate_scopus',
+                              'prepare_hal_dois',
+                              'resolve_dois',
+                              'save_scopus_results',
+                              'save_unchanged_scopus',
+                              'set_files_tup',
+                             ],
+    'htsfuncts.batch_functs': ['consolidate_scopus_institutes',
+                               'consolidate_scopus_years',
+                              ],
+    }
+
+# Modules of the public objects imported at first use keyed by object name
+_LAZY_MODULES_DICT = {name: module_name
+                      for module_name, names_list in _LAZY_OBJECTS_DICT.items()
+                      for name in names_list}
+
+# Public objects exported by `from htsfuncts import *`, the objects
+# of `_LAZY_OBJECTS_DICT` being then imported through `__getattr__`
+__all__ = (institute_globals.__all__
+           + pub_globals.__all__
+           + list(_LAZY_MODULES_DICT))
+
+
+def __getattr__(name):
+    """Imports the module defining the public object 'name' at its first use."""
+    module_name = _LAZY_MODULES_DICT.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,223 @@
+"""Module of functions for consolidating in batch the Scopus extractions
+of several corpus years in parallel processes or of several institutes
+with a shared resolution of their DOIs."""
+
+__all__ = ['consolidate_scopus_institutes',
+           'consolidate_scopus_years',
+          ]
+
+
+# Standard library imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 3rd party imports
+import pandas as pd
+
+# Local imports
+import htsfuncts.institute_globals as hts_ig
+import htsfuncts.pub_globals as hts_pg
+from htsfuncts.doi_functs import normalize_dois
+from htsfuncts.dtype_functs import replace_na
+from htsfuncts.main_functs import compact_scopus_df
+from htsfuncts.main_functs import consolidate_scopus
+from htsfuncts.main_functs import prepare_hal_dois
+from htsfuncts.main_functs import resolve_dois
+from htsfuncts.main_functs import save_scopus_results
+from htsfuncts.main_functs import save_unchanged_scopus
+from htsfuncts.main_functs import set_files_tup
+from htsfuncts.run_report import RunReport
+from htsfuncts.scopus_cache import set_scopus_cache_path
+from htsfuncts.scopus_fetch import SharedTokenBucket
+from htsfuncts.scopus_fetch import TokenBucket
+from htsfuncts.scopus_fetch import defer_api_uses_nb
+from htsfuncts.scopus_fetch import update_api_uses_nb
+
+
+# Rate limiter shared by the worker processes (set by `_init_worker`)
+_WORKER_RATE_LIMITER = None
+
+
+def _init_worker(rate_limiter):
+    """Sets the rate limiter shared by the worker processes."""
+    global _WORKER_RATE_LIMITER  # pylint: disable=global-statement
+    _WORKER_RATE_LIMITER = rate_limiter
+
+
+def _consolidate_year(institute, haltoscopus_path, corpus_year, force_recheck=False):
+    """Consolidates the Scopus extraction of one year in a worker process,
+    returning the results tuple with the number of Scopus API requests
+    left to the parent process for the update of the ScopusApyJson
+    configuration json file."""
+    files_tup = set_files_tup(corpus_year)
+    init_scopus_file_path = Path(haltoscopus_path) / Path(corpus_year) \
+                            / Path(files_tup[0] + ".csv")
+    if not os.path.exists(init_scopus_file_path):
+        message = f"Scopus csv file '{files_tup[0]}.csv' not available"
+        return (message, False, False), 0
+    with defer_api_uses_nb() as api_uses_list:
+        try:
+            results_tup = consolidate_scopus(institute, haltoscopus_path, corpus_year,
+                                             files_tup, rate_limiter=_WORKER_RATE_LIMITER,
+                                             force_recheck=force_recheck)
+        except Exception as err:  # pylint: disable=broad-except
+            results_tup = (f"Consolidation failed: {err}", False, False)
+    return results_tup, api_uses_list[0]
+
+
+def consolidate_scopus_years(institute, haltoscopus_path, years_list, workers_nb=None,
+                             force_recheck=False):
+    """Consolidates the Scopus extractions of the years of 'years_list'
+    running each year in a separate process.
+
+    The Scopus API requests of all the processes are throttled
+    by a single rate limiter set at SCOPUS_RATE_LIMIT global requests
+    per second. Their number is saved once in the ScopusApyJson
+    configuration json file by the parent process.
+
+    Args:
+        institute (str): Institute name.
+        haltoscopus_path (path): Full path to working folder.
+        years_list (list): The 4 digits years (str) of the corpuses.
+        workers_nb (int): The number of worker processes \
+        (default: BATCH_WORKERS_NB global).
+        force_recheck (bool): If True, the DOIs recently not found in the Scopus \
+        database are requested again (default: False).
+    Returns:
+        (dict): The tuples (message (str), authentication status \
+        on Scopus database (bool), Scopus extraction update status (bool)) \
+        keyed by year.
+    """
+    if workers_nb is None:
+        workers_nb = hts_pg.BATCH_WORKERS_NB
+    workers_nb = max(1, min(workers_nb, len(years_list)))
+    rate_limiter = SharedTokenBucket(hts_pg.SCOPUS_RATE_LIMIT)
+
+    with ProcessPoolExecutor(max_workers=workers_nb,
+                             initializer=_init_worker,
+                             initargs=(rate_limiter,)) as executor:
+        futures_dict = {year: executor.submit(_consolidate_year, institute,
+                                              haltoscopus_path, year, force_recheck)
+                        for year in years_list}
+        results_dict = {year: future.result() for year, future in futures_dict.items()}
+    api_uses_nb = sum(api_uses_nb for _, api_uses_nb in results_dict.values())
+    if api_uses_nb:
+        update_api_uses_nb(api_uses_nb)
+    summary_dict = {year: results_tup for year, (results_tup, _) in results_dict.items()}
+    return summary_dict
+
+
+def _select_institute_results(scopus_tup, doi_list):
+    """Selects in the shared results tuple 'scopus_tup' the publications
+    information and the failed DOIs of the DOIs of 'doi_list'."""
+    scopus_df, failed_doi_df, authy_status = scopus_tup
+    norm_doi_index = pd.Index(normalize_dois(doi_list).dropna())
+    if not scopus_df.empty:
+        doi_mask = normalize_dois(scopus_df["DOI"]).isin(norm_doi_index).to_numpy()
+        scopus_df = scopus_df[doi_mask].copy()
+    failed_doi_df = failed_doi_df[failed_doi_df["DOI"].isin(doi_list)].copy()
+    return scopus_df, failed_doi_df, authy_status
+
+
+def consolidate_scopus_institutes(corpus_year, institutes_list=None,
+                                  working_folders_dict=None, rate_limiter=None,
+                                  force_recheck=False):
+    """Consolidates the Scopus extractions of the corpus year
+    of the institutes of 'institutes_list'.
+
+    The DOIs from HAL not in the initial Scopus extraction of all
+    the institutes are deduplicated and resolved once through the caches
+    of the institutes and the Scopus API. The results are then dispatched
+    to the working folder of each institute.
+
+    Args:
+        corpus_year (str): 4 digits year of the corpus.
+        institutes_list (list): The institutes names \
+        (default: INSTITUTES_LIST global).
+        working_folders_dict (dict): The full paths to the working folders \
+        keyed by institute (default: WORKING_FOLDERS_DICT global).
+        rate_limiter (TokenBucket): The rate limiter of the Scopus API \
+        requests (default: new limiter for this consolidation).
+        force_recheck (bool): If True, the DOIs recently not found in the Scopus \
+        database are requested again (default: False).
+    Returns:
+        (dict): The tuples (message (str), authentication status \
+        on Scopus database (bool), Scopus extraction update status (bool)) \
+        keyed by institute.
+    """
+    if institutes_list is None:
+        institutes_list = hts_ig.INSTITUTES_LIST
+    if working_folders_dict is None:
+        working_folders_dict = hts_ig.WORKING_FOLDERS_DICT
+    if rate_limiter is None:
+        rate_limiter = TokenBucket(hts_pg.SCOPUS_RATE_LIMIT)
+    files_tup = set_files_tup(corpus_year)
+
+    # Building DOIs list from HAL not in the initial scopus extraction
+    # for each institute
+    summary_dict = {}
+    prepared_dict = {}
+    reports_dict = {}
+    for institute in institutes_list:
+        haltoscopus_path = Path(working_folders_dict[institute])
+        init_scopus_file_path = haltoscopus_path / Path(corpus_year) \
+                                / Path(files_tup[0] + ".csv")
+        if not os.path.exists(init_scopus_file_path):
+            message = f"Scopus csv file '{files_tup[0]}.csv' not available"
+            summary_dict[institute] = (message, False, False)
+            continue
+        try:
+            reports_dict[institute] = RunReport(institute=institute, corpus_year=corpus_year)
+            prepared_dict[institute] = (haltoscopus_path,) + \
+                prepare_hal_dois(institute, haltoscopus_path, corpus_year, files_tup,
+                                 reports_dict[institute])
+        except Exception as err:  # pylint: disable=broad-except
+            summary_dict[institute] = (f"Consolidation failed: {err}", False, False)
+
+    # Resolving once the DOIs shared by the institutes
+    shared_doi_list = list(dict.fromkeys(doi for prepared_tup in prepared_dict.values()
+                                         for doi in prepared_tup[2]))
+    if shared_doi_list:
+        cache_paths_list = [set_scopus_cache_path(prepared_tup[0])
+                            for prepared_tup in prepared_dict.values()]
+        shared_report = RunReport(shared_dois_nb=len(shared_doi_list))
+        shared_scopus_tup = resolve_dois(cache_paths_list, shared_doi_list, shared_report,
+                                         rate_limiter=rate_limiter,
+                                         force_recheck=force_recheck)
+
+        # Compacting the shared publications information held
+        # until the results of all the institutes are saved
+        shared_scopus_df = compact_scopus_df(replace_na(shared_scopus_tup[0]),
+                                             shared_report)
+        shared_scopus_tup = (shared_scopus_df,) + shared_scopus_tup[1:]
+
+    # Saving the results of each institute in its working folder
+    for institute, prepared_tup in prepared_dict.items():
+        haltoscopus_path, message, doi_list, init_scopus_file_path = prepared_tup
+        year_haltoscopus_path = haltoscopus_path / Path(corpus_year)
+        run_report = reports_dict[institute]
+        try:
+            if not doi_list:
+                message = save_unchanged_scopus(message, files_tup, year_haltoscopus_path,
+                                                init_scopus_file_path, run_report)
+                summary_dict[institute] = (message, True, False)
+            elif not shared_scopus_tup[2]:
+                summary_dict[institute] = ("Scopus authentication failed", False, False)
+            else:
+                run_report.merge(shared_report)
+                scopus_tup = _select_institute_results(shared_scopus_tup, doi_list)
+                message, update_status = save_scopus_results(message, scopus_tup,
+                                                             files_tup,
+                                                             year_haltoscopus_path,
+                                                             init_scopus_file_path,
+                                                             run_report)
+                message += (f"\n\n{len(doi_list)} DOIs resolved among "
+                            f"{len(shared_doi_list)} DOIs shared by the institutes")
+                summary_dict[institute] = (message, True, update_status)
+            _, authy_status, update_status = summary_dict[institute]
+            run_report.set_info(authy_status=authy_status, update_status=update_status)
+            run_report.save(year_haltoscopus_path)
+        except Exception as err:  # pylint: disable=broad-except
+            summary_dict[institute] = (f"Consolidation failed: {err}", False, False)
+    return {institute: summary_dict[institute] for institute in institutes_list}
@@ -0,0 +1,134 @@
+"""Module of the headless command line interface of the Scopus extraction
+consolidation, usable without display for example from a cron job.
+
+Usage: haltoscopus consolidate --institute Liten --year 2023 [--folder PATH]
+                               [--force-recheck] [--fetch-mode {doi,search}]
+                               [--pipelined]
+
+The exit status encodes the consolidation status:
+    0: Scopus extraction updated,
+    1: Scopus extraction unchanged,
+    2: Scopus authentication failed,
+    3: consolidation not performed (missing file or error).
+"""
+
+__all__ = ['EXIT_AUTH_FAILED',
+           'EXIT_ERROR',
+           'EXIT_UNCHANGED',
+           'EXIT_UPDATED',
+           'main',
+          ]
+
+
+# Standard library imports
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+# Setting the exit status of the command line
+EXIT_UPDATED = 0
+EXIT_UNCHANGED = 1
+EXIT_AUTH_FAILED = 2
+EXIT_ERROR = 3
+
+
+def _set_exit_status(authy_status, update_status):
+    """Sets the exit status from the status returned
+    by the `consolidate_scopus` function."""
+    if not authy_status:
+        return EXIT_AUTH_FAILED
+    if not update_status:
+        return EXIT_UNCHANGED
+    return EXIT_UPDATED
+
+
+def _build_parser():
+    """Builds the parser of the command line arguments."""
+    parser = argparse.ArgumentParser(prog="haltoscopus",
+                                     description=("Complements Scopus extractions "
+                                                  "with the DOIs found in HAL"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    consolidate_parser = subparsers.add_parser("consolidate",
+                                               help=("consolidates the Scopus extraction "
+                                                     "of an institute for a corpus year"))
+    consolidate_parser.add_argument("--institute", required=True,
+                                    help="institute name as used in HAL")
+    consolidate_parser.add_argument("--year", required=True,
+                                    help="4 digits year of the corpus")
+    consolidate_parser.add_argument("--folder", default=None,
+                                    help=("full path to the working folder "
+                                          "(default: working folder of the institute)"))
+    consolidate_parser.add_argument("--force-recheck", action="store_true",
+                                    help=("requests again the DOIs recently "
+                                          "not found in the Scopus database"))
+    consolidate_parser.add_argument("--fetch-mode", choices=hts_pg.SCOPUS_FETCH_MODES_LIST,
+                                    default=None,
+                                    help=("one Scopus request per DOI or Scopus search "
+                                          "requests grouping DOIs "
+                                          f"(default: {hts_pg.SCOPUS_FETCH_MODE})"))
+    consolidate_parser.add_argument("--pipelined", action="store_true",
+                                    help=("overlaps the HAL extraction, the Scopus "
+                                          "requests and the files saving"))
+    return parser
+
+
+def _run_consolidate(args):
+    """Runs the `consolidate_scopus` function with the command line arguments
+    and returns the exit status."""
+    # Local imports done here so that the parsing of the arguments
+    # does not wait for the loading of the pandas package
+    # pylint: disable=import-outside-toplevel
+    import htsfuncts.institute_globals as hts_ig
+    from htsfuncts.main_functs import consolidate_scopus
+    from htsfuncts.main_functs import set_files_tup
+
+    folder = args.folder
+    if folder is None:
+        folder = hts_ig.WORKING_FOLDERS_DICT.get(args.institute)
+        if folder is None:
+            print(f"No default working folder for institute '{args.institute}'",
+                  file=sys.stderr)
+            return EXIT_ERROR
+    haltoscopus_path = Path(folder)
+    if args.fetch_mode is not None:
+        hts_pg.SCOPUS_FETCH_MODE = args.fetch_mode
+    files_tup = set_files_tup(args.year)
+    init_scopus_file_path = haltoscopus_path / Path(args.year) / Path(files_tup[0] + ".csv")
+    if not os.path.exists(init_scopus_file_path):
+        print(f"Scopus csv file '{files_tup[0]}.csv' not available "
+              f"in: {haltoscopus_path / Path(args.year)}", file=sys.stderr)
+        return EXIT_ERROR
+
+    try:
+        message, authy_status, update_status = consolidate_scopus(args.institute,
+                                                                  haltoscopus_path,
+                                                                  args.year, files_tup,
+                                                                  force_recheck=args.force_recheck,
+                                                                  pipelined=args.pipelined or None)
+    except Exception as err:  # pylint: disable=broad-except
+        print(f"Consolidation failed: {err}", file=sys.stderr)
+        return EXIT_ERROR
+    print(message.strip())
+    return _set_exit_status(authy_status, update_status)
+
+
+def main(argv=None):
+    """Entry point of the 'haltoscopus' command.
+
+    Args:
+        argv (list): The command line arguments (default: `sys.argv[1:]`).
+    Returns:
+        (int): The exit status.
+    """
+    args = _build_parser().parse_args(argv)
+    if args.command == "consolidate":
+        return _run_consolidate(args)
+    return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
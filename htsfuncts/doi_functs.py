@@ -0,0 +1,70 @@
+"""Module of vectorized functions for normalizing DOIs and computing
+the differences between the DOIs sets of HAL and Scopus extractions."""
+
+__all__ = ['normalize_dois',
+           'set_dois_differences',
+          ]
+
+
+# Standard library imports
+from importlib.util import find_spec
+
+# 3rd party imports
+import pandas as pd
+
+
+# Prefixes of DOIs found in the extractions and in the Scopus API queries
+_DOI_PREFIX_PATTERN = r"^(?:https?://)?(?:dx\.)?doi\.org/|^doi:\s*|^doi/"
+
+# Trailing punctuation and spaces left by copy-paste of DOIs
+_DOI_TRAILING_PATTERN = r"[\s.,;:]+$"
+
+# String dtype backed by the pyarrow compute kernels if available
+_STRING_DTYPE = "string[pyarrow]" if find_spec("pyarrow") is not None else "string"
+
+
+def normalize_dois(dois):
+    """Canonicalizes DOIs in bulk using pandas string methods.
+
+    The DOIs are stripped, lowered and cleaned from resolver prefixes
+    ("https://doi.org/", "doi:", "doi/") and from trailing punctuation.
+    Values that are not DOIs (not starting by "10.") are set to NA.
+
+    Args:
+        dois (list or series or index): The DOIs to normalize.
+    Returns:
+        (series): The normalized DOIs with the same index as 'dois' \
+        when 'dois' is a series.
+    """
+    if not isinstance(dois, pd.Series):
+        dois = pd.Series(dois, dtype=object)
+    norm_dois = (dois.astype(_STRING_DTYPE)
+                 .str.strip()
+                 .str.lower()
+                 .str.replace(_DOI_PREFIX_PATTERN, "", regex=True)
+                 .str.replace(_DOI_TRAILING_PATTERN, "", regex=True))
+    norm_dois = norm_dois.where(norm_dois.str.startswith("10.", na=False))
+    return norm_dois
+
+
+def set_dois_differences(hal_dois, scopus_dois):
+    """Computes in bulk the normalized DOIs of HAL not in Scopus
+    and the normalized DOIs of Scopus not in HAL.
+
+    Args:
+        hal_dois (list or series or index): The DOIs of the HAL extraction.
+        scopus_dois (list or series or index): The DOIs of the Scopus extraction.
+    Returns:
+        (tup): (sorted index of the normalized DOIs of HAL not in Scopus, \
+        sorted index of the normalized DOIs of Scopus not in HAL).
+    """
+    hal_unique = normalize_dois(hal_dois).dropna().drop_duplicates()
+    scopus_unique = normalize_dois(scopus_dois).dropna().drop_duplicates()
+
+    # Flagging in a single hashing pass the DOIs present in both sets
+    shared_mask = pd.concat([hal_unique, scopus_unique],
+                            ignore_index=True).duplicated(keep=False).to_numpy()
+    hal_nb = len(hal_unique)
+    hal_not_scopus_index = pd.Index(hal_unique[~shared_mask[:hal_nb]]).sort_values()
+    scopus_not_hal_index = pd.Index(scopus_unique[~shared_mask[hal_nb:]]).sort_values()
+    return hal_not_scopus_index, scopus_not_hal_index
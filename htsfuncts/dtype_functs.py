@@ -0,0 +1,109 @@
+"""Module of functions for managing the missing values and the dtypes
+of the dataframes of the HAL and Scopus extractions."""
+
+__all__ = ['compact_dtypes',
+           'df_memory_bytes_nb',
+           'replace_na',
+          ]
+
+
+# 3rd party imports
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+from pandas.api.types import is_string_dtype
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+def replace_na(init_df):
+    """Replaces in place the NAN and "NA" values by the UNKNOWN global
+    in the text columns of the dataframe 'init_df'.
+
+    The columns are processed one by one so that no full copy
+    of the dataframe is made. The numeric columns keep their dtypes
+    and their missing values, and real zero values are kept.
+
+    Args:
+        init_df (dataframe): The dataframe to process.
+    Returns:
+        (dataframe): The processed dataframe 'init_df'.
+    """
+    for col in init_df.columns:
+        col_series = init_df[col]
+        if not is_string_dtype(col_series.dtype):
+            continue
+        na_mask = col_series.isna() | col_series.eq("NA").fillna(False).astype(bool)
+        if na_mask.any():
+            init_df.loc[na_mask, col] = hts_pg.UNKNOWN
+    return init_df
+
+
+def df_memory_bytes_nb(init_df):
+    """Returns the memory size in bytes of the dataframe 'init_df'
+    including the contents of its object columns."""
+    return int(init_df.memory_usage(deep=True).sum())
+
+
+def _to_compact_integers(col_series):
+    """Converts the series 'col_series' to the smallest integer dtype
+    holding its values, returns None if one of its values is missing
+    or is not an integer written in its canonical form so that
+    the conversion is lossless."""
+    if is_integer_dtype(col_series.dtype):
+        return pd.to_numeric(col_series, downcast="integer")
+    numeric_series = pd.to_numeric(col_series, errors="coerce")
+    if numeric_series.isna().any() or not (numeric_series % 1 == 0).all():
+        return None
+    int_series = numeric_series.astype("int64")
+    if not (int_series.astype(str).to_numpy() == col_series.astype(str).to_numpy()).all():
+        return None
+    return pd.to_numeric(int_series, downcast="integer")
+
+
+def compact_dtypes(init_df, dtypes_schema=None, category_max_ratio=None):
+    """Converts in place the columns of the dataframe 'init_df' to compact dtypes
+    as set by the schema 'dtypes_schema'.
+
+    The "category" columns are converted to categoricals if their ratio
+    of distinct values does not exceed 'category_max_ratio'. The "integer"
+    columns are converted to the smallest integer dtype holding their values
+    if all their values are integers, the other columns being left unchanged.
+    The conversions are lossless so that the saved files are unchanged.
+
+    Args:
+        init_df (dataframe): The dataframe to process.
+        dtypes_schema (dict): The compact dtypes ("category" or "integer") \
+        keyed by column name (default: SCOPUS_DTYPES_SCHEMA global).
+        category_max_ratio (float): Maximum ratio of distinct values \
+        of the columns converted to categoricals \
+        (default: CATEGORY_MAX_RATIO global).
+    Returns:
+        (tup): (the processed dataframe 'init_df', memory size in bytes \
+        before compaction (int), memory size in bytes after compaction (int)).
+    """
+    if dtypes_schema is None:
+        dtypes_schema = hts_pg.SCOPUS_DTYPES_SCHEMA
+    if category_max_ratio is None:
+        category_max_ratio = hts_pg.CATEGORY_MAX_RATIO
+    init_bytes_nb = df_memory_bytes_nb(init_df)
+    if init_df.empty:
+        return init_df, init_bytes_nb, init_bytes_nb
+
+    rows_nb = len(init_df)
+    for col, compact_dtype in dtypes_schema.items():
+        if col not in init_df.columns:
+            continue
+        col_series = init_df[col]
+        if compact_dtype == "category":
+            if (not isinstance(col_series.dtype, pd.CategoricalDtype)
+                    and col_series.nunique(dropna=False) <= category_max_ratio * rows_nb):
+                init_df[col] = col_series.astype("category")
+        elif compact_dtype == "integer":
+            int_series = _to_compact_integers(col_series)
+            if int_series is not None:
+                init_df[col] = int_series
+        else:
+            raise ValueError(f"Compact dtype '{compact_dtype}' of column '{col}' "
+                             "not in ['category', 'integer']")
+    return init_df, init_bytes_nb, df_memory_bytes_nb(init_df)
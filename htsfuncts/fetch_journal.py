@@ -0,0 +1,164 @@
+"""Module of the append-only journal of the DOIs resolved through
+the Scopus API during a consolidation run, allowing an interrupted run
+to be resumed without requesting again the DOIs already resolved.
+
+The journal is a json lines file stored in the working folder of the
+corpus year, one line being appended for each resolved DOI. It is removed
+at the end of a complete run so that its presence marks an unfinished run.
+"""
+
+__all__ = ['FetchJournal',
+           'set_fetch_journal_path',
+          ]
+
+
+# Standard library imports
+import json
+import os
+import threading
+from pathlib import Path
+
+# 3rd party imports
+import pandas as pd
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+# Fail reasons of the journal entries reused when resuming a run,
+# the other failures (timeouts, connection errors...) being requested again
+_RESUMED_FAIL_REASONS = ["Not found"]
+
+
+def set_fetch_journal_path(year_haltoscopus_path):
+    """Sets the full path to the fetch journal of the working folder
+    of the corpus year.
+
+    Args:
+        year_haltoscopus_path (path): Full path to the working folder \
+        of the corpus year.
+    Returns:
+        (path): Full path to the fetch journal.
+    """
+    return Path(year_haltoscopus_path) / Path(hts_pg.FETCH_JOURNAL_FILE)
+
+
+class FetchJournal:
+    """Thread-safe append-only journal of the DOIs resolved
+    through the Scopus API.
+
+    The publications information entries record the fetch mode of the
+    Scopus API requests, the partial entries got through the Scopus Search API
+    being not resumed in the per-DOI fetch mode.
+
+    Args:
+        journal_path (path): Full path to the journal file.
+        fetch_mode (str): The fetch mode of the Scopus API requests among \
+        SCOPUS_FETCH_MODES_LIST global (default: SCOPUS_FETCH_MODE global).
+    """
+    def __init__(self, journal_path, fetch_mode=None):
+        if fetch_mode is None:
+            fetch_mode = hts_pg.SCOPUS_FETCH_MODE
+        self.journal_path = Path(journal_path)
+        self.fetch_mode = fetch_mode
+        self._lock = threading.Lock()
+        self._file = None
+
+    def exists(self):
+        """Returns True if the journal of an unfinished run exists."""
+        return self.journal_path.exists()
+
+    def _read_entries(self):
+        """Returns the dict of the journal entries keyed by DOI,
+        skipping the last line if truncated by an interruption."""
+        entries_dict = {}
+        if not self.exists():
+            return entries_dict
+        with open(self.journal_path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry_dict = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries_dict[entry_dict["doi"]] = entry_dict
+        return entries_dict
+
+    def get_resolved(self, doi_list):
+        """Gets the publications information and the failures recorded
+        in the journal for the DOIs of 'doi_list'.
+
+        Args:
+            doi_list (list): The list of DOIs (str) as passed to the Scopus API.
+        Returns:
+            (tup): (dataframe of the journaled publications information, \
+            dataframe of the journaled failed DOIs with the reasons of their fail, \
+            list of the DOIs of 'doi_list' still to be requested).
+        """
+        entries_dict = self._read_entries()
+        served_modes_list = hts_pg.SCOPUS_SERVED_FETCH_MODES_DICT[self.fetch_mode]
+        rows_list = []
+        failed_list = []
+        missing_doi_list = []
+        for doi in doi_list:
+            entry_dict = entries_dict.get(doi)
+            if entry_dict is None:
+                missing_doi_list.append(doi)
+            elif "row" in entry_dict:
+                if entry_dict.get("fetch_mode", "doi") in served_modes_list:
+                    rows_list.append(entry_dict["row"])
+                else:
+                    missing_doi_list.append(doi)
+            elif entry_dict["fail_reason"] in _RESUMED_FAIL_REASONS:
+                failed_list.append([doi, entry_dict["fail_reason"]])
+            else:
+                missing_doi_list.append(doi)
+        journal_scopus_df = pd.DataFrame(rows_list)
+        journal_failed_df = pd.DataFrame(failed_list, columns=["DOI", "Fail reason"])
+        return journal_scopus_df, journal_failed_df, missing_doi_list
+
+    def append(self, doi, scopus_df, fail_reason):
+        """Appends the publication information 'scopus_df' or the fail reason
+        'fail_reason' of the DOI 'doi' to the journal.
+
+        The signature is the one of the 'result_callback' argument
+        of the `build_scopus_df_concurrently` function.
+        """
+        if scopus_df is not None:
+            entry_dict = {"doi": doi, "row": scopus_df.to_dict(orient="records")[0],
+                          "fetch_mode": self.fetch_mode}
+        else:
+            entry_dict = {"doi": doi, "fail_reason": fail_reason}
+        line = json.dumps(entry_dict, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = self._open()
+            self._file.write(line)
+            self._file.flush()
+
+    def _open(self):
+        """Opens the journal for appending, ending first
+        a line truncated by an interruption."""
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        truncated_status = False
+        if self.exists() and os.path.getsize(self.journal_path):
+            with open(self.journal_path, "rb") as journal_file:
+                journal_file.seek(-1, os.SEEK_END)
+                truncated_status = journal_file.read(1) != b"\n"
+        # pylint: disable-next=consider-using-with
+        journal_file = open(self.journal_path, "a", encoding="utf-8")
+        if truncated_status:
+            journal_file.write("\n")
+        return journal_file
+
+    def close(self):
+        """Closes the journal file keeping it for resuming the run."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """Closes and removes the journal at the end of a complete run."""
+        self.close()
+        if self.exists():
+            os.remove(self.journal_path)
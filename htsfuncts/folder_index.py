@@ -0,0 +1,261 @@
+"""Module of the local index of the working folders listing the years
+folders with the presence and the modification times of the files
+of the FILES_BASE global of each year.
+
+The index is stored in the FOLDERS_INDEX_FILE global local json file
+so that it is served at once even when the working folder is on a slow
+network share. It is refreshed in a background thread, the listing
+of a year folder being reused when the modification time of the folder
+is unchanged.
+"""
+
+__all__ = ['get_available_years',
+           'is_folder_index_refreshing',
+           'read_folder_index',
+           'refresh_folder_index',
+           'refresh_folder_index_in_background',
+           'scan_working_folder',
+          ]
+
+
+# Standard library imports
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+# Lock of the reads and writes of the index file and of the refresh threads
+_INDEX_LOCK = threading.Lock()
+
+# Running background refresh threads keyed by working folder
+_REFRESH_THREADS_DICT = {}
+
+
+def _set_folder_key(haltoscopus_path):
+    """Sets the key of the working folder in the index file
+    as its absolute path."""
+    return os.path.abspath(haltoscopus_path)
+
+
+def _is_year(name):
+    """Returns True if the folder name 'name' is a 4 digits year."""
+    return len(name) == 4 and name.isdigit()
+
+
+def _scan_year_folder(year_path, year):
+    """Lists the files of the FILES_BASE global available in the year folder
+    with their modification times in nanoseconds keyed by file name,
+    all the extensions of a file being kept."""
+    stems_dict = {year + file_base: file_key
+                  for file_key, file_base in hts_pg.FILES_BASE.items()}
+    files_dict = {file_key: {} for file_key in hts_pg.FILES_BASE}
+    with os.scandir(year_path) as entries:
+        for entry in entries:
+            file_key = stems_dict.get(os.path.splitext(entry.name)[0])
+            if file_key is not None and entry.is_file():
+                files_dict[file_key][entry.name] = entry.stat().st_mtime_ns
+    return files_dict
+
+
+def _stat_year_files(year_path, files_dict):
+    """Updates the modification times of the files of 'files_dict'
+    listed in a previous scan, returns None if a file is missing."""
+    new_files_dict = {}
+    for file_key, file_mtimes_dict in files_dict.items():
+        new_files_dict[file_key] = {}
+        for file_name in file_mtimes_dict:
+            try:
+                file_mtime = os.stat(Path(year_path) / Path(file_name)).st_mtime_ns
+            except FileNotFoundError:
+                return None
+            new_files_dict[file_key][file_name] = file_mtime
+    return new_files_dict
+
+
+def scan_working_folder(haltoscopus_path, folder_index=None):
+    """Scans the working folder for the years folders and the files
+    of the FILES_BASE global of each year.
+
+    The files of a year folder of which modification time is unchanged
+    since the previous index 'folder_index' are not listed again,
+    only their modification times being updated.
+
+    Args:
+        haltoscopus_path (path): Full path to the working folder.
+        folder_index (dict): The previous index of the working folder \
+        as returned by this function (default: None).
+    Returns:
+        (dict): The index of the working folder with the years sorted \
+        in ascending order.
+    """
+    previous_years_dict = (folder_index or {}).get("years", {})
+    years_dict = {}
+    with os.scandir(haltoscopus_path) as entries:
+        for entry in entries:
+            if not (_is_year(entry.name) and entry.is_dir()):
+                continue
+            year_mtime = entry.stat().st_mtime_ns
+            previous_year_dict = previous_years_dict.get(entry.name)
+            files_dict = None
+            if previous_year_dict is not None and previous_year_dict["mtime_ns"] == year_mtime:
+                files_dict = _stat_year_files(entry.path, previous_year_dict["files"])
+            if files_dict is None:
+                files_dict = _scan_year_folder(entry.path, entry.name)
+            years_dict[entry.name] = {"mtime_ns": year_mtime, "files": files_dict}
+    folder_index = {"folder_mtime_ns": os.stat(haltoscopus_path).st_mtime_ns,
+                    "refreshed_at": datetime.now().isoformat(timespec="seconds"),
+                    "years": dict(sorted(years_dict.items()))}
+    return folder_index
+
+
+def _read_index_file():
+    """Reads the indexes of the working folders keyed by absolute path,
+    returns an empty dict if the index file is missing or not readable."""
+    index_path = Path(hts_pg.FOLDERS_INDEX_FILE)
+    if not index_path.exists():
+        return {}
+    try:
+        with open(index_path, encoding="utf-8") as index_file:
+            return json.load(index_file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index_file(indexes_dict):
+    """Saves atomically the indexes of the working folders."""
+    index_path = Path(hts_pg.FOLDERS_INDEX_FILE)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_fd, temp_path = tempfile.mkstemp(dir=index_path.parent,
+                                          prefix=index_path.name,
+                                          suffix=".tmp")
+    try:
+        with os.fdopen(temp_fd, "w", encoding="utf-8") as temp_file:
+            json.dump(indexes_dict, temp_file, indent=4)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def read_folder_index(haltoscopus_path):
+    """Reads the index of the working folder from the local index file.
+
+    Args:
+        haltoscopus_path (path): Full path to the working folder.
+    Returns:
+        (dict): The index of the working folder as returned by \
+        the `scan_working_folder` function, None if not indexed.
+    """
+    with _INDEX_LOCK:
+        return _read_index_file().get(_set_folder_key(haltoscopus_path))
+
+
+def refresh_folder_index(haltoscopus_path):
+    """Scans the working folder and saves its index in the local index file.
+
+    Args:
+        haltoscopus_path (path): Full path to the working folder.
+    Returns:
+        (tup): (the index of the working folder (dict), change status (bool) \
+        True if the years or the files differ from the previous index).
+    """
+    folder_index = read_folder_index(haltoscopus_path)
+    new_folder_index = scan_working_folder(haltoscopus_path, folder_index)
+    change_status = (folder_index is None
+                     or folder_index["years"] != new_folder_index["years"])
+    with _INDEX_LOCK:
+        indexes_dict = _read_index_file()
+        indexes_dict[_set_folder_key(haltoscopus_path)] = new_folder_index
+        _save_index_file(indexes_dict)
+    return new_folder_index, change_status
+
+
+def refresh_folder_index_in_background(haltoscopus_path, change_callback=None,
+                                       error_callback=None):
+    """Refreshes the index of the working folder in a background thread,
+    no new thread being started if a refresh of the folder is running.
+
+    On errors of access to the working folder, the previous index is kept.
+
+    Args:
+        haltoscopus_path (path): Full path to the working folder.
+        change_callback (function): Function called from the background \
+        thread with the refreshed index when the years or the files differ \
+        from the previous index (default: None).
+        error_callback (function): Function called from the background \
+        thread with the error (OSError) when the working folder is not \
+        accessible (default: None).
+    Returns:
+        (threading.Thread): The running refresh thread.
+    """
+    folder_key = _set_folder_key(haltoscopus_path)
+
+    def _refresh():
+        # The thread is kept registered until the callbacks are done
+        # for the refresh to be reported as running until then
+        try:
+            try:
+                folder_index, change_status = refresh_folder_index(haltoscopus_path)
+            except OSError as error:
+                if error_callback is not None:
+                    error_callback(error)
+                return
+            if change_status and change_callback is not None:
+                change_callback(folder_index)
+        finally:
+            with _INDEX_LOCK:
+                _REFRESH_THREADS_DICT.pop(folder_key, None)
+
+    with _INDEX_LOCK:
+        refresh_thread = _REFRESH_THREADS_DICT.get(folder_key)
+        if refresh_thread is None:
+            refresh_thread = threading.Thread(target=_refresh, daemon=True)
+            _REFRESH_THREADS_DICT[folder_key] = refresh_thread
+            refresh_thread.start()
+    return refresh_thread
+
+
+def is_folder_index_refreshing(haltoscopus_path):
+    """Returns True if a background refresh of the index of the working folder
+    is running, its callbacks included."""
+    with _INDEX_LOCK:
+        return _set_folder_key(haltoscopus_path) in _REFRESH_THREADS_DICT
+
+
+def get_available_years(haltoscopus_path, years_nb=None, change_callback=None,
+                        error_callback=None):
+    """Gets the sorted years available in the working folder from its local
+    index, refreshed in background, the working folder being scanned
+    at once only if not yet indexed.
+
+    Args:
+        haltoscopus_path (path): Full path to the working folder.
+        years_nb (int): Number of the last years returned (default: all the years).
+        change_callback (function): Function called from the background \
+        thread with the refreshed index when it differs from the served one \
+        (default: None).
+        error_callback (function): Function called from the background \
+        thread with the error (OSError) when the indexed working folder \
+        is not accessible anymore (default: None).
+    Returns:
+        (list): The years (str) in ascending order.
+    Raises:
+        FileNotFoundError: If the working folder is not indexed \
+        and is not accessible.
+    """
+    folder_index = read_folder_index(haltoscopus_path)
+    if folder_index is None:
+        folder_index, _ = refresh_folder_index(haltoscopus_path)
+    else:
+        refresh_folder_index_in_background(haltoscopus_path, change_callback,
+                                           error_callback)
+    years_list = list(folder_index["years"])
+    if years_nb is not None:
+        years_list = years_list[-years_nb:]
+    return years_list
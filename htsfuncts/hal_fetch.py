@@ -0,0 +1,286 @@
+"""Module of functions for getting the publications of an Institute
+from the HAL API with an incremental refresh of a local per-year snapshot.
+
+The last HAL extraction of each (institute, year) is kept in the cache
+folder of the working folder. Later extractions only request the records
+added or modified in HAL since the snapshot date and merge them
+in the snapshot.
+
+The HAL API results are paged with a cursor and the query is split
+by document type in slices fetched concurrently. The extractions are
+sorted by HAL url so that they do not depend on the slicing.
+"""
+
+__all__ = ['build_hal_df_incrementally',
+          ]
+
+
+# Standard library imports
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from pathlib import Path
+from urllib.parse import quote
+
+# 3rd party imports
+import pandas as pd
+import requests
+import HalApyJson as haj
+from requests.exceptions import RequestException
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+def _set_hal_api(year, institute, filters_list=None, doc_types=None):
+    """Builds the HAL API query as done by the HalApyJson package
+    for the document types 'doc_types' (default: DOC_TYPES of the HalApyJson
+    package) with the additional filter queries of 'filters_list'
+    and the HAL_BASE_URL global base URL if set."""
+    hal_config = haj.GLOBAL
+    hal_url = hal_config['HAL_URL']
+    if hts_pg.HAL_BASE_URL:
+        hal_url = hts_pg.HAL_BASE_URL.rstrip('/') + '/'
+    if doc_types is None:
+        doc_types = hal_config['DOC_TYPES']
+    results_fields = ','.join(hal_config['HAL_FIELDS'].values())
+    hal_api = (hal_url + hal_config['HAL_GATE'] + '/?q='
+               + hal_config['QUERY_TERMS'] + ' '
+               + f"&rows={hal_config['HAL_RESULTS_NB']}"
+               + f"&wt={hal_config['HAL_RESULTS_FORMAT']}"
+               + f"&fq=producedDateY_i:[{year} TO {year}]"
+               + f"&fq=structAcronym_s:{institute.upper()}"
+               + f"&fq=docType_s:{doc_types}"
+               + f"&fl={results_fields}"
+               + "&indent=true")
+    for filter_query in filters_list or []:
+        hal_api += f"&fq={filter_query}"
+    return hal_api
+
+
+def _parse_hal_json(response_dict):
+    """Parses the HAL API response dict as done by the `parse_json` function
+    of the HalApyJson package, building the dataframe at once
+    instead of one concatenation per record."""
+    fields_dict = haj.GLOBAL['HAL_FIELDS']
+    rows_list = []
+    for doc_dict in response_dict['response']['docs']:
+        row_list = []
+        for field in fields_dict.values():
+            field_value = doc_dict.get(field, 'NA')
+            if isinstance(field_value, list):
+                field_value = ','.join(field_value)
+            row_list.append(field_value)
+        rows_list.append(row_list)
+    hal_df = pd.DataFrame(rows_list, columns=list(fields_dict.keys()), dtype=object)
+    return hal_df.rename(columns=haj.GLOBAL['HAL_FINAL_COLS'])
+
+
+def _request_hal_page(page_api):
+    """Requests a page of the HAL API responses retrying up to
+    HAL_RETRIES_NB global times after an exponentially growing delay
+    of HAL_BACKOFF_BASE global seconds when the request fails
+    with a connection error, a throttling or a server error,
+    returns False if all the attempts failed."""
+    response = False
+    for attempt_nb in range(hts_pg.HAL_RETRIES_NB + 1):
+        if attempt_nb:
+            time.sleep(hts_pg.HAL_BACKOFF_BASE * 2 ** (attempt_nb - 1))
+        try:
+            response = requests.get(page_api, timeout=hts_pg.HAL_TIMEOUT)
+        except RequestException:
+            response = False
+            continue
+        if response or (response.status_code != 429 and response.status_code < 500):
+            break
+    return response
+
+
+def _get_hal_df(hal_api, page_callback=None):
+    """Gets the dataframe of the parsed responses to the HAL API query
+    'hal_api' paged with a cursor, with the request status
+    (False if a request failed), calling 'page_callback' if not None
+    with the dataframe of each page as soon as it is parsed."""
+    pages_list = []
+    cursor_mark = "*"
+    while True:
+        response = _request_hal_page(hal_api + f"&sort=docid asc&cursorMark={quote(cursor_mark)}")
+        if not response:
+            return haj.parse_json(False), False
+        response_dict = response.json()
+        page_df = _parse_hal_json(response_dict)
+        pages_list.append(page_df)
+        if page_callback is not None:
+            page_callback(page_df)
+        next_cursor_mark = response_dict.get("nextCursorMark")
+        if (len(page_df) < int(haj.GLOBAL['HAL_RESULTS_NB'])
+                or not next_cursor_mark or next_cursor_mark == cursor_mark):
+            break
+        cursor_mark = next_cursor_mark
+    hal_df = pd.concat(pages_list, ignore_index=True) if len(pages_list) > 1 else pages_list[0]
+    return hal_df, True
+
+
+def _sort_hal_df(hal_df):
+    """Sorts the HAL extraction by HAL url of the records."""
+    return hal_df.sort_values(by=["Lien url"], kind="stable").reset_index(drop=True)
+
+
+def _get_hal_df_by_doc_types(year, institute, filters_list=None, workers_nb=None,
+                             page_callback=None):
+    """Gets the dataframe of the HAL extraction fetching concurrently
+    one query slice per document type of DOC_TYPES of the HalApyJson package,
+    with the request status (False if a slice failed).
+
+    The requests of the pages are retried as done by the `_request_hal_page`
+    function. If a slice still fails, the empty dataframe of a failed
+    request is returned instead of the other slices.
+
+    The slices are merged, deduplicated by HAL url and sorted as done
+    by the `_sort_hal_df` function. The 'page_callback' function is called
+    from the workers threads with the dataframe of each page of the slices.
+    """
+    if workers_nb is None:
+        workers_nb = hts_pg.HAL_WORKERS_NB
+    doc_types_list = [doc_type.strip() for doc_type
+                      in haj.GLOBAL['DOC_TYPES'].strip('()').split(' OR ')]
+    if workers_nb <= 1 or len(doc_types_list) <= 1:
+        hal_df, request_status = _get_hal_df(_set_hal_api(year, institute, filters_list),
+                                             page_callback=page_callback)
+        return _sort_hal_df(hal_df), request_status
+
+    def _get_slice_df(doc_type):
+        return _get_hal_df(_set_hal_api(year, institute, filters_list, doc_types=doc_type),
+                           page_callback=page_callback)
+
+    with ThreadPoolExecutor(max_workers=min(workers_nb, len(doc_types_list))) as executor:
+        slices_list = list(executor.map(_get_slice_df, doc_types_list))
+    request_status = all(slice_status for _, slice_status in slices_list)
+    if not request_status:
+        return haj.parse_json(False), False
+    hal_df = pd.concat([slice_df for slice_df, _ in slices_list], ignore_index=True)
+    hal_df = hal_df.drop_duplicates(subset=["Lien url"], keep="first")
+    return _sort_hal_df(hal_df), request_status
+
+
+def _set_snapshot_paths(cache_folder_path, institute, corpus_year):
+    """Sets the full paths to the HAL snapshot file and its metadata file."""
+    snapshot_alias = f"{institute.lower()} {corpus_year}{hts_pg.FILES_BASE['hal_base']}"
+    snapshot_folder_path = Path(cache_folder_path) / Path(hts_pg.HAL_SNAPSHOTS_FOLDER)
+    snapshot_path = snapshot_folder_path / Path(snapshot_alias + ".pkl")
+    metadata_path = snapshot_folder_path / Path(snapshot_alias + ".json")
+    return snapshot_path, metadata_path
+
+
+def _read_snapshot(snapshot_path, metadata_path):
+    """Reads the HAL snapshot and its metadata dict,
+    returns (None, None) if the snapshot is not available."""
+    if not (snapshot_path.exists() and metadata_path.exists()):
+        return None, None
+    with open(metadata_path, encoding="utf-8") as file:
+        metadata_dict = json.load(file)
+    snapshot_df = _sort_hal_df(pd.read_pickle(snapshot_path))
+    return snapshot_df, metadata_dict
+
+
+def _save_snapshot(snapshot_path, metadata_path, hal_df, snapshot_date, full_date):
+    """Saves the HAL snapshot with its date and the date
+    of its last full extraction."""
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    hal_df.to_pickle(snapshot_path)
+    metadata_dict = {"snapshot_date": snapshot_date.isoformat(),
+                     "full_extraction_date": full_date.isoformat(),
+                     "records_nb": len(hal_df)}
+    with open(metadata_path, 'w', encoding="utf-8") as file:
+        json.dump(metadata_dict, file, indent=4)
+
+
+def build_hal_df_incrementally(institute, corpus_year, cache_folder_path,
+                               full_refresh=False, page_callback=None):
+    """Builds the dataframe of the publications of the Institute
+    for the corpus year from the HAL API, using the local snapshot
+    of the previous extraction if available.
+
+    When a snapshot is available, only the records added or modified
+    in HAL since the snapshot date (minus a safety overlap) are requested
+    and merged in the snapshot using the HAL url of the records as key.
+    A full extraction is performed if no snapshot is available,
+    if 'full_refresh' is True or if the last full extraction is older
+    than HAL_FULL_REFRESH_DAYS global days, so that records deleted
+    from HAL are eventually removed.
+    If the HAL request fails, the snapshot is returned unchanged
+    and an error is raised when no snapshot is available, a partial
+    extraction being never returned.
+    The HAL API queries are split by document type in slices fetched
+    by HAL_WORKERS_NB global concurrent workers.
+    The 'page_callback' function gets the records as soon as they are
+    available: the snapshot records before the delta request, then
+    the records of each page of the HAL API responses. The records
+    passed may include records finally replaced or dropped.
+
+    Args:
+        institute (str): Institute name.
+        corpus_year (str): 4 digits year of the corpus.
+        cache_folder_path (path): Full path to the folder of the caches.
+        full_refresh (bool): If True, a full extraction is forced.
+        page_callback (function): Function called with the dataframe \
+        of the records got from the snapshot or from each page \
+        of the HAL API responses (default: None).
+    Returns:
+        (tup): (the publications of the Institute for the corpus year \
+        as parsed by the HalApyJson package (dataframe), the HAL extraction \
+        status (str) "full" for a full extraction, "delta" for the snapshot \
+        refreshed with the modified records or "snapshot" for the unchanged \
+        snapshot returned after a HAL request failure).
+    Raises:
+        ConnectionError: If the HAL request fails and no snapshot is available.
+    """
+    now = datetime.now(timezone.utc)
+    snapshot_path, metadata_path = _set_snapshot_paths(cache_folder_path,
+                                                       institute, corpus_year)
+    snapshot_df, metadata_dict = _read_snapshot(snapshot_path, metadata_path)
+
+    if snapshot_df is not None:
+        snapshot_date = datetime.fromisoformat(metadata_dict["snapshot_date"])
+        full_date = datetime.fromisoformat(metadata_dict["full_extraction_date"])
+        if now - full_date > timedelta(days=hts_pg.HAL_FULL_REFRESH_DAYS):
+            full_refresh = True
+
+    if snapshot_df is None or full_refresh:
+        hal_df, request_status = _get_hal_df_by_doc_types(corpus_year, institute,
+                                                          page_callback=page_callback)
+        if request_status:
+            _save_snapshot(snapshot_path, metadata_path, hal_df, now, now)
+            return hal_df, "full"
+        if snapshot_df is None:
+            raise ConnectionError(f"HAL extraction of {institute.upper()} {corpus_year} "
+                                  f"failed after {hts_pg.HAL_RETRIES_NB} retries "
+                                  f"and no snapshot is available")
+        if page_callback is not None:
+            page_callback(snapshot_df)
+        return snapshot_df, "snapshot"
+
+    if page_callback is not None:
+        page_callback(snapshot_df)
+
+    # Getting records added or modified since the snapshot date
+    since_date = snapshot_date - timedelta(hours=hts_pg.HAL_DELTA_OVERLAP_HOURS)
+    since_str = since_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+    delta_filter = f"modifiedDate_tdate:[{since_str} TO NOW]"
+    delta_df, request_status = _get_hal_df_by_doc_types(corpus_year, institute,
+                                                        [delta_filter],
+                                                        page_callback=page_callback)
+    if not request_status:
+        return snapshot_df, "snapshot"
+
+    # Merging the modified records in the snapshot
+    hal_df = snapshot_df
+    if not delta_df.empty:
+        hal_df = pd.concat([snapshot_df, delta_df], ignore_index=True)
+        hal_df = hal_df.drop_duplicates(subset=["Lien url"], keep="last")
+        hal_df = _sort_hal_df(hal_df)
+    _save_snapshot(snapshot_path, metadata_path, hal_df, now, full_date)
+    return hal_df, "delta"
@@ -1,79 +1,659 @@
 """Module of functions for building updated publications list extracted 
 from Scopus database for the Institute selected in the GUI."""
 
-__all__ = ['consolidate_scopus',
+__all__ = ['compact_scopus_df',
+           'consolidate_scopus',
+           'prepare_hal_dois',
+           'resolve_dois',
+           'save_scopus_results',
+           'save_unchanged_scopus',
+           'set_files_tup',
           ]
 
 
 # Standard library imports
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from importlib.util import find_spec
 from pathlib import Path
 
 # 3rd party imports
 import pandas as pd
-import HalApyJson as haj
-import ScopusApyJson as saj
 
 # Local imports
 import htsfuncts.pub_globals as hts_pg
+from htsfuncts.doi_functs import normalize_dois
+from htsfuncts.doi_functs import set_dois_differences
+from htsfuncts.dtype_functs import compact_dtypes
+from htsfuncts.dtype_functs import replace_na
+from htsfuncts.fetch_journal import FetchJournal
+from htsfuncts.fetch_journal import set_fetch_journal_path
+from htsfuncts.hal_fetch import build_hal_df_incrementally
+from htsfuncts.output_functs import save_appended_csv
+from htsfuncts.output_functs import save_output_df
+from htsfuncts.run_report import RunReport
+from htsfuncts.run_report import files_bytes_nb
+from htsfuncts.scopus_cache import get_cached_scopus_df
+from htsfuncts.scopus_cache import get_negative_cached_dois
+from htsfuncts.scopus_cache import set_scopus_cache_path
+from htsfuncts.scopus_cache import update_negative_cache
+from htsfuncts.scopus_cache import update_scopus_cache
+from htsfuncts.scopus_fetch import build_scopus_df_concurrently
+from htsfuncts.scopus_search import build_scopus_df_by_search
 
 
-def _replace_na(init_df):
-    """Replaces NAN and "NA" values."""
-    init_df.fillna(0, inplace=True)
-    new_df = init_df.astype(str)
-    new_df = new_df.replace(to_replace={'0': hts_pg.UNKNOWN,
-                                        'NA': hts_pg.UNKNOWN})
-    return new_df
+def _set_csv_engine():
+    """Sets the multithreaded pyarrow engine for reading csv files
+    if the pyarrow package is available."""
+    if find_spec("pyarrow") is not None:
+        return "pyarrow"
+    return "c"
 
 
 def _get_scopus_dois(init_scopus_file, working_folder_path):
-    """Sets already extracted DOIs list from scopus database."""
+    """Sets already extracted DOIs list from scopus database 
+    reading only the DOI column of the scopus extraction."""
     init_scopus_file_path = working_folder_path / Path(init_scopus_file + ".csv")
-    scopus_init_df = pd.read_csv(init_scopus_file_path, sep = ",")
-    scopus_init_df = _replace_na(scopus_init_df)
-    scopus_dois_list_raw = scopus_init_df['DOI'].tolist()
-    scopus_dois_list_lower = [str(doi).lower() for doi in scopus_dois_list_raw]
-    scopus_dois_set = set(scopus_dois_list_lower)
-    return scopus_dois_set, scopus_init_df
+    scopus_dois_df = pd.read_csv(init_scopus_file_path,
+                                 sep=",",
+                                 usecols=["DOI"],
+                                 dtype={"DOI": str},
+                                 engine=_set_csv_engine())
+    return scopus_dois_df["DOI"], init_scopus_file_path
+
+
+def _run_saves(save_functions_list, run_report):
+    """Runs concurrently the functions of 'save_functions_list' saving
+    independent output files on a pool of OUTPUT_WORKERS_NB global threads
+    and returns their results in order.
+
+    The write time of each file is set by the functions in its own stage
+    of the run report, the overall write time being set in the "outputs_save"
+    stage.
+    """
+    with run_report.stage("outputs_save"):
+        workers_nb = max(1, min(hts_pg.OUTPUT_WORKERS_NB, len(save_functions_list)))
+        with ThreadPoolExecutor(max_workers=workers_nb) as executor:
+            futures_list = [executor.submit(save_function)
+                            for save_function in save_functions_list]
+            return [future.result() for future in futures_list]
+
+
+def _save_hal_df(hal_df, working_folder_path, hal_file_alias, run_report):
+    """Saves the HAL extraction in the working folder of the corpus year."""
+    with run_report.stage("hal_save"):
+        hal_files_list = save_output_df(hal_df, working_folder_path, hal_file_alias)
+    run_report.set_counts("hal_save", rows_nb=len(hal_df),
+                          bytes_nb=files_bytes_nb(working_folder_path, hal_files_list))
+    message = (f"\n\nHAL extraction file saved as '{hal_files_list[0]}' "
+               f"in: \n{working_folder_path}")
+    return message
+
+
+def _set_hal_not_scopus_dois(hal_df, scopus_dois, run_report):
+    """Builds normalized DOIs lists from HAL not in DOIs list extracted
+    from scopus database and from scopus database not in HAL."""
+    with run_report.stage("dois_differences"):
+        hal_not_scopus_index, scopus_not_hal_index = set_dois_differences(hal_df["DOI"],
+                                                                          scopus_dois)
+        hal_not_scopus_doi_list = ("doi/" + hal_not_scopus_index).tolist()
+    run_report.set_counts("dois_differences", rows_nb=len(hal_not_scopus_doi_list))
+    message = (f"\n\n{len(hal_not_scopus_index)} DOIs from HAL not in scopus database "
+               f"and {len(scopus_not_hal_index)} DOIs from scopus database not in HAL")
+    return message, hal_not_scopus_doi_list
+
+
+def _save_new_dois(hal_not_scopus_doi_list, working_folder_path, dois_file_alias, run_report):
+    """Saves DOIs list from HAL not in DOIs list extracted from scopus database
+    in the working folder of the corpus year."""
+    with run_report.stage("new_dois_save"):
+        dois_df = pd.DataFrame(hal_not_scopus_doi_list, columns=["DOI"])
+        dois_files_list = save_output_df(dois_df, working_folder_path, dois_file_alias)
+    run_report.set_counts("new_dois_save", rows_nb=len(dois_df),
+                          bytes_nb=files_bytes_nb(working_folder_path, dois_files_list))
+    message = ("\n\nDOIs list from HAL not in DOIs list extracted from scopus database "
+               f"saved as '{dois_files_list[0]}' in: \n{working_folder_path}")
+    return message
+
+
+def _set_hal_status_message(hal_status):
+    """Sets the message warning that the HAL request failed
+    and that the last HAL extraction snapshot is used."""
+    if hal_status != "snapshot":
+        return ""
+    return ("\n\nHAL request failed: "
+            "last HAL extraction of the cache folder used unchanged")
 
 
 def _extract_hal_dois(institute, corpus_year, working_folder_path,
-                      hal_files_tup, scopus_dois_set):
+                      hal_files_tup, scopus_dois, cache_folder_path, run_report):
     """Sets DOIs list from HAL not in DOIs list extracted 
     from scopus database."""
-    # Getting HAL extraction using HAL api
-    hal_df = haj.build_hal_df_from_api(corpus_year, institute.lower())
-    hal_df = _replace_na(hal_df)
-
-    # Saving HAL extraction
-    hal_file_alias = hal_files_tup[0]
-    hal_file_path = working_folder_path / Path(hal_file_alias + ".xlsx")
-    hal_df.to_excel(hal_file_path, index = False)
-    message = (f"\n\nHAL extraction file saved as '{hal_file_alias}.xlsx' "
-               "in: \n{working_folder_path}")
-
-    # Setting DOIs list from HAL extraction
-    hal_doi_list_raw = list(set(hal_df["DOI"].tolist()) - set([hts_pg.UNKNOWN]))
-    hal_doi_list_lower = [doi.lower() for doi in hal_doi_list_raw]
-    hal_doi_set = set(hal_doi_list_lower)
-
-    # Buiding DOIs list from HAL not in DOIs list extracted from scopus database
-    hal_not_scopus_doi_list = list(hal_doi_set - hal_doi_set.intersection(scopus_dois_set))
-    hal_not_scopus_doi_list = ["doi/" + doi for doi in hal_not_scopus_doi_list]
-
-    # Saving DOIs list from HAL not in DOIs list extracted from scopus database
-    dois_file_alias = hal_files_tup[1]
-    dois_file_path = working_folder_path / Path(dois_file_alias + ".xlsx")
-    dois_df = pd.DataFrame(hal_not_scopus_doi_list, columns=["DOI"])
-    dois_df.to_excel(dois_file_path, index=False)
-    message += ("\n\nDOIs list from HAL not in DOIs list extracted from scopus database "
-                f"saved as '{dois_file_alias}.xlsx' in: \n{working_folder_path}")
+    # Getting HAL extraction using HAL api and the local HAL snapshot
+    with run_report.stage("hal_fetch"):
+        hal_df, hal_status = build_hal_df_incrementally(institute.lower(), corpus_year,
+                                                        cache_folder_path)
+        hal_df = replace_na(hal_df)
+    run_report.set_counts("hal_fetch", rows_nb=len(hal_df))
+    run_report.set_info(hal_status=hal_status)
+
+    # Buiding normalized DOIs lists from HAL not in DOIs list extracted
+    # from scopus database and from scopus database not in HAL
+    differences_message, hal_not_scopus_doi_list = _set_hal_not_scopus_dois(hal_df,
+                                                                            scopus_dois,
+                                                                            run_report)
+
+    # Saving concurrently HAL extraction and DOIs list from HAL
+    # not in DOIs list extracted from scopus database
+    hal_message, dois_message = _run_saves([partial(_save_hal_df, hal_df,
+                                                    working_folder_path,
+                                                    hal_files_tup[0], run_report),
+                                            partial(_save_new_dois, hal_not_scopus_doi_list,
+                                                    working_folder_path,
+                                                    hal_files_tup[1], run_report)],
+                                           run_report)
+    message = (_set_hal_status_message(hal_status) + hal_message
+               + differences_message + dois_message)
     return message, hal_not_scopus_doi_list
 
 
-def consolidate_scopus(institute, haltoscopus_path, corpus_year, files_tup):
+def set_files_tup(corpus_year):
+    """Sets the names of the files used by the `consolidate_scopus` function
+    for the corpus year from the FILES_BASE global.
+
+    Args:
+        corpus_year (str): 4 digits year of the corpus.
+    Returns:
+        (tup): The files names tuple passed to the `consolidate_scopus` function.
+    """
+    files_tup = (corpus_year + hts_pg.FILES_BASE["scopus_base"],
+                 corpus_year + hts_pg.FILES_BASE["new_scopus_base"],
+                 corpus_year + hts_pg.FILES_BASE["hal_base"],
+                 corpus_year + hts_pg.FILES_BASE["failed_doi_base"],
+                 corpus_year + hts_pg.FILES_BASE["added_doi_base"],
+                 corpus_year + hts_pg.FILES_BASE["new_doi_base"])
+    return files_tup
+
+
+def prepare_hal_dois(institute, haltoscopus_path, corpus_year, files_tup,
+                     run_report, progress_callback=None):
+    """Sets DOIs list from HAL not in the initial scopus extraction
+    of the corpus year, saving the HAL extraction and the DOIs list
+    in the working folder of the corpus year.
+
+    Args:
+        institute (str): Institute name.
+        haltoscopus_path (path): Full path to working folder.
+        corpus_year (str): 4 digits year of the corpus.
+        files_tup (tup): The files names tuple as set \
+        by the `set_files_tup` function.
+        run_report (RunReport): The collector of the stages measures.
+        progress_callback (function): Function called with the stage name, \
+        the number of processed items and the number of items of the stage \
+        (default: None).
+    Returns:
+        (tup): (message for exe log (str), DOIs list from HAL not in \
+        the initial scopus extraction (list), full path to the initial \
+        scopus csv file (path)).
+    Raises:
+        ConnectionError: If the HAL request fails and no HAL extraction \
+        snapshot is available.
+    """
+    if progress_callback is not None:
+        progress_callback("hal", 0, 1)
+    year_haltoscopus_path = haltoscopus_path / Path(corpus_year)
+    with run_report.stage("scopus_dois_read"):
+        scopus_dois, init_scopus_file_path = _get_scopus_dois(files_tup[0],
+                                                              year_haltoscopus_path)
+    run_report.set_counts("scopus_dois_read", rows_nb=len(scopus_dois),
+                          bytes_nb=os.path.getsize(init_scopus_file_path))
+    hal_files_tup = (files_tup[2], files_tup[5])
+    cache_folder_path = Path(haltoscopus_path) / Path(hts_pg.CACHE_FOLDER)
+    message, hal_not_scopus_doi_list = _extract_hal_dois(institute, corpus_year,
+                                                         year_haltoscopus_path,
+                                                         hal_files_tup, scopus_dois,
+                                                         cache_folder_path, run_report)
+    return message, hal_not_scopus_doi_list, init_scopus_file_path
+
+
+def _set_fetch_function(fetch_mode=None):
+    """Sets the function getting the publications information
+    from the Scopus API for the fetch mode 'fetch_mode'
+    among SCOPUS_FETCH_MODES_LIST global (default: SCOPUS_FETCH_MODE global)."""
+    if fetch_mode is None:
+        fetch_mode = hts_pg.SCOPUS_FETCH_MODE
+    if fetch_mode not in hts_pg.SCOPUS_FETCH_MODES_LIST:
+        raise ValueError(f"Scopus fetch mode '{fetch_mode}' not in "
+                         f"{hts_pg.SCOPUS_FETCH_MODES_LIST}")
+    if fetch_mode == "search":
+        return build_scopus_df_by_search
+    return build_scopus_df_concurrently
+
+
+def resolve_dois(cache_paths_list, doi_list, run_report, rate_limiter=None,
+                 progress_callback=None, cancel_event=None, journal_path=None,
+                 force_recheck=False):
+    """Gets the publications information of the DOIs of 'doi_list'
+    from the caches of 'cache_paths_list', from the fetch journal
+    of 'journal_path' of an unfinished run and from the Scopus API
+    for the DOIs missing in all the caches and in the journal.
+
+    The DOIs recently not found in the Scopus database are skipped
+    using the negative caches of 'cache_paths_list' unless 'force_recheck'
+    is True. The DOIs resolved through the Scopus API are appended
+    to the journal as soon as they are resolved. The publications information
+    and the DOIs not found got from the Scopus API or from the journal
+    are added to each cache of 'cache_paths_list' with the fetch mode
+    of the SCOPUS_FETCH_MODE global.
+
+    Args:
+        cache_paths_list (list): The full paths to the Scopus cache databases.
+        doi_list (list): The list of DOIs (str) as passed to the Scopus API.
+        run_report (RunReport): The collector of the stages measures.
+        rate_limiter (TokenBucket): The rate limiter of the Scopus API \
+        requests (default: new limiter).
+        progress_callback (function): Function called with the stage name, \
+        the number of processed DOIs and the number of DOIs requested \
+        to the Scopus API (default: None).
+        cancel_event (threading.Event): Event that stops the Scopus API \
+        requests when set (default: None).
+        journal_path (path): Full path to the fetch journal (default: None \
+        for no journal).
+        force_recheck (bool): If True, the DOIs recently not found in the Scopus \
+        database are requested again (default: False).
+    Returns:
+        (tup): (dataframe of the publications information, dataframe \
+        of the failed DOIs with their fail reason, authentication status \
+        on Scopus database (bool)).
+    """
+    fetch_mode = hts_pg.SCOPUS_FETCH_MODE
+    fetch_function = _set_fetch_function(fetch_mode)
+    cached_dfs_list = []
+    missing_doi_list = doi_list
+    with run_report.stage("scopus_cache_read"):
+        for cache_path in cache_paths_list:
+            if not missing_doi_list:
+                break
+            cached_scopus_df, missing_doi_list = get_cached_scopus_df(cache_path,
+                                                                      missing_doi_list,
+                                                                      fetch_mode=fetch_mode)
+            cached_dfs_list.append(cached_scopus_df)
+    run_report.set_counts("scopus_cache_read",
+                          rows_nb=sum(len(df) for df in cached_dfs_list))
+
+    # Skipping the DOIs recently not found in the Scopus database
+    negative_failed_dfs_list = []
+    with run_report.stage("scopus_negative_cache_read"):
+        for cache_path in cache_paths_list:
+            if not missing_doi_list:
+                break
+            negative_failed_df, missing_doi_list = \
+                get_negative_cached_dois(cache_path, missing_doi_list,
+                                         force_recheck=force_recheck)
+            negative_failed_dfs_list.append(negative_failed_df)
+    run_report.set_counts("scopus_negative_cache_read",
+                          rows_nb=sum(len(df) for df in negative_failed_dfs_list))
+
+    # Getting the DOIs already resolved by an unfinished run from the journal
+    journal = None
+    journal_scopus_df = pd.DataFrame()
+    journal_failed_df = pd.DataFrame(columns=["DOI", "Fail reason"])
+    if journal_path is not None:
+        journal = FetchJournal(journal_path, fetch_mode=fetch_mode)
+        if journal.exists() and missing_doi_list:
+            with run_report.stage("scopus_journal_read"):
+                journal_scopus_df, journal_failed_df, resumed_doi_list = \
+                    journal.get_resolved(missing_doi_list)
+            run_report.set_counts("scopus_journal_read", rows_nb=len(journal_scopus_df))
+            run_report.set_info(resumed_dois_nb=len(missing_doi_list) - len(resumed_doi_list))
+            missing_doi_list = resumed_doi_list
+
+    # Build the dataframe with the results of the parsing
+    # of the api request response for each DOI missing in the caches
+    with run_report.stage("scopus_fetch"):
+        if missing_doi_list:
+            try:
+                api_scopus_df, failed_doi_df, authy_status = \
+                    fetch_function(missing_doi_list,
+                                   timeout=hts_pg.SCOPUS_TIMEOUT,
+                                   rate_limiter=rate_limiter,
+                                   verbose=False,
+                                   progress_callback=progress_callback,
+                                   cancel_event=cancel_event,
+                                   result_callback=journal.append if journal else None)
+            finally:
+                if journal is not None:
+                    journal.close()
+        else:
+            api_scopus_df = pd.DataFrame()
+            failed_doi_df = pd.DataFrame(columns=["DOI", "Fail reason"])
+            authy_status = True
+    fetched_failed_df = pd.concat([journal_failed_df, failed_doi_df], ignore_index=True)
+    failed_doi_df = pd.concat(negative_failed_dfs_list + [fetched_failed_df],
+                              ignore_index=True)
+    run_report.set_counts("scopus_fetch", rows_nb=len(api_scopus_df))
+    run_report.set_info(requested_dois_nb=len(missing_doi_list),
+                        failed_dois_nb=len(failed_doi_df),
+                        circuit_open=bool((failed_doi_df["Fail reason"]
+                                           == "Circuit open").any()))
+    if not authy_status:
+        return pd.DataFrame(), failed_doi_df, authy_status
+
+    fetched_dfs_list = [df for df in [journal_scopus_df, api_scopus_df] if not df.empty]
+    fetched_df = pd.concat(fetched_dfs_list) if fetched_dfs_list else pd.DataFrame()
+    with run_report.stage("scopus_cache_update"):
+        for cache_path in cache_paths_list:
+            update_scopus_cache(cache_path, fetched_df, fetch_mode=fetch_mode)
+            update_negative_cache(cache_path, fetched_failed_df, fetched_df)
+    run_report.set_counts("scopus_cache_update", rows_nb=len(fetched_df))
+    scopus_dfs_list = [df for df in cached_dfs_list if not df.empty] + fetched_dfs_list
+    scopus_df = pd.concat(scopus_dfs_list) if scopus_dfs_list else pd.DataFrame()
+    return scopus_df, failed_doi_df, authy_status
+
+
+def _set_page_gap_dois(page_df, scopus_keys_set, submitted_keys_set):
+    """Sets the DOIs of the HAL page 'page_df' neither in the initial scopus
+    extraction nor already submitted, adding them to 'submitted_keys_set'."""
+    page_keys_list = normalize_dois(page_df["DOI"]).dropna().drop_duplicates().tolist()
+    gap_keys_list = [key for key in page_keys_list
+                     if key not in scopus_keys_set and key not in submitted_keys_set]
+    submitted_keys_set.update(gap_keys_list)
+    return ["doi/" + key for key in gap_keys_list]
+
+
+def _merge_scopus_tups(scopus_tups_list, dropped_keys_set):
+    """Merges the results of the `resolve_dois` function calls
+    dropping the DOIs of 'dropped_keys_set'."""
+    scopus_dfs_list = [tup[0] for tup in scopus_tups_list if not tup[0].empty]
+    scopus_df = pd.concat(scopus_dfs_list) if scopus_dfs_list else pd.DataFrame()
+    failed_doi_df = pd.concat([pd.DataFrame(columns=["DOI", "Fail reason"])]
+                              + [tup[1] for tup in scopus_tups_list], ignore_index=True)
+    authy_status = all(tup[2] for tup in scopus_tups_list)
+    if dropped_keys_set:
+        if "DOI" in scopus_df.columns:
+            kept_mask = ~normalize_dois(scopus_df["DOI"]).isin(dropped_keys_set).to_numpy()
+            scopus_df = scopus_df[kept_mask]
+        kept_mask = ~normalize_dois(failed_doi_df["DOI"]).isin(dropped_keys_set).to_numpy()
+        failed_doi_df = failed_doi_df[kept_mask].reset_index(drop=True)
+    return scopus_df, failed_doi_df, authy_status
+
+
+def _pipeline_hal_dois(institute, haltoscopus_path, corpus_year, files_tup, run_report,
+                       rate_limiter=None, progress_callback=None, cancel_event=None,
+                       force_recheck=False):
+    """Sets DOIs list from HAL not in the initial scopus extraction
+    of the corpus year and gets their publications information
+    as done by the `prepare_hal_dois` and `resolve_dois` functions
+    but with the stages overlapped.
+
+    The HAL extraction is got in a producer thread. The DOIs of each page
+    of the HAL API responses are resolved as soon as the page is available
+    and the initial scopus DOIs are read, the pages arrived during
+    the resolution of the previous ones being grouped. The HAL extraction
+    and the DOIs list are saved by a background writer thread while
+    the Scopus API requests continue. The DOIs requested but finally
+    not in the HAL extraction (records modified or removed by the merge
+    in the snapshot) are dropped from the results.
+    """
+    if progress_callback is not None:
+        progress_callback("hal", 0, 1)
+    year_haltoscopus_path = haltoscopus_path / Path(corpus_year)
+    cache_folder_path = Path(haltoscopus_path) / Path(hts_pg.CACHE_FOLDER)
+    cache_path = set_scopus_cache_path(haltoscopus_path)
+    journal_path = set_fetch_journal_path(year_haltoscopus_path)
+    pages_queue = queue.Queue()
+
+    def _read_scopus_dois():
+        with run_report.stage("scopus_dois_read"):
+            scopus_dois, init_scopus_file_path = _get_scopus_dois(files_tup[0],
+                                                                  year_haltoscopus_path)
+        run_report.set_counts("scopus_dois_read", rows_nb=len(scopus_dois),
+                              bytes_nb=os.path.getsize(init_scopus_file_path))
+        return scopus_dois, init_scopus_file_path
+
+    def _produce_hal_pages(scopus_dois_future):
+        try:
+            with run_report.stage("hal_fetch"):
+                hal_df, hal_status = build_hal_df_incrementally(institute.lower(),
+                                                                corpus_year,
+                                                                cache_folder_path,
+                                                                page_callback=pages_queue.put)
+                hal_df = replace_na(hal_df)
+            run_report.set_counts("hal_fetch", rows_nb=len(hal_df))
+            run_report.set_info(hal_status=hal_status)
+        finally:
+            pages_queue.put(None)
+        hal_save_future = writer.submit(_save_hal_df, hal_df, year_haltoscopus_path,
+                                        files_tup[2], run_report)
+        differences_message, hal_not_scopus_doi_list = \
+            _set_hal_not_scopus_dois(hal_df, scopus_dois_future.result()[0], run_report)
+        differences_message = _set_hal_status_message(hal_status) + differences_message
+        dois_save_future = writer.submit(_save_new_dois, hal_not_scopus_doi_list,
+                                         year_haltoscopus_path, files_tup[5], run_report)
+        return (hal_save_future, differences_message,
+                hal_not_scopus_doi_list, dois_save_future)
+
+    scopus_tups_list = []
+    submitted_keys_set = set()
+    resolved_nb_list = [0]
+
+    def _report_scopus_progress(stage, done_nb, _):
+        progress_callback(stage, resolved_nb_list[0] + done_nb, len(submitted_keys_set))
+
+    def _resolve_chunk(doi_list):
+        chunk_report = RunReport()
+        scopus_tup = resolve_dois([cache_path], doi_list, chunk_report,
+                                  rate_limiter=rate_limiter,
+                                  progress_callback=(_report_scopus_progress
+                                                     if progress_callback else None),
+                                  cancel_event=cancel_event,
+                                  journal_path=journal_path,
+                                  force_recheck=force_recheck)
+        run_report.accumulate(chunk_report)
+        scopus_tups_list.append(scopus_tup)
+        resolved_nb_list[0] += len(doi_list)
+        if progress_callback is not None:
+            progress_callback("scopus", resolved_nb_list[0], len(submitted_keys_set))
+
+    def _is_authenticated():
+        return all(tup[2] for tup in scopus_tups_list)
+
+    with ThreadPoolExecutor(max_workers=hts_pg.OUTPUT_WORKERS_NB) as writer, \
+         ThreadPoolExecutor(max_workers=2) as producer:
+        scopus_dois_future = producer.submit(_read_scopus_dois)
+        hal_future = producer.submit(_produce_hal_pages, scopus_dois_future)
+        scopus_dois, init_scopus_file_path = scopus_dois_future.result()
+        scopus_keys_set = set(normalize_dois(scopus_dois).dropna())
+
+        # Resolving the DOIs of the HAL pages as they arrive
+        hal_ended_status = False
+        while not hal_ended_status:
+            pages_list = [pages_queue.get()]
+            while not pages_queue.empty():
+                pages_list.append(pages_queue.get())
+            hal_ended_status = pages_list[-1] is None
+            doi_list = []
+            for page_df in pages_list[:-1] if hal_ended_status else pages_list:
+                doi_list += _set_page_gap_dois(page_df, scopus_keys_set, submitted_keys_set)
+            if doi_list and _is_authenticated():
+                _resolve_chunk(doi_list)
+
+        # Resolving the DOIs of the final HAL extraction not yet resolved
+        hal_save_future, differences_message, hal_not_scopus_doi_list, dois_save_future = \
+            hal_future.result()
+        hal_not_scopus_keys_set = {doi[len("doi/"):] for doi in hal_not_scopus_doi_list}
+        missing_doi_list = ["doi/" + key for key in hal_not_scopus_keys_set
+                            if key not in submitted_keys_set]
+        submitted_keys_set.update(hal_not_scopus_keys_set)
+        if missing_doi_list and _is_authenticated():
+            _resolve_chunk(sorted(missing_doi_list))
+        message = hal_save_future.result() + differences_message + dois_save_future.result()
+
+    scopus_tup = _merge_scopus_tups(scopus_tups_list,
+                                    submitted_keys_set - hal_not_scopus_keys_set)
+    return message, hal_not_scopus_doi_list, init_scopus_file_path, scopus_tup
+
+
+def compact_scopus_df(scopus_df, run_report):
+    """Converts the columns of the publications information to compact dtypes
+    setting the memory sizes before and after compaction in the run report.
+
+    Args:
+        scopus_df (dataframe): The publications information.
+        run_report (RunReport): The collector of the stages measures.
+    Returns:
+        (dataframe): The publications information with compact dtypes \
+        as returned by the `compact_dtypes` function.
+    """
+    with run_report.stage("scopus_compaction"):
+        scopus_df, init_bytes_nb, compact_bytes_nb = compact_dtypes(scopus_df)
+    run_report.set_counts("scopus_compaction", rows_nb=len(scopus_df),
+                          bytes_nb=compact_bytes_nb)
+    run_report.set_info(scopus_memory_init_bytes_nb=init_bytes_nb,
+                        scopus_memory_compact_bytes_nb=compact_bytes_nb)
+    return scopus_df
+
+
+def _save_scopus_csv(scopus_df, year_haltoscopus_path, new_scopus_file_alias,
+                     init_scopus_file_path, run_report):
+    """Saves the new scopus csv file in the working folder
+    appending the added DOIs to the initial scopus csv file."""
+    file_csv_path = year_haltoscopus_path / Path(new_scopus_file_alias + ".csv")
+    with run_report.stage("scopus_csv_save"):
+        save_appended_csv(init_scopus_file_path, file_csv_path, scopus_df)
+    run_report.set_counts("scopus_csv_save", rows_nb=len(scopus_df),
+                          bytes_nb=os.path.getsize(file_csv_path))
+    return ""
+
+
+def _save_added_dois(scopus_df, year_haltoscopus_path, added_file_alias, run_report):
+    """Saves the dataframe of added DOIs in the working folder."""
+    with run_report.stage("added_dois_save"):
+        added_files_list = save_output_df(scopus_df, year_haltoscopus_path,
+                                          added_file_alias)
+    run_report.set_counts("added_dois_save", rows_nb=len(scopus_df),
+                          bytes_nb=files_bytes_nb(year_haltoscopus_path, added_files_list))
+    message = (f"\n\nComplementary HAL DOIs added to the Scopus csv file "
+               f"saved as '{added_files_list[0]}' in: \n{year_haltoscopus_path}")
+    return message
+
+
+def _save_failed_dois(failed_doi_df, year_haltoscopus_path, failed_file_alias, run_report):
+    """Saves the dataframe of DOIs that failed to be extracted
+    in the working folder."""
+    with run_report.stage("failed_dois_save"):
+        failed_files_list = save_output_df(failed_doi_df, year_haltoscopus_path,
+                                           failed_file_alias)
+    run_report.set_counts("failed_dois_save", rows_nb=len(failed_doi_df),
+                          bytes_nb=files_bytes_nb(year_haltoscopus_path, failed_files_list))
+    message = (f"\n\nComplementary HAL DOIs not found in scopus database "
+               f"saved as '{failed_files_list[0]}' in: \n{year_haltoscopus_path}")
+    return message
+
+
+def save_scopus_results(message, scopus_tup, files_tup,
+                        year_haltoscopus_path, init_scopus_file_path, run_report):
+    """Saves the updated scopus csv file, the added DOIs and the failed DOIs
+    in the working folder of the corpus year.
+
+    Args:
+        message (str): The message for exe log to complete.
+        scopus_tup (tup): The results tuple as returned \
+        by the `resolve_dois` function.
+        files_tup (tup): The files names tuple as set \
+        by the `set_files_tup` function.
+        year_haltoscopus_path (path): Full path to the working folder \
+        of the corpus year.
+        init_scopus_file_path (path): Full path to the initial scopus csv file.
+        run_report (RunReport): The collector of the stages measures.
+    Returns:
+        (tup): (message for exe log (str), Scopus extraction update status (bool)).
+    """
+    cancelled_nb = int((scopus_tup[1]["Fail reason"] == "Cancelled").sum())
+    if cancelled_nb:
+        message += (f"\n\nConsolidation cancelled: {cancelled_nb} DOIs "
+                    f"not requested to scopus database")
+    stopped_nb = int((scopus_tup[1]["Fail reason"] == "Circuit open").sum())
+    if stopped_nb:
+        message += (f"\n\nConsolidation stopped after repeated scopus database errors "
+                    f"or a too long throttling: {stopped_nb} DOIs not requested")
+    new_scopus_file_alias = files_tup[1]
+    scopus_df = compact_scopus_df(replace_na(scopus_tup[0]), run_report)
+    if not scopus_df.empty:
+        message += (f"\n\nScopus csv file updated with complementary HAL DOIs "
+                    f"saved as '{new_scopus_file_alias}.csv' in: \n{year_haltoscopus_path}")
+        update_status = True
+    else:
+        message += (f"\nScopus csv file unchanged but "
+                    f"saved as '{new_scopus_file_alias}.csv' in: \n{year_haltoscopus_path}")
+        update_status = False
+
+    # Saving concurrently the new scopus csv file, the added DOIs
+    # and the failed DOIs in the working folder
+    _, added_message, failed_message = \
+        _run_saves([partial(_save_scopus_csv, scopus_df, year_haltoscopus_path,
+                            new_scopus_file_alias, init_scopus_file_path, run_report),
+                    partial(_save_added_dois, scopus_df, year_haltoscopus_path,
+                            files_tup[4], run_report),
+                    partial(_save_failed_dois, scopus_tup[1], year_haltoscopus_path,
+                            files_tup[3], run_report)],
+                   run_report)
+    message += added_message + failed_message
+    return message, update_status
+
+
+def save_unchanged_scopus(message, files_tup, year_haltoscopus_path,
+                          init_scopus_file_path, run_report):
+    """Saves the unchanged scopus csv file when all HAL DOIs
+    are in the initial scopus extraction.
+
+    Args:
+        message (str): The message for exe log to complete.
+        files_tup (tup): The files names tuple as set \
+        by the `set_files_tup` function.
+        year_haltoscopus_path (path): Full path to the working folder \
+        of the corpus year.
+        init_scopus_file_path (path): Full path to the initial scopus csv file.
+        run_report (RunReport): The collector of the stages measures.
+    Returns:
+        (str): The message for exe log.
+    """
+    new_scopus_file_alias = files_tup[1]
+    message += (f"\n\nAll HAL DOIs are in initial Scopus csv file."
+                f"\nScopus csv file unchanged but "
+                f"saved as '{new_scopus_file_alias}.csv' "
+                f"in: \n{year_haltoscopus_path}")
+
+    # Saving the unchanged scopus csv file in the working folder
+    file_csv_path = year_haltoscopus_path / Path(new_scopus_file_alias + ".csv")
+    with run_report.stage("scopus_csv_save"):
+        save_appended_csv(init_scopus_file_path, file_csv_path, pd.DataFrame())
+    run_report.set_counts("scopus_csv_save", rows_nb=0,
+                          bytes_nb=os.path.getsize(file_csv_path))
+    return message
+
+
+def consolidate_scopus(institute, haltoscopus_path, corpus_year, files_tup,
+                       rate_limiter=None, progress_callback=None, cancel_event=None,
+                       run_report=None, force_recheck=False, pipelined=None):
     """Complements the scopus extraction with information on publications 
     of which DOIs are found in HAL extraction.
+
+    The durations, rows numbers and bytes numbers of the stages are saved
+    in the RUN_REPORT_FILE global json file of the working folder of the year.
+    The DOIs not found in the Scopus database are skipped during an exponentially
+    growing back-off delay unless 'force_recheck' is True.
+    The DOIs resolved through the Scopus API are journaled in the
+    FETCH_JOURNAL_FILE global file of the same folder until the end of the run,
+    an interrupted, cancelled or stopped run being resumed with the remaining DOIs.
+    The Scopus API requests are stopped early, the results already got being
+    saved, when the error rate of the Scopus API exceeds the
+    SCOPUS_BREAKER_ERROR_RATE global.
+    In pipelined mode, the Scopus API is requested for the DOIs of each page
+    of the HAL API responses as soon as it is available and the output files
+    of the HAL extraction are saved in background during the Scopus API requests.
     
     Args:
         institute (str): Institute name.
@@ -81,91 +661,102 @@ def consolidate_scopus(institute, haltoscopus_path, corpus_year, files_tup):
         haltoscopus_path (path): Full path to working folder.
         files_tup (tup): (name of the initial Scopus extraction file, \
         name of the updated Scopus file, name for the HAL extraction file, \
+        name of the file where publications information of DOIs not found \
+        in the Scopus database is saved, name of the file where publications \
+        information added to the initial Scopus extraction is saved, \
         name for the file where DOIs list not present in the initial Scopus \
-        extraction is saved, name of the file where publications information \
-        of DOIs not found in the Scopus database is saved, name of the file \
-        where publications information added to the initial Scopus extraction \
-        is saved).
+        extraction is saved) as set by the `set_files_tup` function.
+        rate_limiter (TokenBucket): The rate limiter of the Scopus API \
+        requests (default: new limiter for this consolidation).
+        progress_callback (function): Function called with the stage name \
+        ("hal", "scopus" or "save"), the number of processed items and \
+        the number of items of the stage (default: None).
+        cancel_event (threading.Event): Event that stops the Scopus API \
+        requests when set, the results already got being saved (default: None).
+        run_report (RunReport): The collector of the stages measures, \
+        filled by the function for getting the report (default: new collector).
+        force_recheck (bool): If True, the DOIs recently not found in the Scopus \
+        database are requested again whatever their back-off delay (default: False).
+        pipelined (bool): If True, the HAL extraction, the Scopus API requests \
+        and the files saving are overlapped (default: CONSOLIDATION_PIPELINED global).
     Returns:
         (tup): (message for exe log (str), authentication status \
         on Scopus database (bool), Scopus extraction update status (bool)).
+    Raises:
+        ConnectionError: If the HAL request fails and no HAL extraction \
+        snapshot is available, the failure being recorded in the run report.
     """
     # Initialize status
     update_status = False
     authy_status = False
-
-    # Setting results file name
-    new_scopus_file_alias = files_tup[1]
-
-    # Setting already extracted DOIs list from scopus database
-    init_scopus_file = files_tup[0]
-    year_haltoscopus_path = haltoscopus_path / Path(corpus_year)
-    scopus_dois_set, scopus_init_df = _get_scopus_dois(init_scopus_file, year_haltoscopus_path)
+    if run_report is None:
+        run_report = RunReport()
+    run_report.set_info(institute=institute, corpus_year=corpus_year)
 
     # Building DOIs list from HAL not in DOIs list extracted from scopus database
-    hal_files_tup = (files_tup[2], files_tup[3])
-    message, hal_not_scopus_doi_list = _extract_hal_dois(institute, corpus_year,
-                                                         year_haltoscopus_path,
-                                                         hal_files_tup, scopus_dois_set)
+    # and getting their publications information when pipelined
+    if pipelined is None:
+        pipelined = hts_pg.CONSOLIDATION_PIPELINED
+    year_haltoscopus_path = haltoscopus_path / Path(corpus_year)
+    journal_path = set_fetch_journal_path(year_haltoscopus_path)
+    scopus_tup = None
+    try:
+        if pipelined:
+            message, hal_not_scopus_doi_list, init_scopus_file_path, scopus_tup = \
+                _pipeline_hal_dois(institute, haltoscopus_path, corpus_year, files_tup,
+                                   run_report, rate_limiter=rate_limiter,
+                                   progress_callback=progress_callback,
+                                   cancel_event=cancel_event,
+                                   force_recheck=force_recheck)
+        else:
+            message, hal_not_scopus_doi_list, init_scopus_file_path = \
+                prepare_hal_dois(institute, haltoscopus_path, corpus_year, files_tup,
+                                 run_report, progress_callback=progress_callback)
+    except ConnectionError as error:
+        # Recording the failed HAL extraction in the run report
+        # of the working folder of the year
+        run_report.set_info(hal_status="failed", hal_error=str(error))
+        run_report.save(year_haltoscopus_path)
+        raise
 
     if hal_not_scopus_doi_list:
 
-        # Build the dataframe with the results of the parsing
-        # of the api request response for each DOI of the hal_not_scopus_doi_list list
-        scopus_tup = saj.build_scopus_df_from_api(hal_not_scopus_doi_list,
-                                                  timeout=30, verbose=False)
+        # Getting the publications information of the DOIs
+        # of the hal_not_scopus_doi_list list from the cache and the Scopus API
+        # and from the fetch journal of an unfinished run
+        if scopus_tup is None:
+            cache_path = set_scopus_cache_path(haltoscopus_path)
+            scopus_tup = resolve_dois([cache_path], hal_not_scopus_doi_list, run_report,
+                                      rate_limiter=rate_limiter,
+                                      progress_callback=progress_callback,
+                                      cancel_event=cancel_event,
+                                      journal_path=journal_path,
+                                      force_recheck=force_recheck)
         authy_status = scopus_tup[2]
         if authy_status:
-            scopus_df = scopus_tup[0]
-            scopus_df = _replace_na(scopus_df)
-            if not scopus_df.empty:
-                new_scopus_df = pd.concat([scopus_init_df, scopus_df])
-                message += (f"\n\nScopus csv file updated with complementary HAL DOIs "
-                            f"saved as '{new_scopus_file_alias}.csv' in: \n{year_haltoscopus_path}")
-                update_status = True
-            else:
-                new_scopus_df = scopus_init_df.copy()
-                message += (f"\nScopus csv file unchanged but "
-                            f"saved as '{new_scopus_file_alias}.csv' in: \n{year_haltoscopus_path}")
-                update_status = False
-
-            # Saving the new scopus dataframe as csv file in the working folder
-            file_csv_path = year_haltoscopus_path / Path(new_scopus_file_alias + ".csv")
-            new_scopus_df.to_csv(file_csv_path,
-                                 header = True,
-                                 index = False,
-                                 sep = ',')
-
-            # Saving the dataframe of added DOIs as xlsx file in the working folder
-            added_file_alias = files_tup[4]
-            added_file_xlsx_path = year_haltoscopus_path / Path(added_file_alias + ".xlsx")
-            scopus_df.to_excel(added_file_xlsx_path, index = False)
-            message += (f"\n\nComplementary HAL DOIs added to the Scopus csv file "
-                        f"saved as '{added_file_alias}.xlsx' in: \n{year_haltoscopus_path}")
-
-            # Saving the dataframe of DOIs that failed to be extracted
-            # as xlsx file in the working folder
-            failed_doi_df = scopus_tup[1]
-            failed_file_alias = files_tup[3]
-            failed_file_xlsx_path = year_haltoscopus_path / Path(failed_file_alias + ".xlsx")
-            failed_doi_df.to_excel(failed_file_xlsx_path, index = False)
-            message += (f"\n\nComplementary HAL DOIs not found in scopus database "
-                        f"saved as '{failed_file_alias}.xlsx' in: \n{year_haltoscopus_path}")
+            resumed_dois_nb = run_report.info_dict.get("resumed_dois_nb", 0)
+            if resumed_dois_nb:
+                message += (f"\n\nUnfinished consolidation resumed: {resumed_dois_nb} DOIs "
+                            f"got from the fetch journal")
+            if progress_callback is not None:
+                progress_callback("save", 0, 1)
+            message, update_status = save_scopus_results(message, scopus_tup, files_tup,
+                                                         year_haltoscopus_path,
+                                                         init_scopus_file_path,
+                                                         run_report)
+
+            # Removing the fetch journal once all the DOIs are resolved and saved
+            if not scopus_tup[1]["Fail reason"].isin(["Cancelled", "Circuit open"]).any():
+                FetchJournal(journal_path).remove()
         else:
             message = "Scopus authentication failed"
     else:
-        new_scopus_df = scopus_init_df.copy()
-        message += (f"\n\nAll HAL DOIs are in initial Scopus csv file."
-                    f"\nScopus csv file unchanged but "
-                    f"saved as '{new_scopus_file_alias}.csv' "
-                    f"in: \n{year_haltoscopus_path}")
+        message = save_unchanged_scopus(message, files_tup, year_haltoscopus_path,
+                                        init_scopus_file_path, run_report)
         update_status = False
         authy_status = True
 
-        # Saving the new scopus dataframe as csv file in the working folder
-        file_csv_path = year_haltoscopus_path / Path(new_scopus_file_alias + ".csv")
-        new_scopus_df.to_csv(file_csv_path,
-                             header=True,
-                             index=False,
-                             sep=',')
+    # Saving the run report in the working folder of the year
+    run_report.set_info(authy_status=authy_status, update_status=update_status)
+    run_report.save(year_haltoscopus_path)
     return message, authy_status, update_status
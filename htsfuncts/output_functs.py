@@ -0,0 +1,215 @@
+"""Module of functions for saving and reading the dataframes built
+by the consolidation in the output format set by the OUTPUT_FORMAT global
+and for writing the consolidated Scopus csv file.
+
+The columnar formats ("parquet" and "feather") require the pyarrow package.
+When a columnar format is used, an Excel copy of the files is only
+saved if the EXCEL_EXPORT global is True.
+
+The xlsx files are streamed row by row in the constant memory mode
+of the xlsxwriter package if available, the default engine of pandas
+being used otherwise.
+
+The values of the object columns mixing types (for example integers
+and the UNKNOWN global) are saved as strings in the columnar formats.
+"""
+
+__all__ = ['read_output_df',
+           'save_appended_csv',
+           'save_output_df',
+          ]
+
+
+# Standard library imports
+import csv
+import logging
+import os
+import shutil
+import tempfile
+from importlib.util import find_spec
+from pathlib import Path
+
+# 3rd party imports
+import pandas as pd
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _check_output_format(output_format):
+    if output_format not in hts_pg.OUTPUT_FORMATS_LIST:
+        raise ValueError(f"Output format '{output_format}' not in "
+                         f"{hts_pg.OUTPUT_FORMATS_LIST}")
+
+
+def _save_xlsx_streamed(df, file_path):
+    """Saves the dataframe 'df' as xlsx file at 'file_path' writing its rows
+    by chunks of XLSX_CHUNK_ROWS_NB global rows in the constant memory mode
+    of the xlsxwriter package, with the header format of pandas."""
+    # pylint: disable-next=import-outside-toplevel
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True,
+                                               "strings_to_formulas": False,
+                                               "strings_to_urls": False,
+                                               "nan_inf_to_errors": True})
+    try:
+        worksheet = workbook.add_worksheet()
+        header_format = workbook.add_format({"bold": True, "border": 1,
+                                             "align": "center", "valign": "top"})
+        for col_idx, col in enumerate(df.columns):
+            worksheet.write(0, col_idx, str(col), header_format)
+        chunk_rows_nb = hts_pg.XLSX_CHUNK_ROWS_NB
+        for chunk_start in range(0, len(df), chunk_rows_nb):
+            chunk_df = df.iloc[chunk_start: chunk_start + chunk_rows_nb].astype(object)
+            chunk_rows_list = chunk_df.where(chunk_df.notna(), None).to_numpy().tolist()
+            for row_idx, row_list in enumerate(chunk_rows_list, start=chunk_start + 1):
+                worksheet.write_row(row_idx, 0, row_list)
+    finally:
+        workbook.close()
+
+
+def _set_columnar_df(df):
+    """Converts to strings the values, missing values apart, of the object
+    columns of the dataframe 'df' mixing types that pyarrow cannot convert
+    to a single column type."""
+    mixed_cols_list = [col for col in df.columns[df.dtypes == object]
+                       if pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed")]
+    if not mixed_cols_list:
+        return df
+    df = df.copy()
+    for col in mixed_cols_list:
+        df[col] = df[col].mask(df[col].notna(), df[col].astype(str))
+    return df
+
+
+def _save_df(df, file_path, output_format):
+    """Saves the dataframe 'df' at 'file_path' in the format 'output_format'."""
+    if output_format == "xlsx":
+        if find_spec("xlsxwriter") is not None:
+            _save_xlsx_streamed(df, file_path)
+        else:
+            _LOGGER.warning("xlsxwriter package not available, '%s' saved "
+                            "in memory by the default Excel engine of pandas", file_path)
+            df.to_excel(file_path, index=False)
+    elif output_format == "parquet":
+        _set_columnar_df(df).to_parquet(file_path, index=False)
+    else:
+        _set_columnar_df(df).reset_index(drop=True).to_feather(file_path)
+
+
+def save_output_df(df, folder_path, file_alias, output_format=None, excel_export=None):
+    """Saves the dataframe 'df' in the folder 'folder_path' under the name
+    'file_alias' with the extension of the output format.
+
+    Args:
+        df (dataframe): The dataframe to save.
+        folder_path (path): Full path to the folder where the file is saved.
+        file_alias (str): Name of the file without extension.
+        output_format (str): Format of the saved file among OUTPUT_FORMATS_LIST \
+        global (default: OUTPUT_FORMAT global).
+        excel_export (bool): If True, an Excel copy is also saved when \
+        the output format is columnar (default: EXCEL_EXPORT global).
+    Returns:
+        (list): The names (str) of the saved files.
+    """
+    if output_format is None:
+        output_format = hts_pg.OUTPUT_FORMAT
+    if excel_export is None:
+        excel_export = hts_pg.EXCEL_EXPORT
+    _check_output_format(output_format)
+
+    formats_list = [output_format]
+    if excel_export and output_format != "xlsx":
+        formats_list.append("xlsx")
+
+    files_list = []
+    for file_format in formats_list:
+        file_name = file_alias + "." + file_format
+        _save_df(df, Path(folder_path) / Path(file_name), file_format)
+        files_list.append(file_name)
+    return files_list
+
+
+def read_output_df(folder_path, file_alias, output_format=None):
+    """Reads the dataframe saved by the `save_output_df` function.
+
+    Args:
+        folder_path (path): Full path to the folder where the file is saved.
+        file_alias (str): Name of the file without extension.
+        output_format (str): Format of the saved file among OUTPUT_FORMATS_LIST \
+        global (default: OUTPUT_FORMAT global).
+    Returns:
+        (dataframe): The read dataframe.
+    """
+    if output_format is None:
+        output_format = hts_pg.OUTPUT_FORMAT
+    _check_output_format(output_format)
+    file_path = Path(folder_path) / Path(file_alias + "." + output_format)
+    if output_format == "xlsx":
+        return pd.read_excel(file_path)
+    if output_format == "parquet":
+        return pd.read_parquet(file_path)
+    return pd.read_feather(file_path)
+
+
+def _read_csv_header(file_path):
+    """Reads the columns names and the line terminator of the header
+    of the csv file 'file_path'."""
+    with open(file_path, encoding="utf-8-sig", newline="") as file:
+        header_line = file.readline()
+    line_terminator = "\r\n" if header_line.endswith("\r\n") else "\n"
+    columns_list = next(csv.reader([header_line]))
+    return columns_list, line_terminator
+
+
+def _ends_with_newline(file_path):
+    with open(file_path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        if not file.tell():
+            return True
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def save_appended_csv(init_file_path, new_file_path, added_df):
+    """Saves at 'new_file_path' the csv file 'init_file_path' streamed
+    byte-for-byte followed by the rows of 'added_df' aligned
+    to the header of the initial csv file.
+
+    The file is written in a temporary file of the destination folder
+    then atomically renamed so that the memory use does not depend
+    on the size of the initial file and that an interrupted write never
+    leaves a truncated file.
+
+    Args:
+        init_file_path (path): Full path to the initial csv file.
+        new_file_path (path): Full path to the csv file to save.
+        added_df (dataframe): The rows to append to the initial csv file.
+    Returns:
+        (int): The number of appended rows.
+    """
+    new_file_path = Path(new_file_path)
+    columns_list, line_terminator = _read_csv_header(init_file_path)
+    temp_fd, temp_path = tempfile.mkstemp(dir=new_file_path.parent,
+                                          prefix=new_file_path.name,
+                                          suffix=".tmp")
+    try:
+        with os.fdopen(temp_fd, "wb") as temp_file:
+            with open(init_file_path, "rb") as init_file:
+                shutil.copyfileobj(init_file, temp_file, hts_pg.COPY_BUFFER_SIZE)
+            if not added_df.empty:
+                if not _ends_with_newline(init_file_path):
+                    temp_file.write(line_terminator.encode("utf-8"))
+                aligned_df = added_df.reindex(columns=columns_list)
+                added_csv = aligned_df.to_csv(header=False, index=False, sep=",",
+                                              lineterminator=line_terminator)
+                temp_file.write(added_csv.encode("utf-8"))
+        os.replace(temp_path, new_file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return len(added_df)
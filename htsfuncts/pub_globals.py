@@ -1,10 +1,62 @@
 """Module for setting publicatoons globals."""
 
 __all__ = ['UNKNOWN',
+           'BATCH_WORKERS_NB',
+           'CACHE_FOLDER',
+           'CATEGORY_MAX_RATIO',
+           'CONSOLIDATION_PIPELINED',
+           'COPY_BUFFER_SIZE',
+           'EXCEL_EXPORT',
+           'FETCH_JOURNAL_FILE',
            'FILES_BASE',
+           'FOLDERS_INDEX_FILE',
+           'HAL_BACKOFF_BASE',
+           'HAL_BASE_URL',
+           'HAL_DELTA_OVERLAP_HOURS',
+           'HAL_FULL_REFRESH_DAYS',
+           'HAL_RETRIES_NB',
+           'HAL_SNAPSHOTS_FOLDER',
+           'HAL_TIMEOUT',
+           'HAL_WORKERS_NB',
+           'OUTPUT_FORMAT',
+           'OUTPUT_FORMATS_LIST',
+           'OUTPUT_WORKERS_NB',
+           'RUN_REPORT_FILE',
+           'SCOPUS_BACKOFF_BASE',
+           'SCOPUS_BACKOFF_MAX',
+           'SCOPUS_BASE_URL',
+           'SCOPUS_BREAKER_ERROR_RATE',
+           'SCOPUS_BREAKER_WINDOW',
+           'SCOPUS_CACHE_FILE',
+           'SCOPUS_CACHE_MAX_ENTRIES',
+           'SCOPUS_CACHE_TIMEOUT',
+           'SCOPUS_CACHE_TTL_DAYS',
+           'SCOPUS_CACHE_WAL',
+           'SCOPUS_DTYPES_SCHEMA',
+           'SCOPUS_FETCH_MODE',
+           'SCOPUS_FETCH_MODES_LIST',
+           'SCOPUS_MIN_TIMEOUT',
+           'SCOPUS_NEGATIVE_BACKOFF_DAYS',
+           'SCOPUS_NEGATIVE_BACKOFF_MAX_DAYS',
+           'SCOPUS_RATE_LIMIT',
+           'SCOPUS_RETRIES_NB',
+           'SCOPUS_RETRY_AFTER_MAX',
+           'SCOPUS_SEARCH_BASE_URL',
+           'SCOPUS_SEARCH_DOIS_NB',
+           'SCOPUS_SEARCH_QUERY_MAX_LENGTH',
+           'SCOPUS_SERVED_FETCH_MODES_DICT',
+           'SCOPUS_TIMEOUT',
+           'SCOPUS_TIMEOUT_FACTOR',
+           'SCOPUS_TIMEOUT_PERCENTILE',
+           'SCOPUS_WORKERS_NB',
+           'XLSX_CHUNK_ROWS_NB',
           ]
 
 
+# Standard library imports
+import os
+
+
 UNKNOWN = "unknown"
 
 FILES_BASE = {"scopus_base"      : "-final scopus",
@@ -14,3 +66,159 @@ FILES_BASE = {"scopus_base"      : "-final scopus",
               "hal_base"         : " hal",
               "new_doi_base"     : " hal_new_dois",
              }
+
+# Format of the files saved for the HAL extraction, the new DOIs list,
+# the added DOIs and the failed DOIs among OUTPUT_FORMATS_LIST
+# (the columnar formats "parquet" and "feather" require the pyarrow package)
+OUTPUT_FORMATS_LIST = ["xlsx", "parquet", "feather"]
+OUTPUT_FORMAT = "xlsx"
+
+# Excel copy of the files saved in a columnar output format
+EXCEL_EXPORT = False
+
+# Number of rows converted at once when streaming the xlsx files
+# with the xlsxwriter package and number of concurrent workers
+# saving the independent output files
+XLSX_CHUNK_ROWS_NB = 10000
+OUTPUT_WORKERS_NB = 4
+
+# Buffer size in bytes for streaming the initial Scopus csv file
+# to the consolidated one
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Json file of the stages durations and sizes of a consolidation run
+# saved in the working folder of the corpus year
+RUN_REPORT_FILE = "run_report.json"
+
+# Append-only json lines journal of the DOIs resolved through the Scopus API
+# saved in the working folder of the corpus year until the end of the run
+FETCH_JOURNAL_FILE = "scopus_fetch_journal.jsonl"
+
+# Local json file of the indexes of the working folders (years folders,
+# presence and modification times of the files of FILES_BASE) served at once
+# to the GUI and refreshed in background, the working folders being possibly
+# on slow network shares
+FOLDERS_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".HalToScopus",
+                                  "folders_index.json")
+
+# Folder of the working folder where the persistent caches are stored
+CACHE_FOLDER = "HalToScopus_cache"
+
+# Persistent cache of the Scopus API results keyed by normalized DOI
+SCOPUS_CACHE_FILE = "scopus_cache.sqlite"
+SCOPUS_CACHE_TTL_DAYS = 30
+SCOPUS_CACHE_MAX_ENTRIES = 100000
+
+# Waiting time in seconds for the cache locks held by concurrent processes
+# and write-ahead log journal mode of the cache letting the reads run
+# during the writes (off by default, the working folders being on network
+# shares not supported by this mode; to set to True only if the working
+# folder is on a local disk)
+SCOPUS_CACHE_TIMEOUT = 60
+SCOPUS_CACHE_WAL = False
+
+# Back-off delays in days before requesting again the DOIs not found
+# in the Scopus database, doubled at each fail up to the maximum delay
+SCOPUS_NEGATIVE_BACKOFF_DAYS = 7
+SCOPUS_NEGATIVE_BACKOFF_MAX_DAYS = 180
+
+# Scopus API requests parameters (the rate limit in requests per second
+# is the default throttling rate of the Scopus Abstract Retrieval API)
+SCOPUS_TIMEOUT = 30
+SCOPUS_WORKERS_NB = 5
+SCOPUS_RATE_LIMIT = 9
+
+# Mode of the Scopus API requests among SCOPUS_FETCH_MODES_LIST: one Abstract
+# Retrieval API request per DOI ("doi") or Scopus Search API requests grouping
+# up to SCOPUS_SEARCH_DOIS_NB DOIs in queries of at most
+# SCOPUS_SEARCH_QUERY_MAX_LENGTH characters ("search")
+SCOPUS_FETCH_MODES_LIST = ["doi", "search"]
+SCOPUS_FETCH_MODE = "doi"
+SCOPUS_SEARCH_DOIS_NB = 25
+SCOPUS_SEARCH_QUERY_MAX_LENGTH = 2000
+
+# Fetch modes of the cached and journaled publications information served
+# to each fetch mode, the partial information got through the Scopus Search API
+# being not served to the per-DOI fetch mode
+SCOPUS_SERVED_FETCH_MODES_DICT = {"doi"    : ["doi"],
+                                  "search" : ["doi", "search"],
+                                 }
+
+# Adaptive timeout of the Scopus API requests set as a factor of the observed
+# latency percentile, bounded by SCOPUS_MIN_TIMEOUT and SCOPUS_TIMEOUT seconds
+SCOPUS_MIN_TIMEOUT = 5
+SCOPUS_TIMEOUT_PERCENTILE = 0.95
+SCOPUS_TIMEOUT_FACTOR = 3
+
+# Retries of the Scopus API requests failed by a timeout, a connection error,
+# a throttling (HTTP 429) or a server error with an exponential back-off
+# in seconds with jitter
+SCOPUS_RETRIES_NB = 3
+SCOPUS_BACKOFF_BASE = 1
+SCOPUS_BACKOFF_MAX = 30
+
+# Longest delay in seconds of the 'Retry-After' header of a throttled Scopus API
+# request waited before retrying, the Scopus API requests being stopped
+# by opening the circuit breaker for a longer delay (exhausted quota)
+SCOPUS_RETRY_AFTER_MAX = 300
+
+# Circuit breaker stopping the Scopus API requests when the error rate
+# of the last SCOPUS_BREAKER_WINDOW requests exceeds SCOPUS_BREAKER_ERROR_RATE
+SCOPUS_BREAKER_WINDOW = 50
+SCOPUS_BREAKER_ERROR_RATE = 0.5
+
+# Compact dtypes of the columns of the Scopus extraction: "category"
+# for the low-cardinality text columns converted to categoricals when their
+# ratio of distinct values does not exceed CATEGORY_MAX_RATIO, "integer"
+# for the numeric columns converted to the smallest integer dtype
+SCOPUS_DTYPES_SCHEMA = {"Year"                          : "integer",
+                        "Volume"                        : "integer",
+                        "Issue"                         : "integer",
+                        "Page start"                    : "integer",
+                        "Page end"                      : "integer",
+                        "Page count"                    : "integer",
+                        "Cited by"                      : "integer",
+                        "PubMed ID"                     : "integer",
+                        "Source title"                  : "category",
+                        "Abbreviated Source Title"      : "category",
+                        "Publisher"                     : "category",
+                        "ISSN"                          : "category",
+                        "CODEN"                         : "category",
+                        "Language of Original Document" : "category",
+                        "Document Type"                 : "category",
+                        "Publication Stage"             : "category",
+                        "Open Access"                   : "category",
+                        "Source"                        : "category",
+                       }
+CATEGORY_MAX_RATIO = 0.5
+
+# Pipelined consolidation requesting the Scopus API for the DOIs of each
+# page of the HAL API responses as soon as it is available and saving
+# the output files in a background writer thread
+CONSOLIDATION_PIPELINED = False
+
+# HAL API requests parameters (the queries being split by document type
+# in slices fetched by HAL_WORKERS_NB concurrent workers, 1 for a single query,
+# the failed requests being retried HAL_RETRIES_NB times after a delay
+# doubled at each retry starting from HAL_BACKOFF_BASE seconds)
+HAL_TIMEOUT = 5
+HAL_WORKERS_NB = 3
+HAL_RETRIES_NB = 3
+HAL_BACKOFF_BASE = 1
+
+# Incremental refresh of the HAL extractions snapshots
+# stored in the cache folder
+HAL_SNAPSHOTS_FOLDER = "hal_snapshots"
+HAL_DELTA_OVERLAP_HOURS = 24
+HAL_FULL_REFRESH_DAYS = 30
+
+# Number of worker processes for the batch consolidation of several years
+BATCH_WORKERS_NB = 4
+
+# Base URLs of the HAL search API, of the Scopus abstract API and of the Scopus
+# search API replacing the default ones when not None, for example for pointing
+# to a local stand-in server (default: HTS_HAL_BASE_URL, HTS_SCOPUS_BASE_URL
+# and HTS_SCOPUS_SEARCH_BASE_URL environment variables)
+HAL_BASE_URL = os.environ.get("HTS_HAL_BASE_URL")
+SCOPUS_BASE_URL = os.environ.get("HTS_SCOPUS_BASE_URL")
+SCOPUS_SEARCH_BASE_URL = os.environ.get("HTS_SCOPUS_SEARCH_BASE_URL")
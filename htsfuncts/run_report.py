@@ -0,0 +1,132 @@
+"""Module of the instrumentation of the consolidation runs collecting
+the durations, rows numbers and bytes numbers of each stage and saving
+them as a json run report next to the outputs."""
+
+__all__ = ['RunReport',
+           'files_bytes_nb',
+          ]
+
+
+# Standard library imports
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+def files_bytes_nb(folder_path, files_list):
+    """Returns the total size in bytes of the files of 'files_list'
+    available in the folder 'folder_path'."""
+    bytes_nb = 0
+    for file_name in files_list:
+        file_path = Path(folder_path) / Path(file_name)
+        if os.path.exists(file_path):
+            bytes_nb += os.path.getsize(file_path)
+    return bytes_nb
+
+
+class RunReport:
+    """Collector of the durations, rows numbers and bytes numbers
+    of the stages of a consolidation run.
+
+    The durations of a stage run several times are summed.
+
+    Args:
+        info (dict): The run information (institute, corpus year...) \
+        saved at the top of the report.
+    """
+    def __init__(self, **info):
+        self.info_dict = {"started_at": datetime.now().isoformat(timespec="seconds")}
+        self.info_dict.update(info)
+        self.stages_dict = {}
+        self._start_time = time.perf_counter()
+
+    def _get_stage(self, name):
+        return self.stages_dict.setdefault(name, {"duration_s": 0.0,
+                                                  "rows_nb": None,
+                                                  "bytes_nb": None})
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager adding the duration of its block to the stage 'name'."""
+        stage_dict = self._get_stage(name)
+        start_time = time.perf_counter()
+        try:
+            yield stage_dict
+        finally:
+            stage_dict["duration_s"] += time.perf_counter() - start_time
+
+    def set_counts(self, name, rows_nb=None, bytes_nb=None):
+        """Sets the numbers of rows and bytes processed by the stage 'name'."""
+        stage_dict = self._get_stage(name)
+        if rows_nb is not None:
+            stage_dict["rows_nb"] = int(rows_nb)
+        if bytes_nb is not None:
+            stage_dict["bytes_nb"] = int(bytes_nb)
+
+    def merge(self, run_report):
+        """Adds the stages and the information of the report 'run_report'."""
+        for name, stage_dict in run_report.stages_dict.items():
+            self.stages_dict[name] = dict(stage_dict)
+        self.info_dict.update({key: value for key, value in run_report.info_dict.items()
+                               if key != "started_at"})
+
+    def accumulate(self, run_report):
+        """Adds the durations, the counts and the numerical information
+        of the report 'run_report' to the ones of the report,
+        the boolean information being combined with a logical or."""
+        for name, stage_dict in run_report.stages_dict.items():
+            self_stage_dict = self._get_stage(name)
+            self_stage_dict["duration_s"] += stage_dict["duration_s"]
+            for key in ["rows_nb", "bytes_nb"]:
+                if stage_dict[key] is not None:
+                    self_stage_dict[key] = (self_stage_dict[key] or 0) + stage_dict[key]
+        for key, value in run_report.info_dict.items():
+            if key == "started_at":
+                continue
+            if isinstance(value, bool):
+                self.info_dict[key] = self.info_dict.get(key, False) or value
+            elif isinstance(value, (int, float)):
+                self.info_dict[key] = self.info_dict.get(key, 0) + value
+            else:
+                self.info_dict[key] = value
+
+    def set_info(self, **info):
+        """Sets run information saved at the top of the report."""
+        self.info_dict.update(info)
+
+    def to_dict(self):
+        """Returns the report as a json serializable dict."""
+        stages_dict = {name: dict(stage_dict, duration_s=round(stage_dict["duration_s"], 6))
+                       for name, stage_dict in self.stages_dict.items()}
+        report_dict = dict(self.info_dict)
+        report_dict["total_duration_s"] = round(time.perf_counter() - self._start_time, 6)
+        report_dict["stages"] = stages_dict
+        return report_dict
+
+    def save(self, folder_path):
+        """Saves atomically the report as RUN_REPORT_FILE global json file
+        in the folder 'folder_path'.
+
+        Returns:
+            (dict): The saved report.
+        """
+        report_dict = self.to_dict()
+        report_path = Path(folder_path) / Path(hts_pg.RUN_REPORT_FILE)
+        temp_fd, temp_path = tempfile.mkstemp(dir=folder_path,
+                                              prefix=report_path.name,
+                                              suffix=".tmp")
+        try:
+            with os.fdopen(temp_fd, "w", encoding="utf-8") as temp_file:
+                json.dump(report_dict, temp_file, indent=4)
+            os.replace(temp_path, report_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return report_dict
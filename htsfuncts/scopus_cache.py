@@ -0,0 +1,304 @@
+"""Module of functions for managing the persistent on-disk cache
+of the publications information got through the Scopus API.
+
+The cache is a SQLite database stored in the working folder and keyed
+by the normalized DOI of the publications. Each entry records the fetch mode
+of the Scopus API requests that got it, the partial entries got through
+the Scopus Search API being not served to the per-DOI fetch mode.
+It also holds the negative
+cache of the DOIs not found in the Scopus database, that are requested
+again only after an exponentially growing back-off delay.
+"""
+
+__all__ = ['get_cached_scopus_df',
+           'get_negative_cached_dois',
+           'set_scopus_cache_path',
+           'update_negative_cache',
+           'update_scopus_cache',
+          ]
+
+
+# Standard library imports
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+# 3rd party imports
+import pandas as pd
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+from htsfuncts.doi_functs import normalize_dois
+
+
+# Maximum number of SQL variables per query (SQLite default limit is 999)
+_SQL_CHUNK_SIZE = 500
+
+
+def _connect_cache(cache_path):
+    """Opens the cache database creating it if it does not exist,
+    waiting up to SCOPUS_CACHE_TIMEOUT global seconds for the locks
+    of the other connections, in the write-ahead log journal mode
+    if the SCOPUS_CACHE_WAL global is True and in the rollback journal mode
+    otherwise, the journal mode being persistent in the database file."""
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(cache_path, timeout=hts_pg.SCOPUS_CACHE_TIMEOUT)
+    journal_mode = "WAL" if hts_pg.SCOPUS_CACHE_WAL else "DELETE"
+    connection.execute(f"PRAGMA journal_mode={journal_mode}")
+    connection.execute("CREATE TABLE IF NOT EXISTS scopus_rows ("
+                       "doi TEXT PRIMARY KEY, "
+                       "row_json TEXT NOT NULL, "
+                       "fetched_at REAL NOT NULL, "
+                       "last_used REAL NOT NULL, "
+                       "fetch_mode TEXT NOT NULL DEFAULT 'doi')")
+    columns_list = [row[1] for row in connection.execute("PRAGMA table_info(scopus_rows)")]
+    if "fetch_mode" not in columns_list:
+        # Upgrading a cache created before the recording of the fetch modes
+        # when only the per-DOI fetch mode was available
+        connection.execute("ALTER TABLE scopus_rows "
+                           "ADD COLUMN fetch_mode TEXT NOT NULL DEFAULT 'doi'")
+    connection.execute("CREATE TABLE IF NOT EXISTS scopus_failures ("
+                       "doi TEXT PRIMARY KEY, "
+                       "fail_reason TEXT NOT NULL, "
+                       "first_seen REAL NOT NULL, "
+                       "last_tried REAL NOT NULL, "
+                       "attempts INTEGER NOT NULL)")
+    return connection
+
+
+def _chunks(items_list, chunk_size=_SQL_CHUNK_SIZE):
+    """Yields the successive slices of 'items_list' of 'chunk_size' items."""
+    for idx in range(0, len(items_list), chunk_size):
+        yield items_list[idx: idx + chunk_size]
+
+
+def set_scopus_cache_path(haltoscopus_path):
+    """Sets the full path to the Scopus cache database
+    of the working folder.
+
+    Args:
+        haltoscopus_path (path): Full path to working folder.
+    Returns:
+        (path): Full path to the Scopus cache database.
+    """
+    cache_path = Path(haltoscopus_path) / Path(hts_pg.CACHE_FOLDER) \
+                 / Path(hts_pg.SCOPUS_CACHE_FILE)
+    return cache_path
+
+
+def get_cached_scopus_df(cache_path, doi_list, ttl_days=None, fetch_mode=None):
+    """Gets the publications information available in the cache
+    for the DOIs of 'doi_list' and the DOIs missing in the cache.
+
+    The cache entries older than 'ttl_days' days are considered as missing,
+    as well as the partial entries got through the Scopus Search API
+    when 'fetch_mode' is the per-DOI fetch mode.
+
+    Args:
+        cache_path (path): Full path to the Scopus cache database.
+        doi_list (list): The list of DOIs (str) as passed to the Scopus API.
+        ttl_days (float): Time to live in days of the cache entries \
+        (default: SCOPUS_CACHE_TTL_DAYS global).
+        fetch_mode (str): The fetch mode of the Scopus API requests among \
+        SCOPUS_FETCH_MODES_LIST global (default: SCOPUS_FETCH_MODE global).
+    Returns:
+        (tup): (dataframe of the cached publications information, \
+        list of the DOIs of 'doi_list' missing in the cache).
+    """
+    if ttl_days is None:
+        ttl_days = hts_pg.SCOPUS_CACHE_TTL_DAYS
+    if fetch_mode is None:
+        fetch_mode = hts_pg.SCOPUS_FETCH_MODE
+    served_modes_list = hts_pg.SCOPUS_SERVED_FETCH_MODES_DICT[fetch_mode]
+    modes_placeholders = ",".join("?" * len(served_modes_list))
+    now = time.time()
+    min_fetched_at = now - ttl_days * 86400
+
+    keys_series = normalize_dois(doi_list)
+    doi_dict = {key: doi for key, doi in zip(keys_series, doi_list) if not pd.isna(key)}
+    keys_list = list(doi_dict.keys())
+    cached_rows_dict = {}
+    connection = _connect_cache(cache_path)
+    try:
+        for keys_chunk in _chunks(keys_list):
+            placeholders = ",".join("?" * len(keys_chunk))
+            cursor = connection.execute("SELECT doi, row_json FROM scopus_rows "
+                                        f"WHERE doi IN ({placeholders}) "
+                                        "AND fetched_at >= ? "
+                                        f"AND fetch_mode IN ({modes_placeholders})",
+                                        (*keys_chunk, min_fetched_at, *served_modes_list))
+            for key, row_json in cursor:
+                cached_rows_dict[key] = json.loads(row_json)
+
+        # Updating last use of cached entries for size-based eviction
+        with connection:
+            connection.executemany("UPDATE scopus_rows SET last_used = ? WHERE doi = ?",
+                                   [(now, key) for key in cached_rows_dict])
+    finally:
+        connection.close()
+
+    cached_df = pd.DataFrame(list(cached_rows_dict.values()))
+    missing_doi_list = [doi for key, doi in doi_dict.items()
+                        if key not in cached_rows_dict]
+    return cached_df, missing_doi_list
+
+
+def update_scopus_cache(cache_path, scopus_df, max_entries=None, ttl_days=None,
+                        fetch_mode=None):
+    """Stores the publications information of 'scopus_df' in the cache
+    and purges the cache from expired entries and from the least recently
+    used entries above 'max_entries' entries.
+
+    Args:
+        cache_path (path): Full path to the Scopus cache database.
+        scopus_df (dataframe): The publications information \
+        as got from the Scopus API.
+        max_entries (int): Maximum number of entries in the cache \
+        (default: SCOPUS_CACHE_MAX_ENTRIES global).
+        ttl_days (float): Time to live in days of the cache entries \
+        (default: SCOPUS_CACHE_TTL_DAYS global).
+        fetch_mode (str): The fetch mode of the Scopus API requests \
+        that got 'scopus_df' (default: SCOPUS_FETCH_MODE global).
+    Returns:
+        (int): The number of entries stored in the cache.
+    """
+    if fetch_mode is None:
+        fetch_mode = hts_pg.SCOPUS_FETCH_MODE
+    if max_entries is None:
+        max_entries = hts_pg.SCOPUS_CACHE_MAX_ENTRIES
+    if ttl_days is None:
+        ttl_days = hts_pg.SCOPUS_CACHE_TTL_DAYS
+    now = time.time()
+
+    rows_list = []
+    if "DOI" in scopus_df.columns:
+        keys_series = normalize_dois(scopus_df["DOI"].tolist())
+        for key, row_dict in zip(keys_series, scopus_df.to_dict(orient="records")):
+            if not pd.isna(key):
+                rows_list.append((key, json.dumps(row_dict, default=str),
+                                  now, now, fetch_mode))
+
+    connection = _connect_cache(cache_path)
+    try:
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO scopus_rows "
+                                   "(doi, row_json, fetched_at, last_used, fetch_mode) "
+                                   "VALUES (?, ?, ?, ?, ?)", rows_list)
+            connection.execute("DELETE FROM scopus_rows WHERE fetched_at < ?",
+                               (now - ttl_days * 86400,))
+            connection.execute("DELETE FROM scopus_rows WHERE doi NOT IN "
+                               "(SELECT doi FROM scopus_rows "
+                               "ORDER BY last_used DESC LIMIT ?)",
+                               (max_entries,))
+    finally:
+        connection.close()
+    return len(rows_list)
+
+
+def _set_backoff_s(attempts, base_days, max_days):
+    """Sets the back-off delay in seconds before requesting again a DOI
+    not found 'attempts' times, doubling at each attempt up to 'max_days' days."""
+    return min(base_days * 2 ** (attempts - 1), max_days) * 86400
+
+
+def get_negative_cached_dois(cache_path, doi_list, force_recheck=False,
+                             base_days=None, max_days=None):
+    """Gets the DOIs of 'doi_list' recently not found in the Scopus database
+    and the DOIs to be requested to the Scopus API.
+
+    A DOI not found 'attempts' times is requested again after a back-off
+    delay of 'base_days' days doubled at each attempt up to 'max_days' days.
+
+    Args:
+        cache_path (path): Full path to the Scopus cache database.
+        doi_list (list): The list of DOIs (str) as passed to the Scopus API.
+        force_recheck (bool): If True, all the DOIs are to be requested \
+        whatever their back-off delay.
+        base_days (float): Back-off delay in days after the first fail \
+        (default: SCOPUS_NEGATIVE_BACKOFF_DAYS global).
+        max_days (float): Maximum back-off delay in days \
+        (default: SCOPUS_NEGATIVE_BACKOFF_MAX_DAYS global).
+    Returns:
+        (tup): (dataframe of the DOIs of 'doi_list' in back-off with the reasons \
+        of their fail, list of the DOIs of 'doi_list' to be requested).
+    """
+    if base_days is None:
+        base_days = hts_pg.SCOPUS_NEGATIVE_BACKOFF_DAYS
+    if max_days is None:
+        max_days = hts_pg.SCOPUS_NEGATIVE_BACKOFF_MAX_DAYS
+    failed_df = pd.DataFrame(columns=["DOI", "Fail reason"])
+    if force_recheck or not doi_list:
+        return failed_df, doi_list
+    now = time.time()
+
+    keys_series = normalize_dois(doi_list)
+    keys_list = list({key for key in keys_series if not pd.isna(key)})
+    backoff_reasons_dict = {}
+    connection = _connect_cache(cache_path)
+    try:
+        for keys_chunk in _chunks(keys_list):
+            placeholders = ",".join("?" * len(keys_chunk))
+            cursor = connection.execute("SELECT doi, fail_reason, last_tried, attempts "
+                                        "FROM scopus_failures "
+                                        f"WHERE doi IN ({placeholders})",
+                                        keys_chunk)
+            for key, fail_reason, last_tried, attempts in cursor:
+                if now < last_tried + _set_backoff_s(attempts, base_days, max_days):
+                    backoff_reasons_dict[key] = fail_reason
+    finally:
+        connection.close()
+
+    failed_list = []
+    missing_doi_list = []
+    for key, doi in zip(keys_series, doi_list):
+        if not pd.isna(key) and key in backoff_reasons_dict:
+            failed_list.append([doi, backoff_reasons_dict[key]])
+        else:
+            missing_doi_list.append(doi)
+    if failed_list:
+        failed_df = pd.DataFrame(failed_list, columns=["DOI", "Fail reason"])
+    return failed_df, missing_doi_list
+
+
+def update_negative_cache(cache_path, failed_doi_df, scopus_df):
+    """Stores the DOIs of 'failed_doi_df' not found in the Scopus database
+    in the negative cache and removes from it the DOIs of 'scopus_df'.
+
+    The other fails (timeouts, HTTP errors, cancellation...) are not cached.
+
+    Args:
+        cache_path (path): Full path to the Scopus cache database.
+        failed_doi_df (dataframe): The failed DOIs with the reasons of their fail \
+        as got from the Scopus API.
+        scopus_df (dataframe): The publications information \
+        as got from the Scopus API.
+    Returns:
+        (int): The number of DOIs stored in the negative cache.
+    """
+    now = time.time()
+    not_found_df = failed_doi_df[failed_doi_df["Fail reason"] == "Not found"]
+    not_found_keys_list = [key for key in normalize_dois(not_found_df["DOI"].tolist())
+                           if not pd.isna(key)]
+    found_keys_list = []
+    if "DOI" in scopus_df.columns:
+        found_keys_list = [key for key in normalize_dois(scopus_df["DOI"].tolist())
+                           if not pd.isna(key)]
+
+    connection = _connect_cache(cache_path)
+    try:
+        with connection:
+            connection.executemany("INSERT INTO scopus_failures "
+                                   "(doi, fail_reason, first_seen, last_tried, attempts) "
+                                   "VALUES (?, 'Not found', ?, ?, 1) "
+                                   "ON CONFLICT(doi) DO UPDATE SET "
+                                   "last_tried = excluded.last_tried, "
+                                   "attempts = attempts + 1",
+                                   [(key, now, now) for key in not_found_keys_list])
+            for keys_chunk in _chunks(found_keys_list):
+                placeholders = ",".join("?" * len(keys_chunk))
+                connection.execute("DELETE FROM scopus_failures "
+                                   f"WHERE doi IN ({placeholders})", keys_chunk)
+    finally:
+        connection.close()
+    return len(not_found_keys_list)
@@ -0,0 +1,499 @@
+"""Module of functions for getting publications information from the Scopus
+API for a list of DOIs using a bounded pool of concurrent workers
+throttled by a token-bucket rate limiter.
+
+The requests use a timeout adapted to the observed latencies, are retried
+with an exponential back-off and stopped by a circuit breaker when
+the Scopus API fails repeatedly.
+"""
+
+__all__ = ['AdaptiveTimeout',
+           'CircuitBreaker',
+           'SharedTokenBucket',
+           'TokenBucket',
+           'build_scopus_df_concurrently',
+           'defer_api_uses_nb',
+           'parse_retry_after',
+           'request_with_retries',
+           'update_api_uses_nb',
+          ]
+
+
+# Standard library imports
+import json
+import multiprocessing
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+
+# 3rd party imports
+import pandas as pd
+import requests
+import ScopusApyJson as saj
+import ScopusApyJson.saj_globals as saj_g
+from requests.exceptions import RequestException
+from requests.exceptions import Timeout
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter.
+
+    Tokens are refilled at 'rate' tokens per second up to 'capacity' tokens.
+    Each call to the `acquire` method consumes one token, waiting for
+    its availability if necessary.
+
+    Args:
+        rate (float): Refill rate in tokens per second.
+        capacity (float): Maximum number of tokens (default: 'rate').
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else self.rate
+        # State as [available tokens, last refill time]
+        self._state = [self.capacity, time.monotonic()]
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Consumes one token, waiting for its availability."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens = min(self.capacity,
+                             self._state[0] + (now - self._state[1]) * self.rate)
+                self._state[1] = now
+                if tokens >= 1:
+                    self._state[0] = tokens - 1
+                    return
+                self._state[0] = tokens
+                wait_time = (1 - tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token-bucket rate limiter shared between processes.
+
+    The bucket state is stored in shared memory so that the instance
+    has to be passed to the worker processes at their creation
+    (for example through the 'initargs' of a process pool).
+
+    Args:
+        rate (float): Refill rate in tokens per second.
+        capacity (float): Maximum number of tokens (default: 'rate').
+    """
+    def __init__(self, rate, capacity=None):
+        super().__init__(rate, capacity)
+        self._state = multiprocessing.Array("d", [self.capacity, time.monotonic()])
+        self._lock = self._state.get_lock()
+
+
+class AdaptiveTimeout:
+    """Thread-safe timeout of the requests adapted to the latencies
+    of the last successful requests.
+
+    The timeout is 'factor' times the 'percentile' of the latencies
+    bounded by 'min_timeout' and 'max_timeout', the 'max_timeout' being used
+    until 'min_samples' latencies are observed.
+
+    Args:
+        max_timeout (float): The maximum timeout in seconds \
+        (default: SCOPUS_TIMEOUT global).
+        min_timeout (float): The minimum timeout in seconds \
+        (default: SCOPUS_MIN_TIMEOUT global).
+        percentile (float): The percentile of the latencies between 0 and 1 \
+        (default: SCOPUS_TIMEOUT_PERCENTILE global).
+        factor (float): The factor applied to the latencies percentile \
+        (default: SCOPUS_TIMEOUT_FACTOR global).
+        window (int): The number of last latencies kept.
+        min_samples (int): The number of latencies required for adapting the timeout.
+    """
+    def __init__(self, max_timeout=None, min_timeout=None, percentile=None, factor=None,
+                 window=200, min_samples=20):
+        self.max_timeout = max_timeout if max_timeout else hts_pg.SCOPUS_TIMEOUT
+        self.min_timeout = min(min_timeout if min_timeout else hts_pg.SCOPUS_MIN_TIMEOUT,
+                               self.max_timeout)
+        self.percentile = percentile if percentile else hts_pg.SCOPUS_TIMEOUT_PERCENTILE
+        self.factor = factor if factor else hts_pg.SCOPUS_TIMEOUT_FACTOR
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, latency):
+        """Records the latency in seconds of a successful request."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def get_timeout(self, attempt=0):
+        """Returns the timeout in seconds of the request attempt 'attempt',
+        doubled at each retry up to the maximum timeout."""
+        with self._lock:
+            latencies_list = sorted(self._latencies)
+        if len(latencies_list) < self.min_samples:
+            return self.max_timeout
+        latency = latencies_list[min(len(latencies_list) - 1,
+                                     int(self.percentile * len(latencies_list)))]
+        timeout = max(self.min_timeout, self.factor * latency) * 2 ** attempt
+        return min(self.max_timeout, timeout)
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker opened for good when the error rate
+    of the last 'window' requests exceeds 'error_rate'.
+
+    Args:
+        window (int): The number of last requests considered \
+        (default: SCOPUS_BREAKER_WINDOW global).
+        error_rate (float): The error rate between 0 and 1 opening the circuit \
+        (default: SCOPUS_BREAKER_ERROR_RATE global).
+    """
+    def __init__(self, window=None, error_rate=None):
+        window = window if window else hts_pg.SCOPUS_BREAKER_WINDOW
+        self.error_rate = error_rate if error_rate else hts_pg.SCOPUS_BREAKER_ERROR_RATE
+        self._errors = deque(maxlen=window)
+        self._open_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """True if the requests are stopped."""
+        return self._open_event.is_set()
+
+    def open(self):
+        """Opens the circuit, stopping the requests for good."""
+        self._open_event.set()
+
+    def record(self, error_status):
+        """Records the result of a request, 'error_status' being True
+        for a failed request."""
+        with self._lock:
+            self._errors.append(bool(error_status))
+            if (len(self._errors) == self._errors.maxlen
+                    and sum(self._errors) > self.error_rate * len(self._errors)):
+                self._open_event.set()
+
+
+def parse_retry_after(retry_after):
+    """Parses the value of the 'Retry-After' header of an HTTP response.
+
+    Args:
+        retry_after (str): The header value given either as seconds \
+        or as HTTP date, None if the header is missing.
+    Returns:
+        (float): The delay in seconds, not negative, None if not parsable.
+    """
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+def _set_backoff_delay(attempt, retry_after=None):
+    """Sets the delay in seconds before the retry 'attempt' as an exponential
+    back-off with full jitter, not shorter than the 'retry_after' delay."""
+    backoff_max = min(hts_pg.SCOPUS_BACKOFF_MAX, hts_pg.SCOPUS_BACKOFF_BASE * 2 ** attempt)
+    delay = random.uniform(0, backoff_max)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _set_els_doi_api(doi, api_config_dict):
+    """Sets the Scopus API query for the DOI 'doi' as done
+    by the ScopusApyJson package, using the SCOPUS_BASE_URL global
+    base URL if set."""
+    els_link = saj_g.ELS_LINK
+    if hts_pg.SCOPUS_BASE_URL:
+        els_link = hts_pg.SCOPUS_BASE_URL.rstrip('/') + '/'
+    els_api = (els_link + doi + '?'
+               + '&apikey=' + api_config_dict["apikey"]
+               + '&insttoken=' + api_config_dict["insttoken"]
+               + '&httpAccept=application/json')
+    return els_api
+
+
+def _get_doi_json_data(session, doi, timeout):
+    """Gets the hierarchical dict of the Scopus API response for the DOI 'doi'
+    with the request status as defined by the ScopusApyJson package
+    ("True", "Empty", "Timeout" or "False" for authentication failure)
+    and the delay in seconds of the 'Retry-After' header if any."""
+    els_api = _set_els_doi_api(doi, saj_g.API_CONFIG_DICT)
+    try:
+        response = session.get(els_api, timeout=timeout)
+    except Timeout:
+        return None, "Timeout", None
+    except RequestException:
+        return None, "Connection error", None
+    if response.status_code in [204, 404]:
+        return None, "Empty", None
+    if response.status_code in [401, 403]:
+        return None, "False", None
+    if response.status_code != 200:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        return None, f"HTTP error {response.status_code}", retry_after
+    return response.json(), "True", None
+
+
+def _is_retryable(request_status):
+    """Returns True if the request failed with a transient error."""
+    if request_status in ["Timeout", "Connection error"]:
+        return True
+    if request_status.startswith("HTTP error "):
+        status_code = request_status[len("HTTP error "):]
+        return status_code == "429" or status_code.startswith("5")
+    return False
+
+
+def request_with_retries(get_data_function, rate_limiter, adaptive_timeout,
+                         circuit_breaker, cancel_event=None):
+    """Runs the request function 'get_data_function' retrying the transient
+    errors with an exponential back-off.
+
+    The 'Retry-After' delay of a throttled request is waited before
+    the retry unless it exceeds the SCOPUS_RETRY_AFTER_MAX global,
+    the circuit breaker being then opened so that all the requests stop.
+
+    Args:
+        get_data_function (function): Function called with the timeout \
+        in seconds returning the data, the request status \
+        and the 'Retry-After' delay as the `_get_doi_json_data` function.
+        rate_limiter (TokenBucket): The rate limiter of the requests.
+        adaptive_timeout (AdaptiveTimeout): The timeout of the requests.
+        circuit_breaker (CircuitBreaker): The circuit breaker stopping the requests.
+        cancel_event (threading.Event): Event that stops the retries \
+        when set (default: None).
+    Returns:
+        (tup): (data or None, request status with "Cancelled" or "Circuit open" \
+        for a stopped request, number of requests performed).
+    """
+    request_status, retry_after = None, None
+    attempts_nb = 0
+    for attempt in range(hts_pg.SCOPUS_RETRIES_NB + 1):
+        if attempt:
+            delay = _set_backoff_delay(attempt - 1, retry_after)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    return None, "Cancelled", attempts_nb
+            else:
+                time.sleep(delay)
+        if circuit_breaker.is_open:
+            return None, "Circuit open", attempts_nb
+        rate_limiter.acquire()
+        start_time = time.perf_counter()
+        data, request_status, retry_after = \
+            get_data_function(adaptive_timeout.get_timeout(attempt))
+        attempts_nb += 1
+        retry_status = _is_retryable(request_status)
+        circuit_breaker.record(retry_status)
+        if not retry_status:
+            if request_status in ["True", "Empty"]:
+                adaptive_timeout.observe(time.perf_counter() - start_time)
+            return data, request_status, attempts_nb
+        if retry_after is not None and retry_after > hts_pg.SCOPUS_RETRY_AFTER_MAX:
+            # Stopping all the requests instead of waiting for the end of the throttling
+            circuit_breaker.open()
+            return None, "Circuit open", attempts_nb
+    return None, request_status, attempts_nb
+
+
+# Lock of the updates of the number of Scopus API requests and list
+# of the number of requests counted instead of being saved
+# by the `defer_api_uses_nb` context manager (None when saved at once)
+_API_USES_LOCK = threading.Lock()
+_DEFERRED_API_USES_LIST = None
+
+
+def update_api_uses_nb(requests_nb):
+    """Updates the number of requests performed by the user
+    in the ScopusApyJson configuration json file.
+
+    In the block of the `defer_api_uses_nb` context manager, the requests
+    are only counted, the file being left unchanged.
+
+    Args:
+        requests_nb (int): The number of Scopus API requests performed.
+    """
+    with _API_USES_LOCK:
+        if _DEFERRED_API_USES_LIST is not None:
+            _DEFERRED_API_USES_LIST[0] += requests_nb
+            return
+        api_config_dict = saj_g.API_CONFIG_DICT
+        api_config_dict["api_uses_nb"] = api_config_dict["api_uses_nb"] + requests_nb
+        with open(saj_g.API_CONFIG_PATH, 'w', encoding="utf-8") as file:
+            json.dump(api_config_dict, file, indent=4)
+
+
+@contextmanager
+def defer_api_uses_nb():
+    """Context manager counting the Scopus API requests performed in its block
+    instead of saving them in the ScopusApyJson configuration json file,
+    so that worker processes leave the update of the file to their parent
+    process through the `update_api_uses_nb` function.
+
+    Yields:
+        (list): The single-item list of the number of requests (int) counted.
+    """
+    global _DEFERRED_API_USES_LIST  # pylint: disable=global-statement
+    api_uses_list = [0]
+    with _API_USES_LOCK:
+        _DEFERRED_API_USES_LIST = api_uses_list
+    try:
+        yield api_uses_list
+    finally:
+        with _API_USES_LOCK:
+            _DEFERRED_API_USES_LIST = None
+
+
+def build_scopus_df_concurrently(doi_list, timeout=None, workers_nb=None,
+                                 rate_limiter=None, verbose=False,
+                                 progress_callback=None, cancel_event=None,
+                                 result_callback=None, circuit_breaker=None):
+    """Builds the dataframe of the publications information got from the Scopus
+    API for the DOIs of 'doi_list' using concurrent workers.
+
+    The returned tuple follows the contract of the `build_scopus_df_from_api`
+    function of the ScopusApyJson package. The requests are throttled
+    by 'rate_limiter' that may be shared between several calls.
+    The timeout of the requests is adapted to the observed latencies.
+    The requests failed by a transient error are retried up to SCOPUS_RETRIES_NB
+    global times with an exponential back-off honoring the 'Retry-After' header,
+    the circuit breaker being opened when it exceeds SCOPUS_RETRY_AFTER_MAX global
+    seconds. When 'cancel_event' is set, the DOIs not yet requested are skipped
+    and returned as failed with the "Cancelled" reason. When 'circuit_breaker'
+    opens, they are returned as failed with the "Circuit open" reason.
+
+    Args:
+        doi_list (list): The list of DOIs (str) for the Scopus API requests.
+        timeout (int): The maximum waiting time in seconds for request answer \
+        (default: SCOPUS_TIMEOUT global).
+        workers_nb (int): The number of concurrent workers \
+        (default: SCOPUS_WORKERS_NB global).
+        rate_limiter (TokenBucket): The rate limiter of the requests \
+        (default: new limiter at SCOPUS_RATE_LIMIT global requests per second).
+        verbose (bool): If True, the requests status are printed.
+        progress_callback (function): Function called with the stage name \
+        ("scopus"), the number of processed DOIs and the number of DOIs \
+        after each DOI (default: None).
+        cancel_event (threading.Event): Event that stops the requests \
+        when set (default: None).
+        result_callback (function): Function called from the workers \
+        with the DOI, the dataframe of its publication information or None \
+        and its fail reason or None as soon as each DOI is resolved, \
+        the DOIs cancelled or stopped by the circuit breaker being skipped \
+        (default: None).
+        circuit_breaker (CircuitBreaker): The circuit breaker stopping \
+        the requests (default: new breaker for this call).
+    Returns:
+        (tup): (dataframe of the publications information, dataframe \
+        of the failed DOIs with the reasons of their fail, authentication \
+        status on Scopus database (bool)).
+    """
+    if not isinstance(doi_list, list):
+        doi_list = [doi_list]
+    if timeout is None:
+        timeout = hts_pg.SCOPUS_TIMEOUT
+    if workers_nb is None:
+        workers_nb = hts_pg.SCOPUS_WORKERS_NB
+    if rate_limiter is None:
+        rate_limiter = TokenBucket(hts_pg.SCOPUS_RATE_LIMIT)
+    if circuit_breaker is None:
+        circuit_breaker = CircuitBreaker()
+    adaptive_timeout = AdaptiveTimeout(max_timeout=timeout)
+
+    auth_failed_event = threading.Event()
+    thread_data = threading.local()
+    counter_lock = threading.Lock()
+    requests_nb = [0]
+    done_nb = [0]
+    dois_nb = len(doi_list)
+    fail_reasons_dict = {"Empty": "Not found"}
+
+    def _report_progress():
+        with counter_lock:
+            done_nb[0] += 1
+            if progress_callback is not None:
+                progress_callback("scopus", done_nb[0], dois_nb)
+
+    def _request_doi(doi):
+        def _get_data(request_timeout):
+            return _get_doi_json_data(thread_data.session, doi, request_timeout)
+        api_json_data, request_status, attempts_nb = \
+            request_with_retries(_get_data, rate_limiter, adaptive_timeout,
+                                 circuit_breaker, cancel_event=cancel_event)
+        with counter_lock:
+            requests_nb[0] += attempts_nb
+        if verbose and attempts_nb > 1:
+            print(f'Request of DOI {doi} done in {attempts_nb} attempts')
+        return api_json_data, request_status
+
+    def _fetch_doi(doi):
+        if auth_failed_event.is_set():
+            return doi, None, None
+        if cancel_event is not None and cancel_event.is_set():
+            _report_progress()
+            return doi, None, "Cancelled"
+        if circuit_breaker.is_open:
+            _report_progress()
+            return doi, None, "Circuit open"
+        if not hasattr(thread_data, "session"):
+            thread_data.session = requests.Session()
+        api_json_data, request_status = _request_doi(doi)
+        _report_progress()
+        if request_status in ["Cancelled", "Circuit open"]:
+            return doi, None, request_status
+        if request_status == "False":
+            auth_failed_event.set()
+            if verbose:
+                print(('Authentication failed: please check availability'
+                       ' of authentication keys'))
+            return doi, None, None
+        if request_status != "True":
+            if verbose:
+                print(f'Request failed for DOI {doi}: {request_status}')
+            fail_reason = fail_reasons_dict.get(request_status, request_status)
+            if result_callback is not None:
+                result_callback(doi, None, fail_reason)
+            return doi, None, fail_reason
+        if verbose:
+            print(f'Request successful for DOI {doi}')
+        scopus_df = saj.parse_json_data_to_scopus_df(api_json_data)
+        if result_callback is not None:
+            result_callback(doi, scopus_df, None)
+        return doi, scopus_df, None
+
+    if progress_callback is not None:
+        progress_callback("scopus", 0, dois_nb)
+    with ThreadPoolExecutor(max_workers=max(1, workers_nb)) as executor:
+        results_list = list(executor.map(_fetch_doi, doi_list))
+    if requests_nb[0]:
+        update_api_uses_nb(requests_nb[0])
+
+    authy_status = bool(doi_list) and not auth_failed_event.is_set()
+    scopus_df_list = []
+    failed_list = []
+    for doi, scopus_df, fail_status in results_list:
+        if scopus_df is not None:
+            scopus_df_list.append(scopus_df)
+        elif fail_status is not None:
+            failed_list.append([doi, fail_status])
+
+    if scopus_df_list:
+        api_scopus_df = pd.concat(scopus_df_list, axis=0)
+    else:
+        api_scopus_df = pd.DataFrame(columns=saj_g.SELECTED_SCOPUS_COLUMNS_NAMES)
+    failed_doi_df = pd.DataFrame(failed_list, columns=["DOI", "Fail reason"])
+    return api_scopus_df, failed_doi_df, authy_status
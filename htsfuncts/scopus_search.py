@@ -0,0 +1,371 @@
+"""Module of functions for getting publications information from the Scopus
+Search API grouping several DOIs in each query ('DOI(a) OR DOI(b) OR ...').
+
+The search results are split back to the requested DOIs and parsed to the
+columns of the publications information got through the Abstract Retrieval
+API by the `build_scopus_df_concurrently` function.
+"""
+
+__all__ = ['build_scopus_df_by_search',
+          ]
+
+
+# Standard library imports
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 3rd party imports
+import pandas as pd
+import requests
+import ScopusApyJson.saj_globals as saj_g
+from requests.exceptions import RequestException
+from requests.exceptions import Timeout
+
+# Local imports
+import htsfuncts.pub_globals as hts_pg
+from htsfuncts.doi_functs import normalize_dois
+from htsfuncts.scopus_fetch import AdaptiveTimeout
+from htsfuncts.scopus_fetch import CircuitBreaker
+from htsfuncts.scopus_fetch import TokenBucket
+from htsfuncts.scopus_fetch import build_scopus_df_concurrently
+from htsfuncts.scopus_fetch import parse_retry_after
+from htsfuncts.scopus_fetch import request_with_retries
+from htsfuncts.scopus_fetch import update_api_uses_nb
+
+
+# Scopus Search API query link
+_SEARCH_LINK = "https://api.elsevier.com/content/search/scopus"
+
+# Characters of the DOIs breaking the search query syntax,
+# such DOIs being requested through the Abstract Retrieval API
+_QUERY_UNSAFE_CHARS = set('()[]{}" ')
+
+# Open access status as set by the ScopusApyJson package
+_OPEN_ACCESS_DICT = {"1": ("All Open Access; Green Open Access; "
+                           "Gold Open Access (Hybrid?)"),
+                     "2": "All Open Access; Green Open Access",
+                    }
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _set_doi_term(doi):
+    """Sets the search query term of the DOI 'doi' as passed
+    to the Abstract Retrieval API."""
+    if doi.startswith("doi/"):
+        doi = doi[len("doi/"):]
+    return f"DOI({doi})"
+
+
+def _set_search_batches(doi_list, dois_nb, query_max_length):
+    """Groups the DOIs of 'doi_list' in batches of at most 'dois_nb' DOIs
+    which query is at most 'query_max_length' characters long.
+
+    Returns:
+        (tup): (list of the DOIs batches, list of the DOIs \
+        not suitable for a search query).
+    """
+    batches_list = []
+    single_doi_list = []
+    batch_list = []
+    query_length = 0
+    for doi in doi_list:
+        doi_term = _set_doi_term(doi)
+        if _QUERY_UNSAFE_CHARS.intersection(doi_term[len("DOI("): -1]):
+            single_doi_list.append(doi)
+            continue
+        added_length = len(doi_term) + (len(" OR ") if batch_list else 0)
+        if batch_list and (len(batch_list) >= dois_nb
+                           or query_length + added_length > query_max_length):
+            batches_list.append(batch_list)
+            batch_list = []
+            query_length = 0
+            added_length = len(doi_term)
+        batch_list.append(doi)
+        query_length += added_length
+    if batch_list:
+        batches_list.append(batch_list)
+    return batches_list, single_doi_list
+
+
+def _get_search_json_data(session, query, count, timeout):
+    """Gets the hierarchical dict of the Scopus Search API response
+    for the query 'query' as done by the `_get_doi_json_data` function."""
+    search_link = _SEARCH_LINK
+    if hts_pg.SCOPUS_SEARCH_BASE_URL:
+        search_link = hts_pg.SCOPUS_SEARCH_BASE_URL.rstrip('/')
+    params_dict = {"query": query,
+                   "count": count,
+                   "view": "COMPLETE",
+                   "apikey": saj_g.API_CONFIG_DICT["apikey"],
+                   "insttoken": saj_g.API_CONFIG_DICT["insttoken"],
+                   "httpAccept": "application/json"}
+    try:
+        response = session.get(search_link, params=params_dict, timeout=timeout)
+    except Timeout:
+        return None, "Timeout", None
+    except RequestException:
+        return None, "Connection error", None
+    if response.status_code in [401, 403]:
+        return None, "False", None
+    if response.status_code != 200:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        return None, f"HTTP error {response.status_code}", retry_after
+    return response.json(), "True", None
+
+
+def _parse_search_entry(entry_dict):
+    """Parses an entry of the Scopus Search API response to the columns
+    of the SELECTED_SCOPUS_COLUMNS_NAMES global of the ScopusApyJson package,
+    the columns not available in the search results being set to None."""
+    row_dict = dict.fromkeys(saj_g.SELECTED_SCOPUS_COLUMNS_NAMES)
+    row_dict["Source"] = "Scopus"
+
+    # Parsing authors and affiliations
+    addresses_dict = {}
+    for affiliation_dict in _as_list(entry_dict.get("affiliation")):
+        address_items_list = [affiliation_dict.get(key) for key
+                              in ["affilname", "affiliation-city", "affiliation-country"]]
+        addresses_dict[affiliation_dict.get("afid")] = \
+            ", ".join(item for item in address_items_list if item)
+    authors_list = _as_list(entry_dict.get("author"))
+    if authors_list:
+        row_dict["Authors"] = "; ".join(author.get("authname") or ""
+                                        for author in authors_list)
+        row_dict["Author(s) ID"] = "; ".join(author.get("authid") or ""
+                                             for author in authors_list)
+        row_dict["Author full names"] = "; ".join(f"{author.get('surname')}, "
+                                                  f"{author.get('given-name')} "
+                                                  f"({author.get('authid')})"
+                                                  for author in authors_list)
+        authors_with_affiliations_list = []
+        for author in authors_list:
+            author_addresses_list = [addresses_dict.get(afid_dict.get("$"), "")
+                                     for afid_dict in _as_list(author.get("afid"))]
+            authors_with_affiliations_list.append(f"{author.get('authname')},"
+                                                  f"{', '.join(author_addresses_list)}")
+        row_dict["Authors with affiliations"] = "; ".join(authors_with_affiliations_list)
+    elif entry_dict.get("dc:creator"):
+        row_dict["Authors"] = entry_dict["dc:creator"]
+    if addresses_dict:
+        row_dict["Affiliations"] = "; ".join(addresses_dict.values())
+
+    # Parsing source information
+    row_dict["Title"] = entry_dict.get("dc:title")
+    cover_date = entry_dict.get("prism:coverDate")
+    if cover_date:
+        row_dict["Year"] = cover_date[:4]
+    row_dict["Source title"] = entry_dict.get("prism:publicationName")
+    row_dict["Volume"] = entry_dict.get("prism:volume")
+    row_dict["Issue"] = entry_dict.get("prism:issueIdentifier")
+    row_dict["Art. No."] = entry_dict.get("article-number")
+    page_range = entry_dict.get("prism:pageRange")
+    if page_range and "-" in page_range:
+        row_dict["Page start"], row_dict["Page end"] = page_range.split("-", 1)
+        try:
+            row_dict["Page count"] = str(int(row_dict["Page end"])
+                                         - int(row_dict["Page start"]))
+        except ValueError:
+            pass
+    row_dict["ISSN"] = entry_dict.get("prism:issn")
+    isbn_list = _as_list(entry_dict.get("prism:isbn"))
+    if isbn_list:
+        isbn = isbn_list[0]
+        row_dict["ISBN"] = isbn.get("$") if isinstance(isbn, dict) else isbn
+
+    # Parsing core data
+    row_dict["DOI"] = entry_dict.get("prism:doi")
+    row_dict["EID"] = entry_dict.get("eid")
+    row_dict["Document Type"] = entry_dict.get("subtypeDescription")
+    row_dict["PubMed ID"] = entry_dict.get("pubmed-id")
+    row_dict["Cited by"] = entry_dict.get("citedby-count")
+    row_dict["Open Access"] = _OPEN_ACCESS_DICT.get(entry_dict.get("openaccess"), "")
+    author_keywords = entry_dict.get("authkeywords")
+    if author_keywords:
+        row_dict["Author Keywords"] = "; ".join(keyword.strip() for keyword
+                                                in author_keywords.split("|"))
+    for link_dict in _as_list(entry_dict.get("link")):
+        if link_dict.get("@ref") == "scopus":
+            row_dict["Link"] = link_dict.get("@href")
+    return row_dict
+
+
+def _split_search_results(json_data, batch_doi_list):
+    """Splits the entries of the Scopus Search API response 'json_data'
+    to the DOIs of 'batch_doi_list'.
+
+    Returns:
+        (tup): (dict of the parsed entries keyed by DOI of 'batch_doi_list', \
+        True if the response holds all the results of the query).
+    """
+    search_results_dict = json_data.get("search-results", {})
+    entries_list = [entry_dict for entry_dict in _as_list(search_results_dict.get("entry"))
+                    if entry_dict.get("prism:doi")]
+    try:
+        total_results_nb = int(search_results_dict.get("opensearch:totalResults", 0))
+    except (TypeError, ValueError):
+        total_results_nb = 0
+    complete_status = total_results_nb <= len(entries_list)
+
+    batch_keys_series = normalize_dois(batch_doi_list)
+    entry_keys_series = normalize_dois([entry_dict["prism:doi"]
+                                        for entry_dict in entries_list])
+    entries_dict = {}
+    for key, entry_dict in zip(entry_keys_series, entries_list):
+        if not pd.isna(key) and key not in entries_dict:
+            entries_dict[key] = entry_dict
+    rows_dict = {doi: _parse_search_entry(entries_dict[key])
+                 for doi, key in zip(batch_doi_list, batch_keys_series)
+                 if key in entries_dict}
+    return rows_dict, complete_status
+
+
+def build_scopus_df_by_search(doi_list, timeout=None, workers_nb=None,
+                              rate_limiter=None, verbose=False,
+                              progress_callback=None, cancel_event=None,
+                              result_callback=None, circuit_breaker=None):
+    """Builds the dataframe of the publications information got from
+    the Scopus Search API for the DOIs of 'doi_list' grouped in queries
+    of up to SCOPUS_SEARCH_DOIS_NB global DOIs.
+
+    The arguments and the returned tuple are the ones of the
+    `build_scopus_df_concurrently` function. The DOIs not suitable for
+    a search query, the DOIs of the queries rejected by the Scopus Search API
+    and the DOIs missing in truncated search results are requested through
+    the Abstract Retrieval API by the `build_scopus_df_concurrently` function.
+    """
+    if not isinstance(doi_list, list):
+        doi_list = [doi_list]
+    if timeout is None:
+        timeout = hts_pg.SCOPUS_TIMEOUT
+    if workers_nb is None:
+        workers_nb = hts_pg.SCOPUS_WORKERS_NB
+    if rate_limiter is None:
+        rate_limiter = TokenBucket(hts_pg.SCOPUS_RATE_LIMIT)
+    if circuit_breaker is None:
+        circuit_breaker = CircuitBreaker()
+    adaptive_timeout = AdaptiveTimeout(max_timeout=timeout)
+    batches_list, single_doi_list = _set_search_batches(doi_list,
+                                                        hts_pg.SCOPUS_SEARCH_DOIS_NB,
+                                                        hts_pg.SCOPUS_SEARCH_QUERY_MAX_LENGTH)
+
+    auth_failed_event = threading.Event()
+    thread_data = threading.local()
+    counter_lock = threading.Lock()
+    requests_nb = [0]
+    done_nb = [0]
+    dois_nb = len(doi_list)
+
+    def _report_progress(batch_dois_nb):
+        with counter_lock:
+            done_nb[0] += batch_dois_nb
+            if progress_callback is not None:
+                progress_callback("scopus", done_nb[0], dois_nb)
+
+    def _fetch_batch(batch_doi_list):
+        if auth_failed_event.is_set():
+            return [], [], []
+        for stop_status, stop_reason in [(cancel_event is not None and cancel_event.is_set(),
+                                          "Cancelled"),
+                                         (circuit_breaker.is_open, "Circuit open")]:
+            if stop_status:
+                _report_progress(len(batch_doi_list))
+                return [], [[doi, stop_reason] for doi in batch_doi_list], []
+        if not hasattr(thread_data, "session"):
+            thread_data.session = requests.Session()
+        query = " OR ".join(_set_doi_term(doi) for doi in batch_doi_list)
+
+        def _get_data(request_timeout):
+            return _get_search_json_data(thread_data.session, query,
+                                         len(batch_doi_list), request_timeout)
+        json_data, request_status, attempts_nb = \
+            request_with_retries(_get_data, rate_limiter, adaptive_timeout,
+                                 circuit_breaker, cancel_event=cancel_event)
+        with counter_lock:
+            requests_nb[0] += attempts_nb
+        if request_status == "False":
+            auth_failed_event.set()
+            if verbose:
+                print(('Authentication failed: please check availability'
+                       ' of authentication keys'))
+            return [], [], []
+        if request_status != "True":
+            if verbose:
+                print(f'Search request failed for {len(batch_doi_list)} DOIs: '
+                      f'{request_status}')
+            if request_status.startswith("HTTP error 4") and request_status != "HTTP error 429":
+                return [], [], batch_doi_list
+            _report_progress(len(batch_doi_list))
+            failed_list = [[doi, request_status] for doi in batch_doi_list]
+            if result_callback is not None and request_status not in ["Cancelled",
+                                                                      "Circuit open"]:
+                for doi in batch_doi_list:
+                    result_callback(doi, None, request_status)
+            return [], failed_list, []
+
+        rows_dict, complete_status = _split_search_results(json_data, batch_doi_list)
+        rows_list = []
+        failed_list = []
+        fallback_doi_list = []
+        for doi in batch_doi_list:
+            if doi in rows_dict:
+                rows_list.append(rows_dict[doi])
+                if result_callback is not None:
+                    result_callback(doi, pd.DataFrame([rows_dict[doi]]), None)
+            elif complete_status:
+                failed_list.append([doi, "Not found"])
+                if result_callback is not None:
+                    result_callback(doi, None, "Not found")
+            else:
+                fallback_doi_list.append(doi)
+        if verbose:
+            print(f'Search request successful for {len(rows_list)} '
+                  f'among {len(batch_doi_list)} DOIs')
+        _report_progress(len(batch_doi_list) - len(fallback_doi_list))
+        return rows_list, failed_list, fallback_doi_list
+
+    if progress_callback is not None:
+        progress_callback("scopus", 0, dois_nb)
+    with ThreadPoolExecutor(max_workers=max(1, workers_nb)) as executor:
+        results_list = list(executor.map(_fetch_batch, batches_list))
+    if requests_nb[0]:
+        update_api_uses_nb(requests_nb[0])
+
+    rows_list = []
+    failed_list = []
+    for batch_rows_list, batch_failed_list, fallback_doi_list in results_list:
+        rows_list += batch_rows_list
+        failed_list += batch_failed_list
+        single_doi_list += fallback_doi_list
+    api_scopus_df = pd.DataFrame(rows_list, columns=saj_g.SELECTED_SCOPUS_COLUMNS_NAMES)
+    failed_doi_df = pd.DataFrame(failed_list, columns=["DOI", "Fail reason"])
+    authy_status = bool(doi_list) and not auth_failed_event.is_set()
+
+    # Requesting the remaining DOIs through the Abstract Retrieval API
+    if single_doi_list and authy_status:
+        searched_nb = done_nb[0]
+
+        def _report_single_progress(stage, single_done_nb, _):
+            progress_callback(stage, searched_nb + single_done_nb, dois_nb)
+        single_scopus_df, single_failed_df, authy_status = \
+            build_scopus_df_concurrently(single_doi_list, timeout=timeout,
+                                         workers_nb=workers_nb,
+                                         rate_limiter=rate_limiter,
+                                         verbose=verbose,
+                                         progress_callback=(_report_single_progress
+                                                            if progress_callback
+                                                            else None),
+                                         cancel_event=cancel_event,
+                                         result_callback=result_callback,
+                                         circuit_breaker=circuit_breaker)
+        scopus_dfs_list = [df for df in [api_scopus_df, single_scopus_df] if not df.empty]
+        if scopus_dfs_list:
+            api_scopus_df = pd.concat(scopus_dfs_list, axis=0)
+        failed_doi_df = pd.concat([failed_doi_df, single_failed_df], ignore_index=True)
+    return api_scopus_df, failed_doi_df, authy_status
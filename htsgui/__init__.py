@@ -2,7 +2,102 @@ __version__ = '1.1.0'
 __author__  = 'BiblioMeter team'
 __license__ = 'MIT'
 
-from htsgui.gui_globals import *
-from htsgui.useful_functs import *
-from htsgui.main_page import *
-from htsgui.update_scopus_page import *
+# Standard library imports
+from importlib import import_module
+
+# Public objects of the modules imported at first use of one of them
+# through the `__getattr__` function so that the displays are not probed
+# and tkinter is not loaded when importing a single module of the package
+# (to keep in line with the `__all__` of the modules)
+_LAZY_OBJECTS_DICT = {
+    'htsgui.gui_globals': ['ADD_SPACE_MM',
+                           'BM_GUI_DISP',
+                           'CONTAINER_BUTTON_HEIGHT_PX',
+                           'CORPUSES_NUMBER',
+                           'FONT_NAME',
+                           'IN_TO_MM',
+                           'PAGES_LABELS',
+                           'PPI',
+                           'PROGRESS_POLL_MS',
+                           'PROGRESS_STAGES_DICT',
+                           'REF_SEF_FONT_SIZE',
+                           'REF_SEF_POS_X_MM',
+                           'REF_SEF_POS_Y_MM',
+                           'REF_BUTTON_DX_MM',
+                           'REF_BUTTON_DY_MM',
+                           'REF_BUTTON_FONT_SIZE',
+                           'REF_COPYRIGHT_FONT_SIZE',
+                           'REF_COPYRIGHT_X_MM',
+                           'REF_COPYRIGHT_Y_MM',
+                           'REF_ENTRY_NB_CHAR',
+                           'REF_EXIT_BUT_POS_X_MM',
+                           'REF_EXIT_BUT_POS_Y_MM',
+                           'REF_INST_POS_X_MM',
+                           'REF_INST_POS_Y_MM',
+                           'REF_LABEL_FONT_SIZE',
+                           'REF_LABEL_POS_Y_MM',
+                           'REF_LAUNCH_FONT_SIZE',
+                           'REF_PAGE_TITLE_FONT_SIZE',
+                           'REF_PAGE_TITLE_POS_Y_MM',
+                           'REF_SCREEN_WIDTH_PX',
+                           'REF_SCREEN_HEIGHT_PX',
+                           'REF_SCREEN_WIDTH_MM',
+                           'REF_SCREEN_HEIGHT_MM',
+                           'REF_SUB_TITLE_FONT_SIZE',
+                           'REF_WINDOW_WIDTH_MM',
+                           'REF_WINDOW_HEIGHT_MM',
+                           'REF_VERSION_FONT_SIZE',
+                           'REF_VERSION_X_MM',
+                           'REF_YEAR_BUT_POS_X_MM',
+                           'REF_YEAR_BUT_POS_Y_MM',
+                           'TEXT_SEF',
+                           'TEXT_SEF_CHANGE',
+                           'TEXT_BOUTON_LANCEMENT',
+                           'TEXT_CANCEL',
+                           'TEXT_CLOSING',
+                           'TEXT_COPYRIGHT',
+                           'TEXT_INSTITUTE',
+                           'TEXT_PAUSE',
+                           'TEXT_TITLE',
+                           'TEXT_ETA',
+                           'TEXT_VERSION',
+                           'TEXT_YEAR',
+                           'TEXT_ETAPE_1',
+                           'HELP_ETAPE_1',
+                           'TEXT_MAJ_SCOPUS',
+                          ],
+    'htsgui.useful_functs': ['font_size',
+                             'general_properties',
+                             'last_available_years',
+                             'mm_to_px',
+                             'place_after',
+                             'place_bellow',
+                             'label_entry_place_bellow',
+                             'str_size_mm',
+                             'set_frame_rl',
+                             'set_frame_ud',
+                            ],
+    'htsgui.main_page': ['AppMain',
+                        ],
+    'htsgui.update_scopus_page': ['create_consolidate_scopus',
+                                 ],
+    }
+
+# Modules of the public objects imported at first use keyed by object name
+_LAZY_MODULES_DICT = {name: module_name
+                      for module_name, names_list in _LAZY_OBJECTS_DICT.items()
+                      for name in names_list}
+
+# Public objects exported by `from htsgui import *`, the objects
+# being then imported through `__getattr__`
+__all__ = list(_LAZY_MODULES_DICT)
+
+
+def __getattr__(name):
+    """Imports the module defining the public object 'name' at its first use."""
+    module_name = _LAZY_MODULES_DICT.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -8,6 +8,8 @@ __all__ = ['ADD_SPACE_MM',
            'IN_TO_MM',
            'PAGES_LABELS',
            'PPI',
+           'PROGRESS_POLL_MS',
+           'PROGRESS_STAGES_DICT',
            'REF_SEF_FONT_SIZE',
            'REF_SEF_POS_X_MM',
            'REF_SEF_POS_Y_MM',
@@ -41,10 +43,13 @@ __all__ = ['ADD_SPACE_MM',
            'TEXT_SEF',
            'TEXT_SEF_CHANGE',
            'TEXT_BOUTON_LANCEMENT',
+           'TEXT_CANCEL',
+           'TEXT_CLOSING',
            'TEXT_COPYRIGHT',
            'TEXT_INSTITUTE',
            'TEXT_PAUSE',
            'TEXT_TITLE',
+           'TEXT_ETA',
            'TEXT_VERSION',
            'TEXT_YEAR',
            'TEXT_ETAPE_1',
@@ -56,9 +61,6 @@ __all__ = ['ADD_SPACE_MM',
 # Standard library imports
 import math
 
-# 3rd party imports
-from screeninfo import get_monitors
-
 # ========================= General globals =========================
 
 # Setting BiblioMeter version value (internal)
@@ -89,6 +91,9 @@ def _get_displays(in_to_mm):
     """
     # To Do: convert prints and inputs to gui displays and inputs
 
+    # 3rd party imports
+    from screeninfo import get_monitors
+
     displays = [{'x':m.x,'y':m.y,'width':m.width,
                  'height':m.height,'width_mm':m.width_mm,
                  'height_mm':m.height_mm,'name':m.name,
@@ -116,13 +121,20 @@ def _get_displays(in_to_mm):
 # Conversion factor for inch to millimeter
 IN_TO_MM = 25.4
 
-DISPLAYS = _get_displays(IN_TO_MM)
-
 # Setting primary display
 BM_GUI_DISP = 0
 
-# Getting display resolution in pixels per inch
-PPI = DISPLAYS[BM_GUI_DISP]['ppi']
+
+def __getattr__(name):
+    """Probes the displays at the first access to the DISPLAYS
+    or PPI globals and sets them as module globals."""
+    if name in ("DISPLAYS", "PPI"):
+        displays = _get_displays(IN_TO_MM)
+        globals()["DISPLAYS"] = displays
+        # Getting display resolution in pixels per inch
+        globals()["PPI"] = displays[BM_GUI_DISP]['ppi']
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Setting display reference sizes in pixels and mm (internal)
 REF_SCREEN_WIDTH_PX = 1920
@@ -243,3 +255,15 @@ HELP_ETAPE_1  = "Un fichier au format standard de l'extraction de Scopus "
 HELP_ETAPE_1 += "\nva être construit à partir du fichier initial de l'extraction "
 HELP_ETAPE_1 += "\net de l'extraction par DOI pour les DOIs complémentaires issus de HAL."
 TEXT_MAJ_SCOPUS = "Lancer la consolidation de l'extraction de Scopus"
+TEXT_CANCEL = "Annuler la consolidation"
+TEXT_CLOSING = "Fermeture après l'arrêt de la consolidation en cours..."
+TEXT_ETA = "temps restant estimé"
+
+# Labels of the consolidation stages displayed with the progress bar
+PROGRESS_STAGES_DICT = {'hal'   : "Extraction de HAL",
+                        'scopus': "Interrogation de Scopus",
+                        'save'  : "Sauvegarde des fichiers",
+                       }
+
+# Polling period in ms of the consolidation progress events
+PROGRESS_POLL_MS = 100
@@ -11,9 +11,6 @@ from tkinter import font as tkFont
 from functools import partial
 from pathlib import Path
 
-# 3rd party imports
-from screeninfo import get_monitors
-
 # Local imports
 import htsgui.gui_globals as gg
 import htsfuncts.institute_globals as ig
@@ -32,6 +29,9 @@ class AppMain(tk.Tk):
     """
     # ======================== Class init - start =======================
     def __init__(self):
+        # Probing the displays before the creation of the tk window
+        _ = gg.DISPLAYS
+
         # Setting the link with "tk.Tk"
         tk.Tk.__init__(self)
 
@@ -119,6 +119,7 @@ class AppMain(tk.Tk):
         # ============================== Main ===============================
 
         # Identifying tk window of init class
+        from screeninfo import get_monitors  # pylint: disable=import-outside-toplevel
         _ = get_monitors() # OBLIGATOIRE
         #self.lift()
         self.attributes("-topmost", True)
@@ -6,17 +6,21 @@ __all__ = ['create_consolidate_scopus']
 
 # Standard library imports
 import os
+import queue
+import threading
+import time
+from functools import partial
 from pathlib import Path
 
 # 3rd party imports
 import tkinter as tk
 from tkinter import font as tkFont
 from tkinter import messagebox
+from tkinter import ttk
 
 # Local imports
 import htsgui.gui_globals as gg
 import htsfuncts.pub_globals as hts_pg
-from htsfuncts.main_functs import consolidate_scopus
 from htsgui.useful_functs import set_frame_rl
 from htsgui.useful_functs import font_size
 from htsgui.useful_functs import last_available_years
@@ -25,10 +29,90 @@ from htsgui.useful_functs import place_after
 from htsgui.useful_functs import place_bellow
 
 
-def _launch_update_scopus(institute,
+def _run_consolidation(institute, haltoscopus_path, corpus_year,
+                       events_queue, cancel_event):
+    """Runs the consolidation of scopus in the worker thread and posts
+    the progress events and the results with the files names tuple
+    in 'events_queue'."""
+    def _post_progress(stage, done_nb, total_nb):
+        events_queue.put(("progress", stage, done_nb, total_nb))
+
+    try:
+        # Import différé du module de consolidation (chargement de pandas)
+        # pylint: disable=import-outside-toplevel
+        from htsfuncts.main_functs import consolidate_scopus
+        from htsfuncts.main_functs import set_files_tup
+
+        files_tup = set_files_tup(corpus_year)
+        results_tup = consolidate_scopus(institute, haltoscopus_path,
+                                         corpus_year, files_tup,
+                                         progress_callback=_post_progress,
+                                         cancel_event=cancel_event)
+        events_queue.put(("done", files_tup) + tuple(results_tup))
+    except Exception as err:  # pylint: disable=broad-except
+        events_queue.put(("error", str(err)))
+
+
+def _set_progress_text(stage, done_nb, total_nb, elapsed_time):
+    """Sets the text of the progress label with the estimated remaining time."""
+    progress_text = gg.PROGRESS_STAGES_DICT[stage]
+    if stage == "scopus":
+        progress_text += f" : {done_nb}/{total_nb} DOIs"
+        if done_nb:
+            eta_s = int(elapsed_time * (total_nb - done_nb) / done_nb)
+            progress_text += f" - {gg.TEXT_ETA} : {eta_s // 60} min {eta_s % 60:02d} s"
+    return progress_text
+
+
+def _show_update_scopus_results(haltoscopus_path, corpus_year, files_tup,
+                                authy_status, update_status, cancel_status):
+    # Affichage des résultats de la consolidation de scopus
+    cancel_text = ""
+    if cancel_status:
+        cancel_text = ("La consolidation a été annulée : les DOIs non interrogés "
+                       "sont indiqués comme 'Cancelled' dans le fichier des DOIs "
+                       "inconnus de Scopus.\n\n")
+    out_ext = hts_pg.OUTPUT_FORMAT
+    if authy_status:
+        info_title = "- Information -"
+        if update_status:
+            info_text = (cancel_text
+                         + f"L'extraction de Scopus a été complétée pour l'année {corpus_year} "
+                         f"et sauvegardée dans le fichier '{files_tup[1]}.csv'."
+                         f"\n\nLes DOIs présents dans HAL ajoutés à Scopus "
+                         f"ont été stockés dans le fichier '{files_tup[4]}.{out_ext}'."
+                         f"\n\nDe plus les DOIs présents dans HAL mais inconnus de Scopus "
+                         f"ont été stockés dans le fichier '{files_tup[3]}.{out_ext}'."
+                         "\n\nL'extraction de HAL a été sauvegardée dans le fichier "
+                         f"'{files_tup[2]}.{out_ext}'."
+                         "\n\nLes fichiers sont dans le dossier "
+                         f"{haltoscopus_path / Path(corpus_year)}.")
+            messagebox.showinfo(info_title, info_text)
+        else:
+            info_text = (cancel_text
+                         + "L'extraction de Scopus n'a pas été modifiée "
+                         f"pour l'année {corpus_year} "
+                         f"mais elle est sauvegardée dans le fichier '{files_tup[1]}.csv'."
+                         f"\n\nAucun des DOIs présents dans HAL n'a été ajouté à Scopus "
+                         f"et le fichier '{files_tup[4]}.{out_ext}' est vide."
+                         f"\n\nLes DOIs présents dans HAL mais inconnus de Scopus "
+                         f"ont été stockés dans le fichier '{files_tup[3]}.{out_ext}'."
+                         "\n\nL'extraction de HAL a été sauvegardée "
+                         f"dans le fichier '{files_tup[2]}.{out_ext}'."
+                         "\n\nLes fichiers sont dans le dossier "
+                         f"{haltoscopus_path / Path(corpus_year)}.")
+            messagebox.showinfo(info_title, info_text)
+    else:
+        info_title = "- ATTENTION -"
+        info_text  = "!! L'autentification par Scopus a échoué !!"
+        messagebox.showwarning(info_title, info_text)
+
+
+def _launch_update_scopus(self,
+                          institute,
                           haltoscopus_path,
                           corpus_year,
-                          files_tup,
+                          run_dict,
                           ):
     # Lancement de la fonction de consolidation de scopus
     ask_title = "- Confirmation de la consolidation de Scopus -"
@@ -36,44 +120,75 @@ def _launch_update_scopus(institute,
                 f"avec les données disponibles sur HAL "
                 f"pour l'année {corpus_year}."
                 f"\n\nCette opération peut prendre une ou deux minutes."
-                f"\nDans l'attente, ne pas fermer 'HalToScopus'."
+                f"\nElle peut être annulée en conservant les résultats partiels."
                 f" \n\nEffectuer la consolidation ?")
     answer = messagebox.askokcancel(ask_title, ask_text)
     if answer:
-        # Mise à jour de consolidation de scopus
-        _, authy_status, update_status = consolidate_scopus(institute, haltoscopus_path,
-                                                            corpus_year, files_tup)
-        if authy_status:
-            info_title = "- Information -"
-            if update_status:
-                info_text = (f"L'extraction de Scopus a été complétée pour l'année {corpus_year} "
-                             f"et sauvegardée dans le fichier '{files_tup[1]}.csv'."
-                             f"\n\nLes DOIs présents dans HAL ajoutés à Scopus "
-                             f"ont été stockés dans le fichier '{files_tup[4]}.xlsx'."
-                             f"\n\nDe plus les DOIs présents dans HAL mais inconnus de Scopus "
-                             f"ont été stockés dans le fichier '{files_tup[3]}.xlsx'."
-                             "\n\nL'extraction de HAL a été sauvegardée dans le fichier "
-                             f"'{files_tup[2]}.xlsx'."
-                             "\n\nLes fichiers sont dans le dossier "
-                             f"{haltoscopus_path / Path(corpus_year)}.")
-                messagebox.showinfo(info_title, info_text)
-            else:
-                info_text = ("L'extraction de Scopus n'a pas été modifiée "
-                             f"pour l'année {corpus_year} "
-                             f"mais elle est sauvegardée dans le fichier '{files_tup[1]}.csv'."
-                             f"\n\nAucun des DOIs présents dans HAL n'a été ajouté à Scopus "
-                             f"et le fichier '{files_tup[4]}.xlsx' est vide."
-                             f"\n\nLes DOIs présents dans HAL mais inconnus de Scopus "
-                             f"ont été stockés dans le fichier '{files_tup[3]}.xlsx'."
-                             "\n\nL'extraction de HAL a été sauvegardée "
-                             f"dans le fichier '{files_tup[2]}.xlsx'."
-                             "\n\nLes fichiers sont dans le dossier "
-                             f"{haltoscopus_path / Path(corpus_year)}.")
-                messagebox.showinfo(info_title, info_text)
-        else:
-            info_title = "- ATTENTION -"
-            info_text  = "!! L'autentification par Scopus a échoué !!"
-            messagebox.showwarning(info_title, info_text)
+        # Lancement de la consolidation de scopus dans un thread de travail
+        events_queue = queue.Queue()
+        cancel_event = threading.Event()
+        worker = threading.Thread(target=_run_consolidation,
+                                  args=(institute, haltoscopus_path, corpus_year,
+                                        events_queue, cancel_event))
+        run_dict["worker"] = worker
+        run_dict["cancel_event"] = cancel_event
+        run_dict["launch_button"].config(state="disabled")
+        run_dict["cancel_button"].config(state="normal")
+        worker.start()
+        stage_start_time = [time.monotonic()]
+
+        def _end_run():
+            run_dict["progress_bar"].stop()
+            run_dict["progress_bar"].config(mode="determinate", value=0)
+            run_dict["progress_label"].config(text="")
+            run_dict["launch_button"].config(state="normal")
+            run_dict["cancel_button"].config(state="disabled")
+            run_dict["cancel_event"] = None
+
+        def _poll_events():
+            # Suivi de la progression de la consolidation de scopus
+            while True:
+                try:
+                    event = events_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event[0] == "progress":
+                    _, stage, done_nb, total_nb = event
+                    progress_bar = run_dict["progress_bar"]
+                    if stage == "scopus":
+                        if not done_nb:
+                            stage_start_time[0] = time.monotonic()
+                        progress_bar.stop()
+                        progress_bar.config(mode="determinate",
+                                            maximum=max(total_nb, 1),
+                                            value=done_nb)
+                    else:
+                        progress_bar.config(mode="indeterminate")
+                        progress_bar.start()
+                    elapsed_time = time.monotonic() - stage_start_time[0]
+                    run_dict["progress_label"].config(text=_set_progress_text(stage, done_nb,
+                                                                              total_nb,
+                                                                              elapsed_time))
+                elif event[0] == "done":
+                    _end_run()
+                    if run_dict["closing"]:
+                        return
+                    _, files_tup, _, authy_status, update_status = event
+                    _show_update_scopus_results(haltoscopus_path, corpus_year, files_tup,
+                                                authy_status, update_status,
+                                                cancel_event.is_set())
+                    return
+                else:
+                    _end_run()
+                    if run_dict["closing"]:
+                        return
+                    info_title = "- ATTENTION -"
+                    info_text  = f"!! La consolidation de Scopus a échoué !!\n\n{event[1]}"
+                    messagebox.showwarning(info_title, info_text)
+                    return
+            self.after(gg.PROGRESS_POLL_MS, _poll_events)
+
+        self.after(gg.PROGRESS_POLL_MS, _poll_events)
     else:
         # Arrêt de la procédure
         info_title = "- Information -"
@@ -99,12 +214,6 @@ def create_consolidate_scopus(self, institute, haltoscopus_path, parent):
 
         # Setting useful aliases
         init_scopus_file_alias = year_select + hts_pg.FILES_BASE["scopus_base"]
-        new_scopus_file_alias = year_select + hts_pg.FILES_BASE["new_scopus_base"]
-        hal_file_alias = year_select + hts_pg.FILES_BASE["hal_base"]
-        failed_file_alias = year_select + hts_pg.FILES_BASE["failed_doi_base"]
-        added_file_alias = year_select + hts_pg.FILES_BASE["added_doi_base"]
-        files_tup = (init_scopus_file_alias, new_scopus_file_alias,
-                     hal_file_alias, failed_file_alias, added_file_alias)
 
         # Setting working folder path
         year_haltoscopus_path = haltoscopus_path / Path(year_select)
@@ -113,13 +222,14 @@ def create_consolidate_scopus(self, institute, haltoscopus_path, parent):
         init_scopus_file_path = year_haltoscopus_path / Path(init_scopus_file_alias + ".csv")
         scopus_file_status = os.path.exists(init_scopus_file_path)
         if scopus_file_status:
-            _launch_update_scopus(institute,
+            _launch_update_scopus(self,
+                                  institute,
                                   haltoscopus_path,
                                   year_select,
-                                  files_tup,)
+                                  run_dict,)
         else:
             warning_title = "!!! ATTENTION : fichier non disponible !!!"
-            warning_text  = (f"Le fichier {files_tup[0]}.csv' d'extraction de Scopus "
+            warning_text  = (f"Le fichier {init_scopus_file_alias}.csv' d'extraction de Scopus "
                              f"\nn'est pas disponible à l'emplacement attendu."
                              f"\n1- Mettez le fichier dans le dossier : "
                              f"\n {year_haltoscopus_path} ;"
@@ -127,13 +237,41 @@ def create_consolidate_scopus(self, institute, haltoscopus_path, parent):
             messagebox.showwarning(warning_title, warning_text)
 
 
+    def _launch_cancel():
+        # Annulation de la consolidation en cours
+        if run_dict["cancel_event"] is not None:
+            run_dict["cancel_event"].set()
+            run_dict["cancel_button"].config(state="disabled")
+
+
+    def _close_when_stopped():
+        # Fermeture de l'application à la fin du thread de travail
+        worker = run_dict["worker"]
+        if worker is not None and worker.is_alive():
+            parent.after(gg.PROGRESS_POLL_MS, _close_when_stopped)
+            return
+        parent.destroy()
+
+
+    def _close_app():
+        # La consolidation en cours est annulée en conservant les résultats partiels
+        # et la fenêtre est fermée après l'arrêt du thread de travail
+        if run_dict["closing"]:
+            return
+        run_dict["closing"] = True
+        _launch_cancel()
+        if run_dict["worker"] is not None and run_dict["worker"].is_alive():
+            run_dict["progress_label"].config(text=gg.TEXT_CLOSING)
+        _close_when_stopped()
+
+
     def _launch_exit():
         message =  ("Vous allez fermer HalToScopus. "
                     "\nRien ne sera perdu et vous pourrez reprendre le traitement plus tard."
                     "\n\nSouhaitez-vous faire une pause dans le traitement ?")
         answer_1 = messagebox.askokcancel('Information', message)
         if answer_1:
-            parent.destroy()
+            _close_app()
 
     # Setting effective font sizes and positions (numbers are reference values in mm)
     eff_buttons_font_size = font_size(gg.REF_ETAPE_FONT_SIZE-3, parent.width_sf_min)
@@ -151,6 +289,9 @@ def create_consolidate_scopus(self, institute, haltoscopus_path, parent):
     scopus_update_y_pos_px = mm_to_px(50 * parent.height_sf_mm, gg.PPI)
     launch_dx_px = mm_to_px(0 * parent.width_sf_mm, gg.PPI)
     launch_dy_px = mm_to_px(5 * parent.height_sf_mm, gg.PPI)
+    progress_length_px = mm_to_px(120 * parent.width_sf_mm, gg.PPI)
+    progress_dy_px = mm_to_px(8 * parent.height_sf_mm, gg.PPI)
+    cancel_dx_px = mm_to_px(5 * parent.width_sf_mm, gg.PPI)
     exit_button_x_pos_px = mm_to_px(gg.REF_EXIT_BUT_POS_X_MM * parent.width_sf_mm, gg.PPI)
     exit_button_y_pos_px = mm_to_px(gg.REF_EXIT_BUT_POS_Y_MM * parent.height_sf_mm, gg.PPI)
 
@@ -162,7 +303,19 @@ def create_consolidate_scopus(self, institute, haltoscopus_path, parent):
     fond.place(x = 0, y = 0)
 
     ### Choix de l'année
-    years_list = last_available_years(haltoscopus_path, gg.CORPUSES_NUMBER)
+    def _update_years(new_years_list):
+        # Mise à jour des années après le rafraîchissement de l'index du dossier
+        if not new_years_list or not self.winfo_exists():
+            return
+        years_menu = self.OptionButton_years["menu"]
+        years_menu.delete(0, "end")
+        for year in new_years_list:
+            years_menu.add_command(label=year, command=partial(variable_years.set, year))
+        if variable_years.get() not in new_years_list:
+            variable_years.set(new_years_list[-1])
+
+    years_list = last_available_years(haltoscopus_path, gg.CORPUSES_NUMBER,
+                                      root=self, update_function=_update_years)
     default_year = years_list[-1]
     variable_years = tk.StringVar(self)
     variable_years.set(default_year)
@@ -223,6 +376,42 @@ def create_consolidate_scopus(self, institute, haltoscopus_path, parent):
                  dx=launch_dx_px,
                  dy=launch_dy_px)
 
+    # == Barre de progression et bouton d'annulation
+    progress_bar = ttk.Progressbar(self,
+                                   orient="horizontal",
+                                   mode="determinate",
+                                   length=progress_length_px)
+    place_bellow(scopus_update_launch_button,
+                 progress_bar,
+                 dy=progress_dy_px)
+    cancel_button = tk.Button(self,
+                              text=gg.TEXT_CANCEL,
+                              font=scopus_update_launch_font,
+                              state="disabled",
+                              command=lambda: _launch_cancel())  # pylint: disable=unnecessary-lambda
+    place_after(progress_bar,
+                cancel_button,
+                dx=cancel_dx_px)
+    progress_label = tk.Label(self,
+                              text="",
+                              justify="left",
+                              font=help_label_font)
+    place_bellow(progress_bar,
+                 progress_label)
+
+    # Widgets et état de la consolidation en cours
+    run_dict = {"launch_button": scopus_update_launch_button,
+                "cancel_button": cancel_button,
+                "progress_bar": progress_bar,
+                "progress_label": progress_label,
+                "cancel_event": None,
+                "worker": None,
+                "closing": False,
+               }
+
+    # Fermeture de la fenêtre après l'arrêt de la consolidation en cours
+    parent.protocol("WM_DELETE_WINDOW", _close_app)
+
     # ======================= Bouton pour sortir de la page
     font_button_quit = tkFont.Font(family=gg.FONT_NAME,
                                    size=eff_buttons_font_size)
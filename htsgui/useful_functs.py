@@ -15,28 +15,67 @@ __all__ = ['font_size',
 
 # Standard library imports
 import math
-import os
+import queue
 from tkinter import messagebox
 
 # Local imports
 import htsgui.gui_globals as gg
+from htsfuncts.folder_index import get_available_years, is_folder_index_refreshing
 
 
-def last_available_years(bibliometer_path, year_number):
-    """Returns a list of the available five last available years where corpuses are stored."""
+def _warn_inaccessible_folder(bibliometer_path):
+    """Warns that the working folder 'bibliometer_path' is not accessible."""
+    warning_title = "!!! ATTENTION : Dossier de travail inaccessible !!!"
+    warning_text = (f"L'accès au dossier {bibliometer_path} est impossible."
+                    f"\nChoisissez un autre dossier de travail.")
+    messagebox.showwarning(warning_title, warning_text)
+
+
+def last_available_years(bibliometer_path, year_number, root=None, update_function=None):
+    """Returns a list of the 'year_number' last available years where corpuses
+    are stored in ascending order, served from the local index of the working
+    folder that is refreshed in background.
+
+    When 'root' is given, the results of the background refresh are posted
+    in a queue polled in the tk main loop through its `after` method until
+    the end of the refresh: 'update_function' is called with the new years
+    list if the years changed and the warning of inaccessible working folder
+    is shown if the folder is not accessible.
+    """
+    events_queue = queue.Queue()
+
+    def _on_change(folder_index):
+        events_queue.put(("change", list(folder_index["years"])[-year_number:]))
+
+    def _on_error(error):
+        events_queue.put(("error", error))
+
+    def _poll_events():
+        # Fin du rafraîchissement testée avant la lecture de la file
+        # pour ne pas perdre les derniers événements
+        refresh_status = is_folder_index_refreshing(bibliometer_path)
+        while True:
+            try:
+                event = events_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "change":
+                if update_function is not None:
+                    update_function(event[1])
+            else:
+                _warn_inaccessible_folder(bibliometer_path)
+        if refresh_status:
+            root.after(gg.PROGRESS_POLL_MS, _poll_events)
+
     try:
-        list_dir = os.listdir(bibliometer_path)
-        years_full_list = []
-        for year in list_dir:
-            if len(year) == 4:
-                years_full_list.append(year)
-        years_list = years_full_list[-year_number:]
+        years_list = get_available_years(bibliometer_path, year_number,
+                                         change_callback=_on_change if root else None,
+                                         error_callback=_on_error if root else None)
     except FileNotFoundError:
-        warning_title = "!!! ATTENTION : Dossier de travail inaccessible !!!"
-        warning_text = (f"L'accès au dossier {bibliometer_path} est impossible."
-                        f"\nChoisissez un autre dossier de travail.")
-        messagebox.showwarning(warning_title, warning_text)
+        _warn_inaccessible_folder(bibliometer_path)
         years_list = []
+    if root is not None:
+        root.after(gg.PROGRESS_POLL_MS, _poll_events)
     return years_list
 
 
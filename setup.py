@@ -36,4 +36,7 @@ setup(name='HalToScopus',
                      'ludovic.desmeuzes@yahoo.com'),
       url= 'https://github.com/TickyWill/HalToScopus',
       packages=find_packages(),
+      entry_points={
+          'console_scripts': ['haltoscopus=htsfuncts.cli:main'],
+          },
       )
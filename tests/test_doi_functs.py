@@ -0,0 +1,57 @@
+"""Tests of the DOIs normalization and sets differences
+of the `doi_functs` module."""
+
+# 3rd party imports
+import pandas as pd
+
+# Local imports
+from htsfuncts.doi_functs import normalize_dois
+from htsfuncts.doi_functs import set_dois_differences
+
+
+def test_normalize_dois_strips_prefixes():
+    dois = ["https://doi.org/10.1000/abc", "http://dx.doi.org/10.1000/abc",
+            "doi.org/10.1000/abc", "doi:10.1000/abc", "doi: 10.1000/abc",
+            "doi/10.1000/abc"]
+    assert normalize_dois(dois).tolist() == ["10.1000/abc"] * len(dois)
+
+
+def test_normalize_dois_strips_spaces_and_trailing_punctuation():
+    dois = [" 10.1000/abc ", "10.1000/abc.", "10.1000/abc;", "10.1000/abc ,:",
+            "\t10.1000/abc\n"]
+    assert normalize_dois(dois).tolist() == ["10.1000/abc"] * len(dois)
+
+
+def test_normalize_dois_folds_case():
+    dois = ["10.1000/ABC", "DOI:10.1000/Abc", "HTTPS://DOI.ORG/10.1000/aBc"]
+    assert normalize_dois(dois).tolist() == ["10.1000/abc"] * len(dois)
+
+
+def test_normalize_dois_sets_non_dois_to_na():
+    norm_dois = normalize_dois(["10.1000/abc", "", "NA", "abc/10.1000", None, "11.1000/abc"])
+    assert norm_dois.iloc[0] == "10.1000/abc"
+    assert norm_dois.iloc[1:].isna().all()
+
+
+def test_normalize_dois_keeps_series_index():
+    dois = pd.Series(["doi:10.1000/A", "10.1000/B"], index=[5, 7])
+    norm_dois = normalize_dois(dois)
+    assert norm_dois.index.tolist() == [5, 7]
+    assert norm_dois.tolist() == ["10.1000/a", "10.1000/b"]
+
+
+def test_set_dois_differences():
+    hal_dois = ["https://doi.org/10.1000/A", "10.1000/b", "doi:10.1000/c.",
+                "10.1000/c", "not a doi", None]
+    scopus_dois = pd.Series(["10.1000/a", "10.1000/D", " 10.1000/e ", "NA"])
+    hal_not_scopus_index, scopus_not_hal_index = set_dois_differences(hal_dois, scopus_dois)
+    assert hal_not_scopus_index.tolist() == ["10.1000/b", "10.1000/c"]
+    assert scopus_not_hal_index.tolist() == ["10.1000/d", "10.1000/e"]
+
+
+def test_set_dois_differences_of_same_sets_are_empty():
+    hal_dois = ["10.1000/A", "doi:10.1000/b"]
+    scopus_dois = ["https://doi.org/10.1000/a", "10.1000/B"]
+    hal_not_scopus_index, scopus_not_hal_index = set_dois_differences(hal_dois, scopus_dois)
+    assert hal_not_scopus_index.empty
+    assert scopus_not_hal_index.empty
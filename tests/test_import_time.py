@@ -0,0 +1,85 @@
+"""Import-time regression tests of the `htsfuncts` and `htsgui` packages
+based on `python -X importtime`: the entry modules should neither load
+their heavy dependencies nor exceed an import time budget, each module
+being imported in a fresh interpreter.
+
+The lazy objects maps of the packages are also checked against
+the `__all__` of their modules for `from <package> import *`
+to export the same public objects as the modules."""
+
+# Standard library imports
+import subprocess
+import sys
+from importlib import import_module
+from pathlib import Path
+
+# 3rd party imports
+import pytest
+
+# Heavy dependencies that the imports of the packages should not load
+HEAVY_MODULES_LIST = ["pandas", "HalApyJson", "ScopusApyJson", "tkinter", "screeninfo"]
+
+# Modules checked with the heavy dependencies that they should not load
+CHECKED_MODULES_DICT = {
+    "htsfuncts, htsgui": HEAVY_MODULES_LIST,
+    "htsfuncts.cli": HEAVY_MODULES_LIST,
+    "htsgui.gui_globals": ["pandas", "tkinter", "screeninfo"],
+    "htsgui.main_page": ["pandas", "HalApyJson", "ScopusApyJson", "screeninfo"],
+}
+
+# Cumulative import time budget in microseconds of the modules of the packages,
+# far below the import time of pandas and of the API clients
+IMPORT_TIME_MAX_US = 100_000
+
+# Packages of the repository
+PACKAGES_LIST = ["htsfuncts", "htsgui"]
+
+
+def _run_importtime(module_names):
+    """Imports 'module_names' in a fresh interpreter run with `-X importtime`
+    and returns the imported modules as a list of tuples (name, depth,
+    cumulative time in microseconds) parsed from its standard error."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             f"import {module_names}"],
+                            cwd=Path(__file__).resolve().parents[1],
+                            capture_output=True, text=True, check=True)
+    imports_list = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name_field = line.split("|")
+        name = name_field.strip()
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        imports_list.append((name, depth, int(cumulative_us)))
+    return imports_list
+
+
+@pytest.mark.parametrize("module_names", list(CHECKED_MODULES_DICT))
+def test_import_does_not_load_heavy_modules(module_names):
+    imports_list = _run_importtime(module_names)
+    loaded_set = {name.split(".")[0] for name, _, _ in imports_list}
+    assert {name for name in CHECKED_MODULES_DICT[module_names]
+            if name in loaded_set} == set()
+
+
+@pytest.mark.parametrize("module_names", list(CHECKED_MODULES_DICT))
+def test_import_time_within_budget(module_names):
+    imports_list = _run_importtime(module_names)
+    packages_time_us = sum(cumulative_us for name, depth, cumulative_us in imports_list
+                           if not depth and name.split(".")[0] in PACKAGES_LIST)
+    assert 0 < packages_time_us < IMPORT_TIME_MAX_US
+
+
+@pytest.mark.parametrize("package_name", PACKAGES_LIST)
+def test_lazy_objects_match_modules_all(package_name):
+    package = import_module(package_name)
+    for module_name, names_list in package._LAZY_OBJECTS_DICT.items():
+        assert names_list == import_module(module_name).__all__
+
+
+def test_star_import_exports_public_objects():
+    namespace_dict = {}
+    exec("from htsfuncts import *", namespace_dict)
+    for name in ["consolidate_scopus", "consolidate_scopus_years",
+                 "FILES_BASE", "WORKING_FOLDERS_DICT"]:
+        assert name in namespace_dict